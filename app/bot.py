@@ -1,7 +1,9 @@
 """
 Main bot application
 """
+import asyncio
 import logging
+import signal
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -13,7 +15,16 @@ from telegram.ext import (
 
 from app.config.settings import Config
 from app.services.database_service import DatabaseService
+from app.services.async_database_service import AsyncDatabaseService
 from app.services.ocr_service import OCRService
+from app.services.image_processor import ImageProcessor
+from app.services.ocr_backends import create_ocr_backend
+from app.services.balance_dashboard import BalanceDashboard
+from app.services.message_dispatcher import MessageDispatcher
+from app.services.receipt_store import ReceiptStore
+from app.services.sqlite_persistence import SQLitePersistence
+from app.services.update_processor import KeyedUpdateProcessor
+from app.services.webhook_server import WebhookServer
 from app.handlers.user_handlers import UserHandlers
 from app.handlers.admin_handlers import AdminHandlers
 from app.utils.init_database import initialize_database
@@ -25,6 +36,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+ALLOWED_UPDATES = ["message", "callback_query"]
+
 
 class ExchangeBot:
     """Main bot application class"""
@@ -42,7 +55,12 @@ class ExchangeBot:
             raise
         
         # Initialize services
-        self.db_service = DatabaseService(Config.DATABASE_PATH)
+        self.db_service = DatabaseService(
+            Config.DATABASE_PATH,
+            cache_size_kb=Config.DB_CACHE_SIZE_KB,
+            mmap_size=Config.DB_MMAP_SIZE,
+            busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS
+        )
         
         # Initialize database with bank accounts and settings
         balance_topic_id = Config.BALANCE_TOPIC_ID or "3"
@@ -51,23 +69,89 @@ class ExchangeBot:
         # Initialize exchange rate
         self.db_service.initialize_exchange_rate(Config.DEFAULT_EXCHANGE_RATE)
         
-        self.ocr_service = OCRService(Config.OPENAI_API_KEY)
+        # Everything after start-up reaches the database through the async facade
+        self.async_db = AsyncDatabaseService(self.db_service, read_workers=Config.DB_READ_WORKERS)
+        
+        self.image_processor = ImageProcessor(
+            max_workers=Config.IMAGE_POOL_WORKERS,
+            max_input_bytes=Config.IMAGE_MAX_BYTES,
+            target_size=Config.OCR_TARGET_SIZE,
+            base_tokens=Config.OCR_IMAGE_BASE_TOKENS,
+            tile_tokens=Config.OCR_IMAGE_TILE_TOKENS
+        )
+        ocr_backend = create_ocr_backend(
+            Config.OCR_BACKEND,
+            Config.OPENAI_API_KEY,
+            model=Config.OPENAI_MODEL,
+            base_url=Config.OPENAI_BASE_URL
+        )
+        self.ocr_service = OCRService(
+            Config.OPENAI_API_KEY,
+            model=Config.OPENAI_MODEL,
+            max_concurrency=Config.OCR_MAX_CONCURRENCY,
+            db_service=self.async_db,
+            cache_ttl_seconds=Config.OCR_CACHE_TTL_HOURS * 3600,
+            cache_max_entries=Config.OCR_CACHE_MAX_ENTRIES,
+            image_processor=self.image_processor,
+            two_pass=Config.OCR_TWO_PASS,
+            backend=ocr_backend
+        )
+        
+        # User and admin receipts share one content-addressed store
+        self.receipt_store = ReceiptStore(Config.RECEIPT_STORE_DIR)
+        self._retention_task = None
+        
+        # All outbound sends go through one rate-limited priority queue
+        self.dispatcher = MessageDispatcher(
+            global_rate=Config.MESSAGE_GLOBAL_RATE,
+            private_chat_rate=Config.MESSAGE_PRIVATE_CHAT_RATE,
+            group_chat_rate=Config.MESSAGE_GROUP_CHAT_PER_MINUTE / 60,
+            max_in_flight=Config.MESSAGE_MAX_IN_FLIGHT
+        )
+        
+        self.dashboard = None
+        if Config.BALANCE_UPDATE_MODE == 'dashboard':
+            self.dashboard = BalanceDashboard(
+                self.async_db,
+                self.dispatcher,
+                debounce_seconds=Config.BALANCE_DASHBOARD_DEBOUNCE_SECONDS,
+                log_size=Config.BALANCE_DASHBOARD_LOG_SIZE
+            )
         
         # Initialize handlers
-        self.user_handlers = UserHandlers(self.db_service, self.ocr_service)
-        self.admin_handlers = AdminHandlers(self.db_service, self.ocr_service)
+        self.user_handlers = UserHandlers(
+            self.async_db, self.ocr_service, self.receipt_store, self.dispatcher
+        )
+        self.admin_handlers = AdminHandlers(
+            self.async_db, self.ocr_service, self.receipt_store, self.dispatcher, self.dashboard
+        )
         
         # Create application with increased timeout settings
-        self.application = (
+        builder = (
             Application.builder()
             .token(Config.TELEGRAM_BOT_TOKEN)
             .connect_timeout(30.0)  # Connection timeout: 30 seconds
             .read_timeout(30.0)     # Read timeout: 30 seconds
             .write_timeout(30.0)    # Write timeout: 30 seconds
             .pool_timeout(30.0)     # Pool timeout: 30 seconds
-            .build()
+            .post_init(self._post_init)
+            .post_stop(self._post_stop)
+            .post_shutdown(self._post_shutdown)
         )
         
+        # Handle different chats concurrently; each chat's updates stay in order
+        if Config.UPDATE_WORKERS > 1:
+            builder = builder.concurrent_updates(
+                KeyedUpdateProcessor(workers=Config.UPDATE_WORKERS, max_pending=Config.UPDATE_MAX_PENDING)
+            )
+        
+        # Keep conversation states and user_data in the database across restarts
+        if Config.PERSISTENCE_ENABLED:
+            builder = builder.persistence(
+                SQLitePersistence(self.async_db, update_interval=Config.PERSISTENCE_UPDATE_INTERVAL)
+            )
+        self.application = builder.build()
+        
         # Register handlers
         self._register_handlers()
         
@@ -106,6 +190,8 @@ class ExchangeBot:
                 ],
             },
             fallbacks=[CommandHandler("cancel", self.user_handlers.cancel)],
+            name="exchange",
+            persistent=Config.PERSISTENCE_ENABLED,
         )
         
         # User commands
@@ -123,6 +209,7 @@ class ExchangeBot:
         self.application.add_handler(CommandHandler("adjust", self.admin_handlers.adjust_balance_command))
         self.application.add_handler(CommandHandler("initbalance", self.admin_handlers.init_balance_command))
         self.application.add_handler(CommandHandler("updatedisplay", self.admin_handlers.update_display_name_command))
+        self.application.add_handler(CommandHandler("sendstats", self.admin_handlers.send_stats_command))
         
         # Admin photo handler for receipts (must be before callback handlers)
         self.application.add_handler(
@@ -139,11 +226,116 @@ class ExchangeBot:
         self.application.add_handler(
             CallbackQueryHandler(self.admin_handlers.admin_cancel_callback, pattern="^cancel_")
         )
+        self.application.add_handler(
+            CallbackQueryHandler(self.admin_handlers.transactions_page_callback, pattern="^txns_")
+        )
         
         logger.info("All handlers registered successfully")
     
+    async def _post_init(self, application: Application):
+        """Start background jobs once the application is running"""
+        self._retention_task = asyncio.create_task(self._receipt_retention_loop())
+    
+    async def _post_stop(self, application: Application):
+        """Stop background jobs before services are shut down"""
+        if self._retention_task:
+            self._retention_task.cancel()
+            try:
+                await self._retention_task
+            except asyncio.CancelledError:
+                pass
+            self._retention_task = None
+        
+        # Flush queued messages while the bot can still send
+        if self.dashboard:
+            await self.dashboard.close()
+        await self.dispatcher.close()
+    
+    async def _receipt_retention_loop(self):
+        """Periodically recompress old receipts and remove expired ones"""
+        interval = max(1, Config.RECEIPT_RETENTION_INTERVAL_MINUTES) * 60
+        while True:
+            try:
+                await self.receipt_store.apply_retention(
+                    self.async_db,
+                    recompress_after_days=Config.RECEIPT_RECOMPRESS_DAYS,
+                    retention_days=Config.RECEIPT_RETENTION_DAYS,
+                    orphan_after_hours=Config.RECEIPT_ORPHAN_HOURS,
+                    quality=Config.RECEIPT_RECOMPRESS_QUALITY,
+                    max_size=Config.RECEIPT_RECOMPRESS_MAX_SIZE
+                )
+            except Exception as e:
+                logger.error(f"Receipt retention failed: {e}")
+            await asyncio.sleep(interval)
+    
+    async def _post_shutdown(self, application: Application):
+        """Release service resources after the application stops"""
+        await self.ocr_service.aclose()
+        self.async_db.close()
+        logger.info("Services shut down")
+    
     def run(self):
         """Start the bot"""
-        logger.info("Starting bot polling...")
         logger.info(f"Admin Group ID: {Config.ADMIN_GROUP_ID}")
-        self.application.run_polling(allowed_updates=["message", "callback_query"])
+        if Config.BOT_MODE == "webhook":
+            logger.info("Starting bot in webhook mode...")
+            asyncio.run(self._run_webhook())
+        else:
+            logger.info("Starting bot polling...")
+            self.application.run_polling(allowed_updates=ALLOWED_UPDATES)
+    
+    async def _run_webhook(self):
+        """
+        Serve updates from the embedded webhook listener until SIGINT/SIGTERM
+        
+        Mirrors run_polling's lifecycle (initialize, post_init, start ...
+        stop, post_stop, shutdown, post_shutdown) with the webhook server in
+        place of the updater.
+        """
+        application = self.application
+        server = WebhookServer(
+            application,
+            listen=Config.WEBHOOK_LISTEN,
+            port=Config.WEBHOOK_PORT,
+            url_path=Config.WEBHOOK_PATH,
+            secret_token=Config.WEBHOOK_SECRET_TOKEN,
+            read_timeout=Config.WEBHOOK_READ_TIMEOUT
+        )
+        
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+        
+        await application.initialize()
+        try:
+            if application.post_init:
+                await application.post_init(application)
+            await server.start()
+            
+            if Config.WEBHOOK_URL:
+                await application.bot.set_webhook(
+                    url=Config.WEBHOOK_URL.rstrip("/") + server.url_path,
+                    secret_token=Config.WEBHOOK_SECRET_TOKEN,
+                    allowed_updates=ALLOWED_UPDATES,
+                    max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+                )
+                logger.info(f"Webhook registered at {Config.WEBHOOK_URL.rstrip('/')}{server.url_path}")
+            else:
+                logger.warning("WEBHOOK_URL is not set; expecting the webhook to be registered externally")
+            
+            await application.start()
+            await stop_event.wait()
+        finally:
+            logger.info("Stopping webhook mode...")
+            await server.stop()
+            if application.running:
+                await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
@@ -4,7 +4,7 @@ Centralized configuration management with validation
 """
 import os
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -26,9 +26,15 @@ class Config:
     # OpenAI Configuration
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")  # e.g. http://127.0.0.1:8089/v1 for fake_openai_server.py
+    OCR_BACKEND: str = os.getenv("OCR_BACKEND", "langchain")  # langchain or openai
     
     # Database Configuration
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", str(BASE_DIR / "data" / "exchange_bot.db"))
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))  # Page cache per connection
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))  # 0 disables mmap
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_READ_WORKERS: int = int(os.getenv("DB_READ_WORKERS", "4"))  # Reader threads (writes use one thread)
     
     # Exchange Configuration
     DEFAULT_EXCHANGE_RATE: float = float(os.getenv("DEFAULT_EXCHANGE_RATE", "121.5"))
@@ -42,6 +48,22 @@ class Config:
         "KBZ", "AYA", "CB Bank", "KPay", "Wave Money", "UAB"
     ]
     
+    # Bank ID -> (currency, aliases); compiled once by app.utils.bank_registry.
+    # Mobile wallets are aliases of the bank that runs them (KBZ Pay -> KBZ).
+    # The first alias is the name shown to users.
+    BANK_ALIASES: Dict[str, Tuple[str, List[str]]] = {
+        "KBANK": ("THB", ["KBank", "Kasikorn", "Kasikorn Bank", "Kasikornbank", "K PLUS"]),
+        "SCB": ("THB", ["SCB", "Siam Commercial", "Siam Commercial Bank", "SCB Easy"]),
+        "KTB": ("THB", ["KTB", "Krungthai", "Krung Thai", "Krungthai Bank", "Krungthai NEXT"]),
+        "BBL": ("THB", ["Bangkok Bank", "BBL", "Bualuang"]),
+        "PROMPTPAY": ("THB", ["PromptPay", "Prompt Pay"]),
+        "KBZ": ("MMK", ["KBZ", "KBZ Bank", "Kanbawza", "Kanbawza Bank", "KPay", "KBZPay", "KBZ Pay"]),
+        "AYA": ("MMK", ["AYA", "AYA Bank", "Ayeyarwady Bank", "AYA Pay"]),
+        "CB": ("MMK", ["CB Bank", "CB", "CBPay", "Co-operative Bank"]),
+        "WAVE": ("MMK", ["Wave Money", "Wave", "WavePay", "Wave Pay"]),
+        "UAB": ("MMK", ["UAB", "UAB Bank", "United Amara Bank", "UAB Pay"]),
+    }
+    
     # Initial Balances (currency, bank_name, balance)
     INITIAL_BALANCES: List[Tuple[str, str, float]] = [
     ]
@@ -49,6 +71,7 @@ class Config:
     # File Paths
     RECEIPTS_DIR: Path = BASE_DIR / "receipts"
     ADMIN_RECEIPTS_DIR: Path = BASE_DIR / "admin_receipts"
+    RECEIPT_STORE_DIR: Path = Path(os.getenv("RECEIPT_STORE_DIR", str(BASE_DIR / "receipt_store")))
     LOGS_DIR: Path = BASE_DIR / "logs"
     
     # Logging Configuration
@@ -67,12 +90,64 @@ class Config:
     WRITE_TIMEOUT: float = 30.0
     POOL_TIMEOUT: float = 30.0
     
+    # Update Delivery Configuration
+    BOT_MODE: str = os.getenv("BOT_MODE", "polling")  # polling or webhook
+    WEBHOOK_LISTEN: str = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8443"))
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")  # Public base URL (TLS terminated by a reverse proxy)
+    WEBHOOK_SECRET_TOKEN: str = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+    WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    WEBHOOK_READ_TIMEOUT: float = float(os.getenv("WEBHOOK_READ_TIMEOUT", "10"))  # Seconds per request part
+    
+    # Update Processing (updates from one chat always run in order)
+    UPDATE_WORKERS: int = int(os.getenv("UPDATE_WORKERS", "8"))  # 1 = process updates sequentially
+    UPDATE_MAX_PENDING: int = int(os.getenv("UPDATE_MAX_PENDING", "256"))  # Admitted (waiting or running)
+    
+    # Conversation Persistence (exchange state and user_data survive restarts)
+    PERSISTENCE_ENABLED: bool = os.getenv("PERSISTENCE_ENABLED", "true").lower() == "true"
+    PERSISTENCE_UPDATE_INTERVAL: float = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "10"))  # Seconds
+    
+    # Outbound Message Limits (Telegram flood limits)
+    MESSAGE_GLOBAL_RATE: float = float(os.getenv("MESSAGE_GLOBAL_RATE", "30"))  # Messages/second, all chats
+    MESSAGE_PRIVATE_CHAT_RATE: float = float(os.getenv("MESSAGE_PRIVATE_CHAT_RATE", "1"))  # Messages/second per user
+    MESSAGE_GROUP_CHAT_PER_MINUTE: float = float(os.getenv("MESSAGE_GROUP_CHAT_PER_MINUTE", "20"))
+    MESSAGE_MAX_IN_FLIGHT: int = int(os.getenv("MESSAGE_MAX_IN_FLIGHT", "8"))
+    
+    # Balance Topic Configuration
+    BALANCE_UPDATE_MODE: str = os.getenv("BALANCE_UPDATE_MODE", "dashboard")  # dashboard (edit pinned) or message
+    BALANCE_DASHBOARD_DEBOUNCE_SECONDS: float = float(os.getenv("BALANCE_DASHBOARD_DEBOUNCE_SECONDS", "10"))
+    BALANCE_DASHBOARD_LOG_SIZE: int = int(os.getenv("BALANCE_DASHBOARD_LOG_SIZE", "10"))  # Recent changes shown
+    
+    # Receipt Retention Configuration
+    RECEIPT_RECOMPRESS_DAYS: int = int(os.getenv("RECEIPT_RECOMPRESS_DAYS", "30"))  # 0 disables
+    RECEIPT_RETENTION_DAYS: int = int(os.getenv("RECEIPT_RETENTION_DAYS", "0"))  # 0 keeps receipts forever
+    RECEIPT_ORPHAN_HOURS: int = int(os.getenv("RECEIPT_ORPHAN_HOURS", "24"))  # Unreferenced uploads
+    RECEIPT_HOLD_HOURS: int = int(os.getenv("RECEIPT_HOLD_HOURS", "72"))  # Uploads in unfinished exchanges
+    RECEIPT_RECOMPRESS_QUALITY: int = int(os.getenv("RECEIPT_RECOMPRESS_QUALITY", "60"))
+    RECEIPT_RECOMPRESS_MAX_SIZE: int = int(os.getenv("RECEIPT_RECOMPRESS_MAX_SIZE", "1280"))
+    RECEIPT_RETENTION_INTERVAL_MINUTES: int = int(os.getenv("RECEIPT_RETENTION_INTERVAL_MINUTES", "60"))
+    
+    # Admin Listing Configuration
+    TRANSACTIONS_PAGE_SIZE: int = int(os.getenv("TRANSACTIONS_PAGE_SIZE", "20"))  # Rows per /transactions page
+    
     # Retry Configuration
     MAX_RETRIES: int = 3
     RETRY_DELAY: int = 2  # seconds
     
     # OCR Configuration
     OCR_SIMILARITY_THRESHOLD: float = 0.80  # 80% similarity for fuzzy matching
+    OCR_MAX_CONCURRENCY: int = int(os.getenv("OCR_MAX_CONCURRENCY", "4"))  # Vision calls in flight
+    OCR_CACHE_TTL_HOURS: int = int(os.getenv("OCR_CACHE_TTL_HOURS", "72"))
+    OCR_CACHE_MAX_ENTRIES: int = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "5000"))
+    OCR_TWO_PASS: bool = os.getenv("OCR_TWO_PASS", "false").lower() == "true"  # Low detail first
+    
+    # Image Preprocessing Configuration
+    IMAGE_POOL_WORKERS: int = int(os.getenv("IMAGE_POOL_WORKERS", "2"))  # 0 = process in threads
+    IMAGE_MAX_BYTES: int = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+    OCR_TARGET_SIZE: int = int(os.getenv("OCR_TARGET_SIZE", "2048"))  # Long side in px needed for OCR
+    OCR_IMAGE_BASE_TOKENS: int = int(os.getenv("OCR_IMAGE_BASE_TOKENS", "85"))
+    OCR_IMAGE_TILE_TOKENS: int = int(os.getenv("OCR_IMAGE_TILE_TOKENS", "170"))
     
     @classmethod
     def validate(cls) -> bool:
@@ -88,6 +163,11 @@ class Config:
         if not cls.ADMIN_GROUP_ID:
             errors.append("ADMIN_GROUP_ID is not set")
         
+        if cls.BOT_MODE not in ("polling", "webhook"):
+            errors.append(f"BOT_MODE must be polling or webhook, got {cls.BOT_MODE!r}")
+        elif cls.BOT_MODE == "webhook" and not cls.WEBHOOK_SECRET_TOKEN:
+            errors.append("WEBHOOK_SECRET_TOKEN is not set (required in webhook mode)")
+        
         if errors:
             error_msg = "Configuration errors:\n" + "\n".join(f"- {e}" for e in errors)
             raise ValueError(error_msg)
@@ -99,6 +179,7 @@ class Config:
         """Create necessary directories"""
         cls.RECEIPTS_DIR.mkdir(parents=True, exist_ok=True)
         cls.ADMIN_RECEIPTS_DIR.mkdir(parents=True, exist_ok=True)
+        cls.RECEIPT_STORE_DIR.mkdir(parents=True, exist_ok=True)
         cls.LOGS_DIR.mkdir(parents=True, exist_ok=True)
         Path(cls.DATABASE_PATH).parent.mkdir(parents=True, exist_ok=True)
     
@@ -4,15 +4,21 @@ Admin handlers for receipt verification and transaction management
 import os
 import logging
 import asyncio
-from datetime import datetime
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.error import TimedOut, NetworkError
 
 from app.config.settings import Config
-from app.services.database_service import DatabaseService
+from app.services.async_database_service import AsyncDatabaseService
 from app.services.ocr_service import OCRService
+from app.services.balance_dashboard import BalanceDashboard
+from app.services.message_dispatcher import MessageDispatcher, Priority
+from app.services.receipt_store import ReceiptStore
 from app.utils.command_protection import admin_only, admin_group_only_callback
+from app.utils.similarity import name_similarity, normalize_name
+from app.utils.telegram_utils import send_receipt_photo
 
 logger = logging.getLogger(__name__)
 
@@ -20,23 +26,37 @@ logger = logging.getLogger(__name__)
 class AdminHandlers:
     """Handle admin operations for transaction verification"""
     
-    def __init__(self, db_service: DatabaseService, ocr_service: OCRService):
+    def __init__(
+        self,
+        db_service: AsyncDatabaseService,
+        ocr_service: OCRService,
+        receipt_store: Optional[ReceiptStore] = None,
+        dispatcher: Optional[MessageDispatcher] = None,
+        dashboard: Optional[BalanceDashboard] = None
+    ):
         """
         Initialize admin handlers
         
         Args:
-            db_service: Database service instance
+            db_service: Async database service instance
             ocr_service: OCR service instance
+            receipt_store: Content-addressed receipt storage (defaults to RECEIPT_STORE_DIR)
+            dispatcher: Outbound message queue (shared with user handlers)
+            dashboard: Edit-in-place balance dashboard (None posts a new
+                balance message after every confirmation)
         """
         self.db = db_service
         self.ocr = ocr_service
         self.config = Config
+        self.receipts = receipt_store or ReceiptStore(Config.RECEIPT_STORE_DIR)
+        self.dispatcher = dispatcher or MessageDispatcher()
+        self.dashboard = dashboard
         logger.info("Admin handlers initialized")
     
     @admin_only
     async def balance_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show current balances (admin only)"""
-        balances = self.db.get_balances()
+        balances = await self.db.get_balances()
         
         message = ""
         
@@ -51,7 +71,7 @@ class AdminHandlers:
             display = display_name if display_name else 'No Display Name'
             message += f"{display} - {balance:,.2f}\n"
         
-        await update.message.reply_text(message, parse_mode='Markdown')
+        await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
     
     @admin_only
     async def rate_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -59,17 +79,19 @@ class AdminHandlers:
         if context.args:
             try:
                 new_rate = float(context.args[0])
-                self.db.update_rate(new_rate)
-                await update.message.reply_text(
+                await self.db.update_rate(new_rate)
+                await self.dispatcher.reply_text(
+                    update.message,
                     f"✅ **Exchange rate updated**\n\n"
                     f"New rate: 1 THB = {new_rate} MMK",
                     parse_mode='Markdown'
                 )
             except ValueError:
-                await update.message.reply_text("❌ Invalid rate value. Use: /rate 121.5")
+                await self.dispatcher.reply_text(update.message, "❌ Invalid rate value. Use: /rate 121.5")
         else:
-            rate = self.db.get_current_rate()
-            await update.message.reply_text(
+            rate = await self.db.get_current_rate()
+            await self.dispatcher.reply_text(
+                update.message,
                 f"📊 **Current Exchange Rate**\n\n"
                 f"1 THB = {rate} MMK\n\n"
                 f"To update: `/rate <new_rate>`\n"
@@ -77,38 +99,113 @@ class AdminHandlers:
                 parse_mode='Markdown'
             )
     
-    @admin_only
-    async def transactions_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show today's transactions (admin only)"""
-        transactions = self.db.get_today_transactions()
+    @staticmethod
+    def _day_range(day: date) -> Tuple[str, str]:
+        """Convert a local calendar day to the UTC range stored in created_at"""
+        start = datetime.combine(day, datetime.min.time()).astimezone(timezone.utc)
+        end = start + timedelta(days=1)
+        return start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S')
+    
+    async def _render_transactions_page(
+        self,
+        day: date,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+        """
+        Build one page of the /transactions listing
+        
+        Args:
+            day: Local calendar day to list
+            before_id: Show transactions older than this one
+            after_id: Show transactions newer than this one
+        
+        Returns:
+            Tuple of (message text, paging keyboard or None)
+        """
+        from app.utils.currency_utils import format_amount
         
+        start, end = self._day_range(day)
+        page_size = self.config.TRANSACTIONS_PAGE_SIZE
+        
+        transactions, has_more = await self.db.get_transactions_page(
+            start, end, limit=page_size, before_id=before_id, after_id=after_id
+        )
+        
+        day_label = "Today" if day == date.today() else day.isoformat()
         if not transactions:
-            await update.message.reply_text("📊 No transactions today.")
-            return
+            return f"📊 No transactions for {day_label}.", None
         
-        message = "📊 **Today's Transactions:**\n\n"
-        total_thb = 0
-        total_mmk = 0
-        confirmed_count = 0
-        pending_count = 0
+        summary = await self.db.get_transaction_summary(start, end)
         
+        message = f"📊 **Transactions - {day_label}:**\n\n"
         for txn in transactions:
-            status_emoji = "✅" if txn[13] == 'confirmed' else "⏳" if txn[13] == 'pending' else "❌"
-            message += f"{status_emoji} **#{txn[0]}** - {txn[6]} THB → {txn[7]:,.0f} MMK - `{txn[13]}`\n"
-            
-            if txn[13] == 'confirmed':
-                total_thb += txn[6]
-                total_mmk += txn[7]
-                confirmed_count += 1
-            elif txn[13] == 'pending':
-                pending_count += 1
+            status_emoji = "✅" if txn.status == 'confirmed' else "⏳" if txn.status == 'pending' else "❌"
+            message += (
+                f"{status_emoji} **#{txn.id}** - "
+                f"{format_amount(txn.sent_amount, txn.from_currency)} {txn.from_currency} → "
+                f"{format_amount(txn.received_amount, txn.to_currency)} {txn.to_currency} - `{txn.status}`\n"
+            )
         
+        counts = summary['counts']
         message += f"\n**Summary:**\n"
-        message += f"Total Confirmed: {confirmed_count}\n"
-        message += f"Pending: {pending_count}\n"
-        message += f"Total Volume: {total_thb:,.0f} THB → {total_mmk:,.0f} MMK"
+        message += f"Total: {summary['total']}\n"
+        message += f"Total Confirmed: {counts.get('confirmed', 0)}\n"
+        message += f"Pending: {counts.get('pending', 0)}\n"
+        if counts.get('cancelled'):
+            message += f"Cancelled: {counts['cancelled']}\n"
+        for (from_currency, to_currency), (sent, received) in sorted(summary['volumes'].items()):
+            message += (
+                f"Volume: {format_amount(sent, from_currency)} {from_currency} → "
+                f"{format_amount(received, to_currency)} {to_currency}\n"
+            )
+        
+        # Newer rows exist if we paged backwards, or paged forwards and there are more
+        has_newer = before_id is not None or (after_id is not None and has_more)
+        has_older = after_id is not None or has_more
+        
+        day_key = day.strftime('%Y%m%d')
+        buttons = []
+        if has_newer:
+            buttons.append(InlineKeyboardButton("⬅️ Newer", callback_data=f"txns_{day_key}_p_{transactions[0].id}"))
+        if has_older:
+            buttons.append(InlineKeyboardButton("Older ➡️", callback_data=f"txns_{day_key}_n_{transactions[-1].id}"))
+        
+        return message, InlineKeyboardMarkup([buttons]) if buttons else None
+    
+    @admin_only
+    async def transactions_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show transactions for today or a given date (admin only)"""
+        day = date.today()
+        if context.args:
+            try:
+                day = date.fromisoformat(context.args[0])
+            except ValueError:
+                await self.dispatcher.reply_text(update.message, "❌ Invalid date. Use: /transactions 2024-01-31")
+                return
+        
+        message, reply_markup = await self._render_transactions_page(day)
+        await self.dispatcher.reply_text(update.message, message, reply_markup=reply_markup, parse_mode='Markdown')
+    
+    @admin_group_only_callback
+    async def transactions_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /transactions next/previous page buttons"""
+        query = update.callback_query
+        await query.answer()
+        
+        # txns_<YYYYMMDD>_<n|p>_<transaction_id>
+        _, day_key, direction, cursor_id = query.data.split('_')
+        day = datetime.strptime(day_key, '%Y%m%d').date()
+        
+        if direction == 'n':
+            message, reply_markup = await self._render_transactions_page(day, before_id=int(cursor_id))
+        else:
+            message, reply_markup = await self._render_transactions_page(day, after_id=int(cursor_id))
         
-        await update.message.reply_text(message, parse_mode='Markdown')
+        try:
+            await self.dispatcher.edit_text(query.message, message, reply_markup=reply_markup, parse_mode='Markdown')
+        except Exception as e:
+            logger.debug(f"Could not edit message: {e}")
     
     @admin_only
     async def handle_admin_receipt(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -152,57 +249,80 @@ class AdminHandlers:
             if user_id_match:
                 user_id = int(user_id_match.group(1))
                 # Get the most recent pending transaction for this user
-                recent_txn = self.db.get_user_recent_pending_transaction(user_id)
+                recent_txn = await self.db.get_user_recent_pending_transaction(user_id)
                 if recent_txn:
-                    transaction_id = recent_txn[0]  # transaction ID is first column
+                    transaction_id = recent_txn.id
                     logger.info(f"Found transaction #{transaction_id} for user {user_id} from message text")
         
         if not transaction_id:
-            await update.message.reply_text("❌ Could not identify transaction. Please reply to the transaction message.")
+            await self.dispatcher.reply_text(
+                update.message,
+                "❌ Could not identify transaction. Please reply to the transaction message."
+            )
             return
         
         # Get transaction to verify it exists and is pending
-        transaction = self.db.get_transaction(transaction_id)
+        transaction = await self.db.get_transaction(transaction_id)
         if not transaction:
-            await update.message.reply_text("❌ Transaction not found.")
+            await self.dispatcher.reply_text(update.message, "❌ Transaction not found.")
             return
         
         # Check if transaction is already confirmed (not just pending)
         status = transaction.status
         if status == 'confirmed':
-            await update.message.reply_text(f"❌ Transaction #{transaction_id} is already confirmed.")
+            await self.dispatcher.reply_text(update.message, f"❌ Transaction #{transaction_id} is already confirmed.")
             return
         elif status == 'cancelled':
-            await update.message.reply_text(f"❌ Transaction #{transaction_id} has been cancelled.")
+            await self.dispatcher.reply_text(update.message, f"❌ Transaction #{transaction_id} has been cancelled.")
             return
         
-        # Download admin receipt photo with retry logic for network timeouts
+        # Skip download if this exact photo was already processed
         photo = update.message.photo[-1]
-        max_retries = 3
-        retry_delay = 2
+        indexed = await self.db.get_receipt_file(photo.file_unique_id)
         
-        for attempt in range(max_retries):
+        image_bytes = None
+        
+        if indexed and os.path.exists(indexed['file_path']):
+            admin_receipt_path = indexed['file_path']
+            logger.info(f"Reusing stored admin receipt for file {photo.file_unique_id}: {admin_receipt_path}")
+        else:
+            # Download admin receipt photo into memory with retry logic for network timeouts
+            max_retries = 3
+            retry_delay = 2
+            
+            for attempt in range(max_retries):
+                try:
+                    file = await context.bot.get_file(photo.file_id)
+                    image_bytes = bytes(await file.download_as_bytearray())
+                    break
+                except (TimedOut, NetworkError) as e:
+                    if attempt < max_retries - 1:
+                        logger.warning(f"Network timeout on attempt {attempt + 1}, retrying in {retry_delay}s...")
+                        await asyncio.sleep(retry_delay)
+                        retry_delay *= 2  # Exponential backoff
+                    else:
+                        logger.error(f"Failed to download admin receipt after {max_retries} attempts: {e}")
+                        await self.dispatcher.reply_text(
+                            update.message,
+                            f"❌ **Network Error**\n\n"
+                            f"Unable to download receipt for transaction #{transaction_id} due to network issues.\n\n"
+                            f"Please try uploading again in a moment."
+                        )
+                        return
+            
+            # Persist original to the hash-named store off the event loop; OCR reads from memory.
+            # Only a stored file is registered - otherwise the receipt travels by file_id alone
             try:
-                file = await context.bot.get_file(photo.file_id)
-                admin_receipt_path = f"{self.config.ADMIN_RECEIPTS_DIR}/admin_{transaction_id}_{datetime.now().timestamp()}.jpg"
-                await file.download_to_drive(admin_receipt_path)
-                break
-            except (TimedOut, NetworkError) as e:
-                if attempt < max_retries - 1:
-                    logger.warning(f"Network timeout on attempt {attempt + 1}, retrying in {retry_delay}s...")
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    logger.error(f"Failed to download admin receipt after {max_retries} attempts: {e}")
-                    await update.message.reply_text(
-                        f"❌ **Network Error**\n\n"
-                        f"Unable to download receipt for transaction #{transaction_id} due to network issues.\n\n"
-                        f"Please try uploading again in a moment."
-                    )
-                    return
+                content_hash, admin_receipt_path = await asyncio.to_thread(self.receipts.put, image_bytes)
+            except OSError as e:
+                logger.error(f"Error storing admin receipt for file {photo.file_unique_id}: {e}")
+                admin_receipt_path = None
+            else:
+                await self.db.register_receipt_blob(content_hash, admin_receipt_path, len(image_bytes))
+                await self.db.save_receipt_file(photo.file_unique_id, admin_receipt_path)
         
         # Save admin receipt path to database
-        self.db.update_transaction_admin_receipt(transaction_id, admin_receipt_path)
+        await self.db.update_transaction_admin_receipt(transaction_id, admin_receipt_path, photo.file_id)
         
         logger.info(f"Admin receipt saved for transaction #{transaction_id}: {admin_receipt_path}")
         
@@ -219,7 +339,12 @@ class AdminHandlers:
         if to_currency == 'MMK':
             try:
                 logger.info(f"🔍 Running OCR on admin receipt for transaction #{transaction_id}")
-                receipt_info = self.ocr.extract_receipt_info(admin_receipt_path)
+                # Reuse indexed OCR result for resubmitted photos
+                receipt_info = indexed['ocr_result'] if indexed else None
+                if not receipt_info:
+                    receipt_info = await self.ocr.aextract_receipt_info(image_bytes or admin_receipt_path)
+                    if receipt_info and admin_receipt_path:
+                        await self.db.save_receipt_file(photo.file_unique_id, admin_receipt_path, receipt_info)
                 logger.info(f"OCR result for transaction #{transaction_id}: {receipt_info}")
                 
                 if receipt_info.get('amount'):
@@ -242,7 +367,8 @@ class AdminHandlers:
                         )]]
                         skip_markup = InlineKeyboardMarkup(skip_keyboard)
                         
-                        await update.message.reply_text(
+                        await self.dispatcher.reply_text(
+                            update.message,
                             f"⚠️ **Amount Mismatch Detected**\n\n"
                             f"Transaction #{transaction_id}\n"
                             f"Expected: **{expected_amount:,.0f} MMK**\n"
@@ -263,10 +389,10 @@ class AdminHandlers:
                             logger.info(f"📝 Updating transaction #{transaction_id} received_amount from {expected_amount} to {detected_amount} MMK")
                             
                             # Update transaction with actual amount sent by admin
-                            self.db.update_transaction_received_amount(transaction_id, detected_amount)
+                            await self.db.update_transaction_received_amount(transaction_id, detected_amount)
                             
                             # Reload transaction to get updated amount
-                            transaction = self.db.get_transaction(transaction_id)
+                            transaction = await self.db.get_transaction(transaction_id)
                         else:
                             logger.info(f"✅ Amount verified for transaction #{transaction_id}: {detected_amount} MMK (exact match)")
                 
@@ -277,14 +403,17 @@ class AdminHandlers:
                         
                         logger.info(f"👤 Checking account name: detected '{detected_account_name}' vs expected '{expected_account_name}'")
                         
-                        # Use the database validation method for fuzzy matching
-                        similarity = self.db._calculate_similarity(detected_account_name, expected_account_name)
+                        # Same fuzzy matching as receiver account validation
+                        similarity = name_similarity(
+                            normalize_name(detected_account_name), normalize_name(expected_account_name)
+                        )
                         
                         if similarity < 0.70:  # 70% similarity threshold
                             # Account name mismatch warning (non-blocking)
                             logger.warning(f"⚠️ ACCOUNT NAME MISMATCH in transaction #{transaction_id}: expected '{expected_account_name}', detected '{detected_account_name}', similarity {similarity:.2%}")
                             
-                            await update.message.reply_text(
+                            await self.dispatcher.reply_text(
+                                update.message,
                                 f"⚠️ **Account Name Warning**\n\n"
                                 f"Transaction #{transaction_id}\n"
                                 f"Expected: **{expected_account_name}**\n"
@@ -310,10 +439,11 @@ class AdminHandlers:
         
         # Only reach here if verification passed or was skipped
         # Get banks for the currency user will receive (to_currency)
-        bank_accounts = self.db.get_bank_accounts(to_currency)
+        bank_accounts = await self.db.get_bank_accounts(to_currency)
         
         if not bank_accounts:
-            await update.message.reply_text(
+            await self.dispatcher.reply_text(
+                update.message,
                 f"❌ No {to_currency} bank accounts configured. Please add {to_currency} banks using /addbank command."
             )
             return
@@ -339,7 +469,8 @@ class AdminHandlers:
         sent_text = format_amount(sent_amount, transaction.from_currency)
         received_text = format_amount(received_amount, transaction.to_currency)
         
-        await update.message.reply_text(
+        await self.dispatcher.reply_text(
+            update.message,
             f"✅ **Receipt saved for Transaction #{transaction_id}**\n\n"
             f"💰 Amount: {sent_text} {transaction.from_currency} → {received_text} {transaction.to_currency}\n"
             f"🏦 User's Bank: {user_bank}\n\n"
@@ -358,11 +489,26 @@ class AdminHandlers:
         bank = parts[1]
         transaction_id = int(parts[2])
         
-        # Get transaction details
-        transaction = self.db.get_transaction(transaction_id)
+        # Check funds, debit payout bank and confirm in one DB transaction
+        result = await self.db.confirm_transaction(transaction_id, bank)
+        transaction = result['transaction']
         
-        if not transaction:
-            await query.edit_message_text("❌ Transaction not found.")
+        if result['status'] == 'not_found':
+            await self.dispatcher.edit_text(query.message, "❌ Transaction not found.")
+            return
+        
+        if result['status'] == 'not_pending':
+            await self.dispatcher.reply_text(
+                query.message,
+                f"ℹ️ Transaction #{transaction_id} is already {transaction.status}."
+            )
+            return
+        
+        if result['status'] == 'error':
+            await self.dispatcher.reply_text(
+                query.message,
+                f"❌ Could not confirm transaction #{transaction_id}. Please try again."
+            )
             return
         
         # Get transaction details
@@ -370,17 +516,15 @@ class AdminHandlers:
         sent_amount = transaction.sent_amount
         received_amount = transaction.received_amount
         admin_receiving_bank = transaction.admin_receiving_bank
-        
-        # Get balances before update
-        balances_before = self.db.get_balances()
+        from_currency = transaction.from_currency
         to_currency = transaction.to_currency
-        balance_before = next((b[2] for b in balances_before if b[0] == to_currency and b[1] == bank), 0)
+        balance_before = result['to_before']
+        balance_after = result['to_after']
         
-        # Check for insufficient funds
-        balance_after = balance_before - received_amount
-        if balance_after < 0:
+        if result['status'] == 'insufficient_funds':
             # Insufficient funds - notify admin
-            await query.edit_message_text(
+            await self.dispatcher.edit_text(
+                query.message,
                 f"{query.message.text}\n\n"
                 f"⚠️ **INSUFFICIENT FUNDS - Transaction #{transaction_id}**\n\n"
                 f"❌ Cannot process transaction\n"
@@ -393,8 +537,8 @@ class AdminHandlers:
             
             # Send alert to admin group
             try:
-                admin_group_id = self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
-                admin_topic_id = self.db.get_setting('admin_topic_id')
+                admin_group_id = await self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
+                admin_topic_id = await self.db.get_setting('admin_topic_id')
                 
                 alert_message = f"""🚨 **INSUFFICIENT FUNDS ALERT**
 
@@ -410,47 +554,28 @@ Transaction #{transaction_id} cannot be processed
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
                 
-                if admin_topic_id:
-                    await context.bot.send_message(
-                        chat_id=admin_group_id,
-                        text=alert_message,
-                        message_thread_id=int(admin_topic_id),
-                        parse_mode='Markdown'
-                    )
-                else:
-                    await context.bot.send_message(
-                        chat_id=admin_group_id,
-                        text=alert_message,
-                        parse_mode='Markdown'
-                    )
+                topic_kwargs = {'message_thread_id': int(admin_topic_id)} if admin_topic_id else {}
+                await self.dispatcher.send_message(
+                    context.bot,
+                    admin_group_id,
+                    priority=Priority.ADMIN,
+                    text=alert_message,
+                    parse_mode='Markdown',
+                    **topic_kwargs
+                )
             except Exception as e:
                 logger.error(f"Error sending insufficient funds alert: {e}")
             
             return
         
-        # Get balance for the currency being sent (already updated when receipt was submitted)
-        from_currency = transaction.from_currency
-        if admin_receiving_bank:
-            from_current = next((b[2] for b in balances_before if b[0] == from_currency and b[1] == admin_receiving_bank), None)
-            from_before = from_current - sent_amount if from_current is not None else None
-            from_after = from_current
-        else:
-            from_before = None
-            from_after = None
-        
-        # Update balance for currency being sent out
-        self.db.update_balance(to_currency, bank, -received_amount)
-        
-        # Get balances after update
-        balances_after = self.db.get_balances()
-        to_after = next((b[2] for b in balances_after if b[0] == to_currency and b[1] == bank), 0)
-        
-        # Update transaction status
-        self.db.update_transaction_status(transaction_id, 'confirmed')
+        from_before = result['from_before']
+        from_after = result['from_after']
+        to_after = balance_after
         
         # Try to edit message, if fails (message not modified), just answer the callback
         try:
-            await query.edit_message_text(
+            await self.dispatcher.edit_text(
+                query.message,
                 f"✅ **Transaction #{transaction_id} Confirmed**\n\n"
                 f"{to_currency} Bank: {bank}\n"
                 f"Amount: {received_amount:,.2f} {to_currency}\n\n"
@@ -483,18 +608,23 @@ Transaction #{transaction_id} cannot be processed
                 f"Thank you for using our service! 💚"
             )
             
-            # Send with admin receipt photo if available
-            if transaction.admin_receipt_path and os.path.exists(transaction.admin_receipt_path):
-                with open(transaction.admin_receipt_path, 'rb') as photo:
-                    await context.bot.send_photo(
-                        chat_id=user_id,
-                        photo=photo,
-                        caption=notification_text,
-                        parse_mode='Markdown'
-                    )
-            else:
-                await context.bot.send_message(
-                    chat_id=user_id,
+            # Send with admin receipt photo if available (by file_id, disk as fallback)
+            sent = await self.dispatcher.send(
+                user_id,
+                send_receipt_photo,
+                context.bot,
+                user_id,
+                file_id=transaction.admin_receipt_file_id,
+                file_path=transaction.admin_receipt_path,
+                caption=notification_text,
+                parse_mode='Markdown',
+                priority=Priority.USER
+            )
+            if not sent:
+                await self.dispatcher.send_message(
+                    context.bot,
+                    user_id,
+                    priority=Priority.USER,
                     text=notification_text,
                     parse_mode='Markdown'
                 )
@@ -505,10 +635,21 @@ Transaction #{transaction_id} cannot be processed
                                    from_bank, to_bank, from_before, from_after, to_before, to_after,
                                    from_currency='THB', to_currency='MMK'):
         """Send balance update to balance topic"""
+        if self.dashboard:
+            # Edit the pinned per-currency dashboards instead of posting a new list.
+            # Runs after the payout is committed, so a failure here must not abort the handler.
+            try:
+                await self.dashboard.record_change(from_currency, from_bank, from_before, from_after, transaction_id)
+                await self.dashboard.record_change(to_currency, to_bank, to_before, to_after, transaction_id)
+                await self._schedule_dashboard(context)
+            except Exception as e:
+                logger.error(f"Error updating balance dashboard: {e}")
+            return
+        
         balance_message = ""
         
         # Add balance overview
-        balances = self.db.get_balances()
+        balances = await self.db.get_balances()
         if balances:
             
             # Group by currency
@@ -529,28 +670,53 @@ Transaction #{transaction_id} cannot be processed
         
         try:
             # Get balance topic from database
-            admin_group_id = self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
-            balance_topic_id = self.db.get_setting('balance_topic_id')
+            admin_group_id = await self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
+            balance_topic_id = await self.db.get_setting('balance_topic_id')
             
+            # Broadcasts are queued behind user-facing messages; don't wait for them
             if balance_topic_id:
-                await context.bot.send_message(
-                    chat_id=admin_group_id,
+                self.dispatcher.post_message(
+                    context.bot,
+                    admin_group_id,
+                    priority=Priority.BROADCAST,
                     text=balance_message,
                     message_thread_id=int(balance_topic_id),
                     parse_mode='Markdown'
                 )
-                logger.info(f"Balance update sent to topic {balance_topic_id}")
+                logger.info(f"Balance update queued for topic {balance_topic_id}")
             else:
                 # Send to main admin group if no balance topic configured
                 logger.warning("Balance topic ID not configured, sending to main admin group")
-                await context.bot.send_message(
-                    chat_id=admin_group_id,
+                self.dispatcher.post_message(
+                    context.bot,
+                    admin_group_id,
+                    priority=Priority.BROADCAST,
                     text=balance_message,
                     parse_mode='Markdown'
                 )
         except Exception as e:
             logger.error(f"Error sending balance update: {e}")
     
+    async def _record_dashboard_change(self, context, currency, bank_name, old_balance, new_balance):
+        """Log a manual balance change on the dashboard (the balance is already committed)"""
+        if not self.dashboard:
+            return
+        try:
+            await self.dashboard.record_change(currency, bank_name, old_balance, new_balance)
+            await self._schedule_dashboard(context)
+        except Exception as e:
+            logger.error(f"Error updating balance dashboard: {e}")
+    
+    async def _schedule_dashboard(self, context):
+        """Queue a debounced balance dashboard refresh in the balance topic"""
+        admin_group_id = await self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
+        balance_topic_id = await self.db.get_setting('balance_topic_id')
+        self.dashboard.schedule(
+            context.bot,
+            admin_group_id,
+            int(balance_topic_id) if balance_topic_id else None
+        )
+    
     @admin_group_only_callback
     async def skip_verification_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle skip verification button - proceed despite amount mismatch"""
@@ -562,17 +728,18 @@ Transaction #{transaction_id} cannot be processed
         logger.warning(f"⚠️ Admin skipped verification for transaction #{transaction_id}")
         
         # Get transaction
-        transaction = self.db.get_transaction(transaction_id)
+        transaction = await self.db.get_transaction(transaction_id)
         if not transaction:
-            await query.edit_message_text("❌ Transaction not found.")
+            await self.dispatcher.edit_text(query.message, "❌ Transaction not found.")
             return
         
         # Get banks for the currency user will receive
         to_currency = transaction.to_currency
-        bank_accounts = self.db.get_bank_accounts(to_currency)
+        bank_accounts = await self.db.get_bank_accounts(to_currency)
         
         if not bank_accounts:
-            await query.edit_message_text(
+            await self.dispatcher.edit_text(
+                query.message,
                 f"❌ No {to_currency} bank accounts configured."
             )
             return
@@ -597,7 +764,8 @@ Transaction #{transaction_id} cannot be processed
         sent_text = format_amount(sent_amount, transaction.from_currency)
         received_text = format_amount(received_amount, transaction.to_currency)
         
-        await query.edit_message_text(
+        await self.dispatcher.edit_text(
+            query.message,
             f"⚠️ **Verification Skipped by Admin**\n\n"
             f"Transaction #{transaction_id}\n"
             f"💰 Amount: {sent_text} {transaction.from_currency} → {received_text} {transaction.to_currency}\n"
@@ -616,19 +784,39 @@ Transaction #{transaction_id} cannot be processed
         
         transaction_id = int(query.data.split('_')[1])
         
-        # Update transaction status
-        self.db.update_transaction_status(transaction_id, 'cancelled')
+        # Cancel and reverse any balance changes made for this transaction
+        result = await self.db.cancel_transaction(transaction_id)
+        
+        if result['status'] == 'not_found':
+            await self.dispatcher.reply_text(query.message, "❌ Transaction not found.")
+            return
+        
+        if result['status'] == 'not_pending':
+            await self.dispatcher.reply_text(
+                query.message,
+                f"ℹ️ Transaction #{transaction_id} is already {result['transaction'].status} and can't be cancelled."
+            )
+            return
+        
+        if result['status'] == 'error':
+            await self.dispatcher.reply_text(
+                query.message,
+                f"❌ Could not cancel transaction #{transaction_id}. Please try again."
+            )
+            return
         
         # Try to edit message, handle if message has no text (e.g., photo)
         try:
             if query.message.text:
-                await query.edit_message_text(
+                await self.dispatcher.edit_text(
+                    query.message,
                     f"{query.message.text}\n\n"
                     f"❌ Transaction #{transaction_id} cancelled."
                 )
             else:
                 # Message has no text (probably a photo), send new message
-                await query.message.reply_text(
+                await self.dispatcher.reply_text(
+                    query.message,
                     f"❌ Transaction #{transaction_id} cancelled."
                 )
         except Exception as e:
@@ -636,26 +824,66 @@ Transaction #{transaction_id} cannot be processed
             await query.answer("❌ Transaction cancelled!")
         
         # Notify user
-        transaction = self.db.get_transaction(transaction_id)
+        transaction = result['transaction']
         if transaction:
-            user_id = transaction[1]
+            user_id = transaction.user_id
             try:
-                await context.bot.send_message(
-                    chat_id=user_id,
+                await self.dispatcher.send_message(
+                    context.bot,
+                    user_id,
+                    priority=Priority.USER,
                     text=f"❌ Your transaction #{transaction_id} has been cancelled.\n"
                          f"Please contact support if you have questions."
                 )
             except Exception as e:
                 logger.error(f"Error notifying user: {e}")
 
+    @admin_only
+    async def send_stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show outbound queue and incoming update processing metrics (admin only)"""
+        metrics = self.dispatcher.get_metrics()
+        depth = metrics['queue_depth_by_priority']
+        
+        message = f"""📤 **Outbound Messages:**
+
+Sent: {metrics['sent']} | Failed: {metrics['failed']}
+Retries: {metrics['retries']} | Flood waits: {metrics['retry_after']}
+In flight: {metrics['in_flight']}
+
+**Queue depth:** {metrics['queue_depth']}
+""" + "".join(f"• {name}: {count}\n" for name, count in depth.items())
+        
+        if metrics['latency']:
+            message += "\n**Latency (p50 / p95):**\n"
+            for name, stats in metrics['latency'].items():
+                message += f"• {name}: {stats['p50_ms']:,.0f} / {stats['p95_ms']:,.0f} ms ({stats['samples']} sends)\n"
+        
+        processor = context.application.update_processor
+        if hasattr(processor, 'get_metrics'):
+            updates = processor.get_metrics()
+            message += f"""
+📥 **Incoming Updates:**
+
+Processed: {updates['processed']} | Workers: {updates['running']}/{updates['workers']} busy
+Queued: {updates['queued']} | Chats waiting on order: {updates['backlogged_keys']}
+Deepest chat queue: {updates['deepest_key_queue']} (max {updates['max_key_depth']})
+"""
+            if 'wait' in updates:
+                message += (
+                    f"Wait p50 / p95: {updates['wait']['p50_ms']:,.0f} / {updates['wait']['p95_ms']:,.0f} ms\n"
+                    f"Run p50 / p95: {updates['run']['p50_ms']:,.0f} / {updates['run']['p95_ms']:,.0f} ms\n"
+                )
+        
+        await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
+    
     @admin_only
     async def settings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """View or update bot settings (admin only)"""
         if not context.args:
             # Show current settings
-            admin_group_id = self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
-            admin_topic_id = self.db.get_setting('admin_topic_id') or self.config.ADMIN_TOPIC_ID or "Not set"
-            balance_topic_id = self.db.get_setting('balance_topic_id') or "Not set"
+            admin_group_id = await self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
+            admin_topic_id = await self.db.get_setting('admin_topic_id') or self.config.ADMIN_TOPIC_ID or "Not set"
+            balance_topic_id = await self.db.get_setting('balance_topic_id') or "Not set"
             
             message = f"""⚙️ **Bot Settings:**
 
@@ -671,11 +899,11 @@ Transaction #{transaction_id} cannot be processed
 **Example:**
 `/settings balance_topic_id 12345`
 """
-            await update.message.reply_text(message, parse_mode='Markdown')
+            await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
         else:
             # Update setting
             if len(context.args) < 2:
-                await update.message.reply_text("❌ Usage: /settings <key> <value>")
+                await self.dispatcher.reply_text(update.message, "❌ Usage: /settings <key> <value>")
                 return
             
             key = context.args[0]
@@ -683,11 +911,11 @@ Transaction #{transaction_id} cannot be processed
             
             valid_keys = ['admin_group_id', 'admin_topic_id', 'balance_topic_id']
             if key not in valid_keys:
-                await update.message.reply_text(f"❌ Invalid key. Valid keys: {', '.join(valid_keys)}")
+                await self.dispatcher.reply_text(update.message, f"❌ Invalid key. Valid keys: {', '.join(valid_keys)}")
                 return
             
-            self.db.set_setting(key, value)
-            await update.message.reply_text(f"✅ Setting updated: {key} = {value}")
+            await self.db.set_setting(key, value)
+            await self.dispatcher.reply_text(update.message, f"✅ Setting updated: {key} = {value}")
     
     @admin_only
     async def add_bank_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -705,7 +933,7 @@ Transaction #{transaction_id} cannot be processed
 **Note:** Display name is optional and will be shown in balance reports
 **Supported Currencies:** THB, MMK
 """
-            await update.message.reply_text(message, parse_mode='Markdown')
+            await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
             return
         
         currency = context.args[0].upper()
@@ -728,10 +956,10 @@ Transaction #{transaction_id} cannot be processed
         account_name = ' '.join(account_name_parts) if account_name_parts else remaining_args[0]
         
         if currency not in ['THB', 'MMK']:
-            await update.message.reply_text("❌ Currency must be THB or MMK")
+            await self.dispatcher.reply_text(update.message, "❌ Currency must be THB or MMK")
             return
         
-        self.db.add_admin_bank_account(currency, bank_name, account_number, account_name, display_name)
+        await self.db.add_admin_bank_account(currency, bank_name, account_number, account_name, display_name)
         
         response = f"✅ **Admin Bank Account Added**\n\n"
         response += f"Currency: {currency}\n"
@@ -741,7 +969,7 @@ Transaction #{transaction_id} cannot be processed
         if display_name:
             response += f"Display Name: {display_name}\n"
         
-        await update.message.reply_text(response, parse_mode='Markdown')
+        await self.dispatcher.reply_text(update.message, response, parse_mode='Markdown')
     
     @admin_only
     async def list_banks_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -749,13 +977,13 @@ Transaction #{transaction_id} cannot be processed
         currency_filter = context.args[0].upper() if context.args else None
         
         if currency_filter and currency_filter not in ['THB', 'MMK']:
-            await update.message.reply_text("❌ Currency must be THB or MMK")
+            await self.dispatcher.reply_text(update.message, "❌ Currency must be THB or MMK")
             return
         
-        accounts = self.db.get_bank_accounts(currency_filter)
+        accounts = await self.db.get_bank_accounts(currency_filter)
         
         if not accounts:
-            await update.message.reply_text("📋 No admin bank accounts found.")
+            await self.dispatcher.reply_text(update.message, "📋 No admin bank accounts found.")
             return
         
         message = "🏦 **Admin Bank Accounts:**\n\n"
@@ -775,21 +1003,21 @@ Transaction #{transaction_id} cannot be processed
         
         message += f"\n**Deactivate:** `/removebank <id>`"
         
-        await update.message.reply_text(message, parse_mode='Markdown')
+        await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
     
     @admin_only
     async def remove_bank_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Deactivate admin bank account (admin only)"""
         if not context.args:
-            await update.message.reply_text("❌ Usage: /removebank <account_id>")
+            await self.dispatcher.reply_text(update.message, "❌ Usage: /removebank <account_id>")
             return
         
         try:
             account_id = int(context.args[0])
-            self.db.deactivate_admin_bank_account(account_id)
-            await update.message.reply_text(f"✅ Bank account #{account_id} deactivated")
+            await self.db.deactivate_admin_bank_account(account_id)
+            await self.dispatcher.reply_text(update.message, f"✅ Bank account #{account_id} deactivated")
         except ValueError:
-            await update.message.reply_text("❌ Invalid account ID")
+            await self.dispatcher.reply_text(update.message, "❌ Invalid account ID")
 
     @admin_only
     async def adjust_balance_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -807,7 +1035,7 @@ Transaction #{transaction_id} cannot be processed
 
 **Note:** Use + or - for relative changes, or just number for absolute value
 """
-            await update.message.reply_text(message, parse_mode='Markdown')
+            await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
             return
         
         currency = context.args[0].upper()
@@ -815,7 +1043,7 @@ Transaction #{transaction_id} cannot be processed
         amount_str = context.args[2]
         
         if currency not in ['THB', 'MMK']:
-            await update.message.reply_text("❌ Currency must be THB or MMK")
+            await self.dispatcher.reply_text(update.message, "❌ Currency must be THB or MMK")
             return
         
         try:
@@ -823,11 +1051,22 @@ Transaction #{transaction_id} cannot be processed
             if amount_str.startswith('+') or amount_str.startswith('-'):
                 # Relative adjustment
                 amount_change = float(amount_str)
-                old_balance = self.db.get_balance(currency, bank_name)
-                self.db.update_balance(currency, bank_name, amount_change)
-                new_balance = self.db.get_balance(currency, bank_name)
+                balances = await self.db.update_balance(
+                    currency, bank_name, amount_change,
+                    note=f"/adjust by {update.effective_user.username or update.effective_user.id}"
+                )
+                if balances is None:
+                    await self.dispatcher.reply_text(
+                        update.message,
+                        f"❌ No active {currency} account found for {bank_name}"
+                    )
+                    return
+                old_balance, new_balance = balances
+                
+                await self._record_dashboard_change(context, currency, bank_name, old_balance, new_balance)
                 
-                await update.message.reply_text(
+                await self.dispatcher.reply_text(
+                    update.message,
                     f"✅ **Balance Adjusted**\n\n"
                     f"Currency: {currency}\n"
                     f"Bank: {bank_name}\n"
@@ -839,10 +1078,18 @@ Transaction #{transaction_id} cannot be processed
             else:
                 # Absolute value
                 new_balance = float(amount_str)
-                old_balance = self.db.get_balance(currency, bank_name)
-                self.db.set_balance(currency, bank_name, new_balance)
+                old_balance = await self.db.set_balance(
+                    currency, bank_name, new_balance,
+                    note=f"/adjust by {update.effective_user.username or update.effective_user.id}"
+                )
+                if old_balance is None:
+                    await self.dispatcher.reply_text(update.message, "❌ Could not set balance. Please try again.")
+                    return
+                
+                await self._record_dashboard_change(context, currency, bank_name, old_balance, new_balance)
                 
-                await update.message.reply_text(
+                await self.dispatcher.reply_text(
+                    update.message,
                     f"✅ **Balance Set**\n\n"
                     f"Currency: {currency}\n"
                     f"Bank: {bank_name}\n"
@@ -852,7 +1099,7 @@ Transaction #{transaction_id} cannot be processed
                 )
                 
         except ValueError:
-            await update.message.reply_text("❌ Invalid amount format")
+            await self.dispatcher.reply_text(update.message, "❌ Invalid amount format")
     
     @admin_only
     async def init_balance_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -869,7 +1116,7 @@ Transaction #{transaction_id} cannot be processed
 
 **Note:** This will create or update the balance entry
 """
-            await update.message.reply_text(message, parse_mode='Markdown')
+            await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
             return
         
         currency = context.args[0].upper()
@@ -877,14 +1124,18 @@ Transaction #{transaction_id} cannot be processed
         initial_amount = context.args[2]
         
         if currency not in ['THB', 'MMK', 'USDT']:
-            await update.message.reply_text("❌ Currency must be THB, MMK, or USDT")
+            await self.dispatcher.reply_text(update.message, "❌ Currency must be THB, MMK, or USDT")
             return
         
         try:
             amount = float(initial_amount)
-            self.db.set_balance(currency, bank_name, amount)
+            await self.db.set_balance(
+                currency, bank_name, amount,
+                note=f"/initbalance by {update.effective_user.username or update.effective_user.id}"
+            )
             
-            await update.message.reply_text(
+            await self.dispatcher.reply_text(
+                update.message,
                 f"✅ **Balance Initialized**\n\n"
                 f"Currency: {currency}\n"
                 f"Bank: {bank_name}\n"
@@ -892,7 +1143,7 @@ Transaction #{transaction_id} cannot be processed
                 parse_mode='Markdown'
             )
         except ValueError:
-            await update.message.reply_text("❌ Invalid amount format")
+            await self.dispatcher.reply_text(update.message, "❌ Invalid amount format")
 
     @admin_only
     async def update_display_name_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -910,23 +1161,24 @@ Transaction #{transaction_id} cannot be processed
 
 **Note:** Use `/listbanks` to see account IDs
 """
-            await update.message.reply_text(message, parse_mode='Markdown')
+            await self.dispatcher.reply_text(update.message, message, parse_mode='Markdown')
             return
         
         try:
             account_id = int(context.args[0])
             display_name = ' '.join(context.args[1:])
             
-            success = self.db.update_bank_display_name(account_id, display_name)
+            success = await self.db.update_bank_display_name(account_id, display_name)
             
             if success:
-                await update.message.reply_text(
+                await self.dispatcher.reply_text(
+                    update.message,
                     f"✅ **Display Name Updated**\n\n"
                     f"Account ID: {account_id}\n"
                     f"New Display Name: {display_name}",
                     parse_mode='Markdown'
                 )
             else:
-                await update.message.reply_text(f"❌ Account #{account_id} not found")
+                await self.dispatcher.reply_text(update.message, f"❌ Account #{account_id} not found")
         except ValueError:
-            await update.message.reply_text("❌ Invalid account ID")
+            await self.dispatcher.reply_text(update.message, "❌ Invalid account ID")
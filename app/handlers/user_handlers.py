@@ -4,15 +4,19 @@ User handlers for exchange operations
 import os
 import logging
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.error import TimedOut, NetworkError
 
 from app.config.settings import Config
-from app.services.database_service import DatabaseService
+from app.services.async_database_service import AsyncDatabaseService
 from app.services.ocr_service import OCRService
+from app.services.message_dispatcher import MessageDispatcher, Priority
+from app.services.receipt_store import ReceiptStore
 from app.utils.command_protection import private_chat_only, private_chat_only_callback
+from app.utils.telegram_utils import send_receipt_photo
 
 logger = logging.getLogger(__name__)
 
@@ -20,27 +24,66 @@ logger = logging.getLogger(__name__)
 class UserHandlers:
     """Handle user interactions for currency exchange"""
     
-    def __init__(self, db_service: DatabaseService, ocr_service: OCRService):
+    def __init__(
+        self,
+        db_service: AsyncDatabaseService,
+        ocr_service: OCRService,
+        receipt_store: Optional[ReceiptStore] = None,
+        dispatcher: Optional[MessageDispatcher] = None
+    ):
         """
         Initialize user handlers
         
         Args:
-            db_service: Database service instance
+            db_service: Async database service instance
             ocr_service: OCR service instance
+            receipt_store: Content-addressed receipt storage (defaults to RECEIPT_STORE_DIR)
+            dispatcher: Outbound message queue (shared with admin handlers)
         """
         self.db = db_service
         self.ocr = ocr_service
         self.config = Config
+        self.receipts = receipt_store or ReceiptStore(Config.RECEIPT_STORE_DIR)
+        self.dispatcher = dispatcher or MessageDispatcher()
+        
+        # Prerendered screens: direction prompts are static, the welcome
+        # screen is rebuilt when db.display_version moves
+        self._direction_prompts = {
+            currency: self._render_direction_prompt(currency) for currency in ('THB', 'MMK')
+        }
+        self._welcome: Optional[Tuple[int, str, InlineKeyboardMarkup]] = None
         logger.info("User handlers initialized")
     
-    @private_chat_only
-    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Start command handler"""
-        rate = self.db.get_current_rate()
+    def _render_direction_prompt(self, currency: str) -> str:
+        """Build the receipt upload prompt shown after choosing a direction"""
+        return (
+            f"📸 **Step 1: Upload {currency} Payment Receipt**\n\n"
+            f"Please upload your {currency} payment receipt screenshot.\n\n"
+            "✅ Make sure the receipt shows:\n"
+            f"• Transfer amount ({currency})\n"
+            "• Bank names (sender and receiver)\n"
+            "• Transaction status (successful)\n"
+            "• Date and reference number\n\n"
+            "📷 Send a clear screenshot now:"
+        )
+    
+    async def _get_welcome_screen(self) -> Tuple[str, InlineKeyboardMarkup]:
+        """
+        Get the /start text and keyboard, rebuilding them only after the rate,
+        an active account or a display name changed
+        
+        Returns:
+            Tuple of (welcome text, reply markup)
+        """
+        version = self.db.display_version
+        if self._welcome and self._welcome[0] == version:
+            return self._welcome[1], self._welcome[2]
+        
+        rate = await self.db.get_current_rate()
         
         # Get THB and MMK admin accounts from database
-        thb_accounts = self.db.get_bank_accounts('THB')
-        mmk_accounts = self.db.get_bank_accounts('MMK')
+        thb_accounts = await self.db.get_bank_accounts('THB')
+        mmk_accounts = await self.db.get_bank_accounts('MMK')
         
         # Build THB accounts section
         thb_section = "🇹🇭 **THB Banks:**\n"
@@ -81,7 +124,22 @@ Ready to exchange? Choose your direction:
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(welcome_message, reply_markup=reply_markup, parse_mode='Markdown')
+        # Cached under the version read before the queries, so a change made
+        # while they ran triggers another rebuild on the next /start
+        self._welcome = (version, welcome_message, reply_markup)
+        logger.info(f"Welcome screen rendered (display version {version})")
+        return welcome_message, reply_markup
+    
+    @private_chat_only
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Start command handler"""
+        welcome_message, reply_markup = await self._get_welcome_screen()
+        await self.dispatcher.reply_text(
+            update.message,
+            welcome_message,
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
     
     @private_chat_only_callback
     async def start_exchange_thb_to_mmk(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -94,17 +152,7 @@ Ready to exchange? Choose your direction:
         context.user_data['from_currency'] = 'THB'
         context.user_data['to_currency'] = 'MMK'
         
-        await query.edit_message_text(
-            "📸 **Step 1: Upload THB Payment Receipt**\n\n"
-            "Please upload your THB payment receipt screenshot.\n\n"
-            "✅ Make sure the receipt shows:\n"
-            "• Transfer amount (THB)\n"
-            "• Bank names (sender and receiver)\n"
-            "• Transaction status (successful)\n"
-            "• Date and reference number\n\n"
-            "📷 Send a clear screenshot now:",
-            parse_mode='Markdown'
-        )
+        await self.dispatcher.edit_text(query.message, self._direction_prompts['THB'], parse_mode='Markdown')
         
         return self.config.UPLOAD_RECEIPT
     
@@ -119,17 +167,7 @@ Ready to exchange? Choose your direction:
         context.user_data['from_currency'] = 'MMK'
         context.user_data['to_currency'] = 'THB'
         
-        await query.edit_message_text(
-            "📸 **Step 1: Upload MMK Payment Receipt**\n\n"
-            "Please upload your MMK payment receipt screenshot.\n\n"
-            "✅ Make sure the receipt shows:\n"
-            "• Transfer amount (MMK)\n"
-            "• Bank names (sender and receiver)\n"
-            "• Transaction status (successful)\n"
-            "• Date and reference number\n\n"
-            "📷 Send a clear screenshot now:",
-            parse_mode='Markdown'
-        )
+        await self.dispatcher.edit_text(query.message, self._direction_prompts['MMK'], parse_mode='Markdown')
         
         return self.config.UPLOAD_RECEIPT
     
@@ -143,41 +181,70 @@ Ready to exchange? Choose your direction:
         from_currency = context.user_data.get('from_currency', 'THB')
         to_currency = context.user_data.get('to_currency', 'MMK')
         
-        # Download photo with retry logic for network timeouts
-        max_retries = 3
-        retry_delay = 2
+        # Skip download and OCR if this exact photo was already processed
+        indexed = await self.db.get_receipt_file(photo.file_unique_id)
+        
+        image_bytes = None
         
-        for attempt in range(max_retries):
+        if indexed and os.path.exists(indexed['file_path']):
+            file_path = indexed['file_path']
+            logger.info(f"Reusing stored receipt for file {photo.file_unique_id}: {file_path}")
+        else:
+            # Download photo into memory with retry logic for network timeouts
+            max_retries = 3
+            retry_delay = 2
+            
+            for attempt in range(max_retries):
+                try:
+                    file = await context.bot.get_file(photo.file_id)
+                    image_bytes = bytes(await file.download_as_bytearray())
+                    break
+                except (TimedOut, NetworkError) as e:
+                    if attempt < max_retries - 1:
+                        logger.warning(f"Network timeout on attempt {attempt + 1}, retrying in {retry_delay}s...")
+                        await asyncio.sleep(retry_delay)
+                        retry_delay *= 2  # Exponential backoff
+                    else:
+                        logger.error(f"Failed to download receipt after {max_retries} attempts: {e}")
+                        await self.dispatcher.reply_text(
+                            update.message,
+                            "❌ **Network Error**\n\n"
+                            "Unable to download your receipt due to network issues.\n\n"
+                            "Please try again in a moment. If the problem persists, "
+                            "try sending a smaller image or contact support."
+                        )
+                        return self.config.UPLOAD_RECEIPT
+            
+            # Persist original to the hash-named store off the event loop; OCR reads from memory.
+            # Only a stored file is registered - otherwise the receipt travels by file_id alone
             try:
-                file = await context.bot.get_file(photo.file_id)
-                file_path = f"{self.config.RECEIPTS_DIR}/{update.message.from_user.id}_{datetime.now().timestamp()}.jpg"
-                await file.download_to_drive(file_path)
-                break
-            except (TimedOut, NetworkError) as e:
-                if attempt < max_retries - 1:
-                    logger.warning(f"Network timeout on attempt {attempt + 1}, retrying in {retry_delay}s...")
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    logger.error(f"Failed to download receipt after {max_retries} attempts: {e}")
-                    await update.message.reply_text(
-                        "❌ **Network Error**\n\n"
-                        "Unable to download your receipt due to network issues.\n\n"
-                        "Please try again in a moment. If the problem persists, "
-                        "try sending a smaller image or contact support."
-                    )
-                    return self.config.UPLOAD_RECEIPT
-        
-        # Store file path in context
+                content_hash, file_path = await asyncio.to_thread(self.receipts.put, image_bytes)
+            except OSError as e:
+                logger.error(f"Error storing receipt for file {photo.file_unique_id}: {e}")
+                file_path = None
+            else:
+                await self.db.register_receipt_blob(content_hash, file_path, len(image_bytes))
+                await self.db.save_receipt_file(photo.file_unique_id, file_path)
+        
+        # Store file path in context and keep the file from retention until the transaction references it
         context.user_data['receipt_path'] = file_path
+        if file_path:
+            held_until = datetime.now() + timedelta(hours=self.config.RECEIPT_HOLD_HOURS)
+            await self.db.hold_receipt_blob(update.effective_user.id, file_path, held_until)
+        context.user_data['receipt_file_id'] = photo.file_id
         
-        processing_msg = await update.message.reply_text("🔍 Processing your receipt... Please wait.")
+        processing_msg = await self.dispatcher.reply_text(update.message, "🔍 Processing your receipt... Please wait.")
         
-        # Extract receipt info using OCR
-        receipt_info = self.ocr.extract_receipt_info(file_path)
+        # Extract receipt info using OCR (reuse indexed result for resubmitted photos)
+        receipt_info = indexed['ocr_result'] if indexed else None
+        if not receipt_info:
+            receipt_info = await self.ocr.aextract_receipt_info(image_bytes or file_path)
+            if receipt_info and file_path:
+                await self.db.save_receipt_file(photo.file_unique_id, file_path, receipt_info)
         
         if not receipt_info:
             await self._send_message_with_retry(
+                processing_msg.chat_id,
                 processing_msg.edit_text,
                 "❌ Unable to read your receipt clearly.\n\n"
                 "Please send a clearer screenshot with all details visible."
@@ -189,6 +256,7 @@ Ready to exchange? Choose your direction:
         # Validate receipt status
         if receipt_info.get('status') and 'success' not in receipt_info['status'].lower():
             await self._send_message_with_retry(
+                processing_msg.chat_id,
                 processing_msg.edit_text,
                 "⚠️ Your transaction doesn't appear to be successful.\n\n"
                 "Please check your transaction status and resend a successful receipt."
@@ -201,11 +269,11 @@ Ready to exchange? Choose your direction:
         
         if receiver_name:
             # Validate against the currency being sent
-            admin_account = self.db.validate_receiver_account(receiver_name, receiver_bank, from_currency)
+            admin_account = await self.db.validate_receiver_account(receiver_name, receiver_bank, from_currency)
             
             if not admin_account:
                 # Get all admin accounts to show in error message
-                all_accounts = self.db.get_bank_accounts(from_currency)
+                all_accounts = await self.db.get_bank_accounts(from_currency)
                 
                 error_msg = f"❌ **Invalid Receiver Account**\n\n"
                 error_msg += f"📋 **Detected from receipt:**\n"
@@ -225,7 +293,7 @@ Ready to exchange? Choose your direction:
                 error_msg += f"Please make sure you transferred to one of our official accounts.\n"
                 error_msg += f"If you believe this is an error, contact admin."
                 
-                await self._send_message_with_retry(processing_msg.edit_text, error_msg)
+                await self._send_message_with_retry(processing_msg.chat_id, processing_msg.edit_text, error_msg)
                 return self.config.UPLOAD_RECEIPT
             
             # Store validated admin bank info
@@ -242,7 +310,7 @@ Ready to exchange? Choose your direction:
             from app.utils.currency_utils import calculate_exchange
             
             amount = float(receipt_info['amount'])
-            rate = self.db.get_current_rate()
+            rate = await self.db.get_current_rate()
             
             # Calculate with proper rounding
             sent_amount, received_amount = calculate_exchange(
@@ -291,6 +359,7 @@ Ready to exchange? Choose your direction:
             
             # Try to edit message with retry logic
             await self._send_message_with_retry(
+                processing_msg.chat_id,
                 processing_msg.edit_text,
                 success_message,
                 parse_mode='Markdown'
@@ -305,6 +374,7 @@ Ready to exchange? Choose your direction:
             
             # Try to edit message with retry logic
             await self._send_message_with_retry(
+                processing_msg.chat_id,
                 processing_msg.edit_text,
                 amount_message
             )
@@ -325,7 +395,7 @@ Ready to exchange? Choose your direction:
             from_currency = context.user_data.get('from_currency', 'THB')
             to_currency = context.user_data.get('to_currency', 'MMK')
             
-            rate = self.db.get_current_rate()
+            rate = await self.db.get_current_rate()
             
             # Calculate with proper rounding
             sent_amount, received_amount = calculate_exchange(
@@ -348,7 +418,8 @@ Ready to exchange? Choose your direction:
             else:
                 receive_text = f"{received_amount:,.2f} {to_currency}"
             
-            await update.message.reply_text(
+            await self.dispatcher.reply_text(
+                update.message,
                 f"✅ **Amount Confirmed**\n\n"
                 f"💰 Amount: **{amount_text}**\n"
                 f"📊 You will receive: **{receive_text}**\n"
@@ -363,7 +434,8 @@ Ready to exchange? Choose your direction:
             )
             return self.config.ENTER_BANK_INFO
         except ValueError:
-            await update.message.reply_text(
+            await self.dispatcher.reply_text(
+                update.message,
                 "❌ Invalid amount. Please enter a valid number:\n\n"
                 "Example: 1000"
             )
@@ -375,7 +447,8 @@ Ready to exchange? Choose your direction:
         bank_info = update.message.text.split('|')
         
         if len(bank_info) != 3:
-            await update.message.reply_text(
+            await self.dispatcher.reply_text(
+                update.message,
                 "❌ Invalid format.\n\n"
                 "Please use this format:\n"
                 "`Bank Name | Account Number | Account Name`\n\n"
@@ -394,11 +467,13 @@ Ready to exchange? Choose your direction:
         from_currency = context.user_data.get('from_currency', 'THB')
         to_currency = context.user_data.get('to_currency', 'MMK')
         
-        # Validate bank name based on receiving currency
-        supported_banks = self.config.MMK_BANKS if to_currency == 'MMK' else self.config.THB_BANKS
-        if not any(bank.lower() in bank_name.lower() for bank in supported_banks):
+        # Validate bank name based on receiving currency (registry includes banks added at runtime)
+        bank_registry = self.db.bank_registry
+        if bank_registry.resolve(bank_name, currency=to_currency) is None:
+            supported_banks = bank_registry.display_names(to_currency)
             banks_list = '\n'.join([f"• {bank}" for bank in supported_banks])
-            await update.message.reply_text(
+            await self.dispatcher.reply_text(
+                update.message,
                 f"⚠️ Please use one of the supported {to_currency} banks:\n\n"
                 f"{banks_list}\n\n"
                 f"Please resend in correct format."
@@ -413,7 +488,7 @@ Ready to exchange? Choose your direction:
         # Get amounts
         sent_amount = context.user_data['sent_amount']
         received_amount = context.user_data['received_amount']
-        rate = self.db.get_current_rate()
+        rate = await self.db.get_current_rate()
         
         # Get sender bank from receipt
         receipt_info = context.user_data.get('receipt_info', {})
@@ -423,7 +498,7 @@ Ready to exchange? Choose your direction:
         admin_receiving_bank = context.user_data.get('admin_receiving_bank', receipt_info.get('receiver_bank', 'Unknown'))
         
         # Create transaction
-        transaction_id = self.db.create_transaction(
+        transaction_id = await self.db.create_transaction(
             user_id=update.message.from_user.id,
             username=update.message.from_user.username,
             exchange_direction=exchange_direction,
@@ -437,11 +512,16 @@ Ready to exchange? Choose your direction:
             user_account_name=account_name,
             from_bank=from_bank,
             admin_receiving_bank=admin_receiving_bank,
-            receipt_path=context.user_data.get('receipt_path')
+            receipt_path=context.user_data.get('receipt_path'),
+            receipt_file_id=context.user_data.get('receipt_file_id')
         )
+        await self.db.release_receipt_blob(update.message.from_user.id)
         
-        # Update balance - add to admin account for received currency
-        self.db.update_balance(from_currency, admin_receiving_bank, sent_amount)
+        # Update balance - credit admin account for received currency
+        await self.db.update_balance(
+            from_currency, admin_receiving_bank, sent_amount,
+            entry_type='credit', transaction_id=transaction_id
+        )
         
         # Notify admin
         await self._notify_admin(
@@ -462,7 +542,8 @@ Ready to exchange? Choose your direction:
 
         calculation_symbol = 'x' if from_currency == 'THB' or to_currency == 'MMK' else '/'
         
-        await update.message.reply_text(
+        await self.dispatcher.reply_text(
+            update.message,
             f"**Buy {sent_amount} {calculation_symbol} {rate} = {received_amount:,.2f} **\n\n"
             f"{account_number}\n"
             f"{account_name}\n"
@@ -475,30 +556,33 @@ Ready to exchange? Choose your direction:
         
         return ConversationHandler.END
     
-    async def _send_message_with_retry(self, send_func, *args, **kwargs):
+    async def _send_message_with_retry(
+        self,
+        chat_id,
+        send_func,
+        /,
+        *args,
+        priority: Priority = Priority.INTERACTIVE,
+        **kwargs
+    ):
         """
-        Send or edit a message with retry logic for network timeouts
+        Send or edit a message through the dispatcher
+        
+        The dispatcher applies flood limits and retries network timeouts.
         
         Args:
+            chat_id: Chat the message goes to
             send_func: The function to call (e.g., message.edit_text, message.reply_text)
             *args: Positional arguments for the function
+            priority: Send priority
             **kwargs: Keyword arguments for the function
         """
-        max_retries = 3
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                return await send_func(*args, **kwargs)
-            except (TimedOut, NetworkError) as e:
-                if attempt < max_retries - 1:
-                    logger.warning(f"Network timeout on attempt {attempt + 1}, retrying in {retry_delay}s...")
-                    await asyncio.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    logger.error(f"Failed to send message after {max_retries} attempts: {e}")
-                    # Don't raise, just log - the user will see the previous message
-                    return None
+        try:
+            return await self.dispatcher.send(chat_id, send_func, *args, priority=priority, **kwargs)
+        except (TimedOut, NetworkError) as e:
+            logger.error(f"Failed to send message after retries: {e}")
+            # Don't raise, just log - the user will see the previous message
+            return None
     
     async def _notify_admin(self, context, transaction_id, user, exchange_direction,
                            from_currency, to_currency, sent_amount, received_amount,
@@ -529,71 +613,61 @@ Ready to exchange? Choose your direction:
         
         try:
             # Get admin group and topic from database
-            admin_group_id = self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
-            admin_topic_id = self.db.get_setting('admin_topic_id') or self.config.ADMIN_TOPIC_ID
+            admin_group_id = await self.db.get_setting('admin_group_id') or self.config.ADMIN_GROUP_ID
+            admin_topic_id = await self.db.get_setting('admin_topic_id') or self.config.ADMIN_TOPIC_ID
             
-            # Get receipt path from transaction in database
-            transaction = self.db.get_transaction(transaction_id)
+            # Get receipt file_id and path from transaction in database
+            transaction = await self.db.get_transaction(transaction_id)
+            receipt_file_id = transaction.receipt_file_id if transaction else None
             receipt_path = transaction.receipt_path if transaction else None
             
-            logger.info(f"Notifying admin for transaction #{transaction_id}, receipt_path: {receipt_path}")
+            logger.info(
+                f"Notifying admin for transaction #{transaction_id}, "
+                f"receipt_file_id: {receipt_file_id}, receipt_path: {receipt_path}"
+            )
             
-            if receipt_path:
-                logger.info(f"Receipt path exists check: {os.path.exists(receipt_path)}")
-                if not os.path.exists(receipt_path):
-                    logger.warning(f"Receipt file not found at: {receipt_path}")
+            # Re-send the user's photo by file_id (no upload); disk is the fallback
+            photo_kwargs = {'message_thread_id': int(admin_topic_id)} if admin_topic_id else {}
+            sent = await self._send_message_with_retry(
+                admin_group_id,
+                send_receipt_photo,
+                context.bot,
+                admin_group_id,
+                file_id=receipt_file_id,
+                file_path=receipt_path,
+                caption=admin_message,
+                reply_markup=reply_markup,
+                parse_mode='Markdown',
+                priority=Priority.ADMIN,
+                **photo_kwargs
+            )
             
-            if receipt_path and os.path.exists(receipt_path):
-                logger.info(f"Sending notification WITH photo")
-                # Send with photo
-                if admin_topic_id:
-                    await self._send_message_with_retry(
-                        context.bot.send_photo,
-                        chat_id=admin_group_id,
-                        photo=open(receipt_path, 'rb'),
-                        caption=admin_message,
-                        message_thread_id=int(admin_topic_id),
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-                else:
-                    await self._send_message_with_retry(
-                        context.bot.send_photo,
-                        chat_id=admin_group_id,
-                        photo=open(receipt_path, 'rb'),
-                        caption=admin_message,
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
+            if sent:
+                logger.info("Notification sent WITH photo")
             else:
                 # Send without photo (fallback)
                 logger.info(f"Sending notification WITHOUT photo (receipt_path: {receipt_path})")
-                if admin_topic_id:
-                    await self._send_message_with_retry(
-                        context.bot.send_message,
-                        chat_id=admin_group_id,
-                        text=admin_message,
-                        message_thread_id=int(admin_topic_id),
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
-                else:
-                    await self._send_message_with_retry(
-                        context.bot.send_message,
-                        chat_id=admin_group_id,
-                        text=admin_message,
-                        reply_markup=reply_markup,
-                        parse_mode='Markdown'
-                    )
+                await self._send_message_with_retry(
+                    admin_group_id,
+                    context.bot.send_message,
+                    chat_id=admin_group_id,
+                    text=admin_message,
+                    reply_markup=reply_markup,
+                    parse_mode='Markdown',
+                    priority=Priority.ADMIN,
+                    **photo_kwargs
+                )
         except Exception as e:
             logger.error(f"Error sending to admin: {e}")
     
     @private_chat_only
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Cancel the conversation"""
-        await update.message.reply_text(
+        await self.dispatcher.reply_text(
+            update.message,
             "❌ Operation cancelled.\n\n"
             "Use /start to begin again."
         )
+        await self.db.release_receipt_blob(update.effective_user.id)
         context.user_data.clear()
         return ConversationHandler.END
@@ -1,5 +1,5 @@
 """Bank account data model"""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 
@@ -17,6 +17,7 @@ class BankAccount:
     display_name: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    normalized_name: str = field(default="", repr=False, compare=False)  # Precomputed for name matching
     
     @property
     def display(self) -> str:
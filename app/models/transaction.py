@@ -30,6 +30,8 @@ class Transaction:
     admin_receiving_bank: str = ""
     receipt_path: Optional[str] = None
     admin_receipt_path: Optional[str] = None
+    receipt_file_id: Optional[str] = None  # Telegram file_id, re-sent without uploading
+    admin_receipt_file_id: Optional[str] = None
     status: str = "pending"
     created_at: Optional[datetime] = None
     confirmed_at: Optional[datetime] = None
@@ -63,6 +65,8 @@ class Transaction:
             'admin_receiving_bank': self.admin_receiving_bank,
             'receipt_path': self.receipt_path,
             'admin_receipt_path': self.admin_receipt_path,
+            'receipt_file_id': self.receipt_file_id,
+            'admin_receipt_file_id': self.admin_receipt_file_id,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'confirmed_at': self.confirmed_at.isoformat() if self.confirmed_at else None,
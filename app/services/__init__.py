@@ -1,5 +1,17 @@
 """Service modules"""
 from .database_service import DatabaseService
+from .async_database_service import AsyncDatabaseService
 from .ocr_service import OCRService
+from .image_processor import ImageProcessor
+from .ocr_backends import OCRBackend, create_ocr_backend
+from .receipt_store import ReceiptStore
+from .message_dispatcher import MessageDispatcher, Priority
+from .balance_dashboard import BalanceDashboard
+from .webhook_server import WebhookServer
+from .update_processor import KeyedUpdateProcessor
+from .sqlite_persistence import SQLitePersistence
 
-__all__ = ['DatabaseService', 'OCRService']
+__all__ = ['DatabaseService', 'AsyncDatabaseService', 'OCRService', 'ImageProcessor', 'OCRBackend', 'create_ocr_backend',
+           'ReceiptStore', 'MessageDispatcher', 'Priority',
+           'BalanceDashboard', 'WebhookServer', 'KeyedUpdateProcessor',
+           'SQLitePersistence']
@@ -0,0 +1,151 @@
+"""
+Async facade over DatabaseService
+Runs database calls off the event loop: writes on a single ordered writer
+thread, reads concurrently on a small reader pool
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.services.database_service import DatabaseService
+from app.utils.bank_registry import BankRegistry
+
+logger = logging.getLogger(__name__)
+
+
+# Methods that only read; they run on the reader pool
+READ_METHODS = frozenset({
+    'get_current_rate',
+    'get_bank_accounts',
+    'get_balances',
+    'get_balance',
+    'get_balance_at',
+    'get_ledger_history',
+    'get_transaction',
+    'get_recent_transactions',
+    'get_transactions_page',
+    'get_transaction_summary',
+    'get_user_recent_pending_transaction',
+    'validate_receiver_account',
+    'get_setting',
+    'get_ocr_cache',
+    'get_receipt_file',
+    'get_receipt_blob',
+    'get_receipt_blobs_to_remove',
+    'get_receipt_blobs_to_recompress',
+    'get_persistence_entries',
+    'get_cache_stats',
+})
+
+# Methods that change data; they run in call order on the writer thread
+WRITE_METHODS = frozenset({
+    'initialize_exchange_rate',
+    'initialize_balances',
+    'update_rate',
+    'add_bank_account',
+    'add_admin_bank_account',
+    'deactivate_admin_bank_account',
+    'update_bank_display_name',
+    'set_balance',
+    'update_balance',
+    'create_transaction',
+    'update_transaction_status',
+    'confirm_transaction',
+    'cancel_transaction',
+    'update_transaction_admin_receipt',
+    'update_transaction_received_amount',
+    'set_setting',
+    'set_ocr_cache',
+    'touch_ocr_cache',
+    'register_receipt_blob',
+    'hold_receipt_blob',
+    'release_receipt_blob',
+    'mark_receipt_blob_compressed',
+    'mark_receipt_blob_removed',
+    'save_receipt_file',
+    'write_persistence_entries',
+})
+
+
+class AsyncDatabaseService:
+    """
+    Awaitable versions of the DatabaseService methods in READ_METHODS and WRITE_METHODS
+    
+    Writes are submitted to one writer thread in call order, so they commit in
+    the order handlers issued them. Reads run concurrently on reader threads
+    (WAL mode keeps them from blocking the writer) but first wait for any write
+    issued before them, so a handler always reads its own writes.
+    
+    Nothing else of the wrapped service is reachable, so no caller can touch
+    the database outside the writer and reader threads.
+    """
+    
+    def __init__(self, db_service: DatabaseService, read_workers: int = 4):
+        """
+        Initialize async database facade
+        
+        Args:
+            db_service: Synchronous database service to wrap
+            read_workers: Number of reader threads
+        """
+        self.db = db_service
+        self.read_workers = max(1, read_workers)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._readers = ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix='db-reader')
+        self._last_write: Optional[asyncio.Future] = None
+        logger.info(f"Async database service initialized ({self.read_workers} readers, 1 writer)")
+    
+    @property
+    def bank_registry(self) -> BankRegistry:
+        """Bank alias registry (in memory, safe to use from the event loop)"""
+        return self.db.bank_registry
+    
+    @property
+    def display_version(self) -> int:
+        """Counter bumped whenever rate or account data shown to users changes"""
+        return self.db.display_version
+    
+    def __getattr__(self, name: str) -> Any:
+        if name in READ_METHODS:
+            wrapper = self._read_wrapper(getattr(self.db, name))
+        elif name in WRITE_METHODS:
+            wrapper = self._write_wrapper(getattr(self.db, name))
+        else:
+            raise AttributeError(f"'{type(self).__name__}' has no database method '{name}'")
+        
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, wrapper)
+        return wrapper
+    
+    def _write_wrapper(self, method: Callable) -> Callable:
+        """Wrap a write method; the call is queued as soon as it is made"""
+        @functools.wraps(method)
+        def submit(*args, **kwargs) -> asyncio.Future:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._writer, functools.partial(method, *args, **kwargs))
+            self._last_write = future
+            return future
+        return submit
+    
+    def _read_wrapper(self, method: Callable) -> Callable:
+        """Wrap a read method; it runs after all previously issued writes"""
+        @functools.wraps(method)
+        def submit(*args, **kwargs):
+            return self._read(self._last_write, functools.partial(method, *args, **kwargs))
+        return submit
+    
+    async def _read(self, pending_write: Optional[asyncio.Future], call: Callable) -> Any:
+        """Wait for pending_write (ignoring its outcome) then run call on a reader"""
+        if pending_write is not None and not pending_write.done():
+            await asyncio.wait([pending_write])
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, call)
+    
+    def close(self):
+        """Finish queued writes, stop worker threads and close connections"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self.db.close()
+        logger.info("Async database service closed")
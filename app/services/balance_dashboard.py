@@ -0,0 +1,250 @@
+"""
+Balance dashboard
+Keeps one pinned balance message per currency in the balance topic and edits
+it in place, coalescing bursts of balance changes into a single edit
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from telegram.error import BadRequest
+
+from app.services.message_dispatcher import MessageDispatcher, Priority
+
+logger = logging.getLogger(__name__)
+
+# bot_settings keys (suffixed with the currency)
+MESSAGE_SETTING = 'balance_dashboard_message_'
+LOG_SETTING = 'balance_dashboard_log_'
+
+
+class BalanceDashboard:
+    """Debounced, edit-in-place balance messages with a compact change log"""
+
+    def __init__(
+        self,
+        db_service,
+        dispatcher: MessageDispatcher,
+        debounce_seconds: float = 10.0,
+        log_size: int = 10
+    ):
+        """
+        Initialize dashboard
+
+        Args:
+            db_service: Async database service (balances, bot_settings)
+            dispatcher: Outbound message queue
+            debounce_seconds: Changes within this window are published in one edit
+            log_size: Number of recent balance changes shown per currency
+        """
+        self.db = db_service
+        self.dispatcher = dispatcher
+        self.debounce_seconds = debounce_seconds
+        self.log_size = log_size
+
+        self._logs: Dict[str, Deque[str]] = {}
+        self._rendered: Dict[str, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pending_target: Optional[tuple] = None
+        self._dirty = False
+        self._flush_lock = asyncio.Lock()
+        self.stats = {'changes': 0, 'flushes': 0, 'edits': 0, 'sends': 0, 'skipped': 0}
+
+    async def _get_log(self, currency: str) -> Deque[str]:
+        """Get change log for a currency, restoring it from bot_settings once"""
+        log = self._logs.get(currency)
+        if log is None:
+            stored = await self.db.get_setting(LOG_SETTING + currency)
+            try:
+                entries = json.loads(stored) if stored else []
+            except ValueError:
+                entries = []
+            log = deque(entries, maxlen=self.log_size)
+            self._logs[currency] = log
+        return log
+
+    async def record_change(
+        self,
+        currency: str,
+        bank: str,
+        before: Optional[float],
+        after: Optional[float],
+        transaction_id: Optional[int] = None
+    ):
+        """
+        Add a balance change to the currency's change log
+
+        Changes that don't move the balance are ignored, as are changes with
+        an unknown balance (the bank has no active account).
+
+        Args:
+            currency: Currency code
+            bank: Bank (display) name
+            before: Balance before the change
+            after: Balance after the change
+            transaction_id: Transaction that caused the change (optional)
+        """
+        if before is None or after is None:
+            return
+
+        delta = round(after - before, 2)
+        if delta == 0:
+            return
+
+        source = f"#{transaction_id}" if transaction_id else "adj"
+        entry = f"{datetime.now():%H:%M} {source} {bank} {delta:+,.2f} → {after:,.2f}"
+        (await self._get_log(currency)).append(entry)
+        self.stats['changes'] += 1
+
+    def schedule(self, bot, chat_id, thread_id: Optional[int] = None):
+        """
+        Publish the dashboard after the debounce window
+
+        Calls inside the window share one pending publish. A call made while
+        a publish is running schedules another one once it finishes.
+
+        Args:
+            bot: Bot instance
+            chat_id: Admin group ID
+            thread_id: Balance topic ID (optional)
+        """
+        self._pending_target = (bot, chat_id, thread_id)
+        self._dirty = True
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # A change recorded after a flush read the balances sets _dirty again
+        while self._dirty:
+            await asyncio.sleep(self.debounce_seconds)
+            self._dirty = False
+            try:
+                await self.flush(*self._pending_target)
+            except Exception as e:
+                logger.error(f"Error publishing balance dashboard: {e}")
+
+    def render(self, currency: str, rows: List[Tuple[str, float, Optional[str]]], log: Deque[str]) -> str:
+        """
+        Build dashboard text for one currency
+
+        Args:
+            currency: Currency code
+            rows: (bank, balance, display_name) for the currency
+            log: Recent changes, oldest first
+
+        Returns:
+            Message text (Markdown)
+        """
+        lines = [f"**{currency} Balances**", ""]
+        total = 0.0
+        for bank, balance, display in rows:
+            lines.append(f"{display or bank} - {balance:,.2f}")
+            total += balance
+        lines.append(f"Total - {total:,.2f}")
+
+        if log:
+            lines.extend(["", "Recent changes:"])
+            lines.extend(f"`{entry}`" for entry in log)
+
+        lines.extend(["", f"_Updated {datetime.now():%Y-%m-%d %H:%M:%S}_"])
+        return "\n".join(lines)
+
+    async def flush(self, bot, chat_id, thread_id: Optional[int] = None):
+        """
+        Publish current balances now, editing each currency's message in place
+
+        Currencies whose balances and change log are unchanged are skipped.
+
+        Args:
+            bot: Bot instance
+            chat_id: Admin group ID
+            thread_id: Balance topic ID (optional)
+        """
+        async with self._flush_lock:
+            self.stats['flushes'] += 1
+            balances = await self.db.get_balances()
+
+            by_currency: Dict[str, List[Tuple[str, float, Optional[str]]]] = {}
+            for currency, bank, balance, display in balances:
+                by_currency.setdefault(currency, []).append((bank, balance, display))
+
+            for currency, rows in by_currency.items():
+                log = await self._get_log(currency)
+                # Compare without the timestamp line so unchanged balances aren't re-sent
+                body = self.render(currency, rows, log)
+                content = body.rsplit("\n", 1)[0]
+                if self._rendered.get(currency) == content:
+                    self.stats['skipped'] += 1
+                    continue
+
+                await self._publish(bot, chat_id, thread_id, currency, body)
+                self._rendered[currency] = content
+                await self.db.set_setting(LOG_SETTING + currency, json.dumps(list(log), ensure_ascii=False))
+
+    async def _publish(self, bot, chat_id, thread_id: Optional[int], currency: str, text: str):
+        """Edit the currency's dashboard message, or send and pin a new one"""
+        stored = await self.db.get_setting(MESSAGE_SETTING + currency)
+        location = json.loads(stored) if stored else None
+
+        if location and str(location.get('chat_id')) == str(chat_id) and location.get('thread_id') == thread_id:
+            try:
+                await self.dispatcher.send(
+                    chat_id,
+                    bot.edit_message_text,
+                    chat_id=chat_id,
+                    message_id=location['message_id'],
+                    text=text,
+                    parse_mode='Markdown',
+                    priority=Priority.BROADCAST
+                )
+                self.stats['edits'] += 1
+                return
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    return
+                logger.warning(f"Balance dashboard message for {currency} not editable, sending a new one: {e}")
+
+        topic_kwargs = {'message_thread_id': thread_id} if thread_id else {}
+        message = await self.dispatcher.send_message(
+            bot,
+            chat_id,
+            priority=Priority.BROADCAST,
+            text=text,
+            parse_mode='Markdown',
+            **topic_kwargs
+        )
+        self.stats['sends'] += 1
+        await self.db.set_setting(
+            MESSAGE_SETTING + currency,
+            json.dumps({'chat_id': chat_id, 'thread_id': thread_id, 'message_id': message.message_id})
+        )
+
+        try:
+            await self.dispatcher.send(
+                chat_id,
+                bot.pin_chat_message,
+                chat_id=chat_id,
+                message_id=message.message_id,
+                disable_notification=True,
+                priority=Priority.BROADCAST
+            )
+        except Exception as e:
+            logger.warning(f"Could not pin balance dashboard for {currency}: {e}")
+
+    async def close(self):
+        """Publish any pending update immediately"""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._dirty = False
+            try:
+                await self.flush(*self._pending_target)
+            except Exception as e:
+                logger.error(f"Error publishing balance dashboard: {e}")
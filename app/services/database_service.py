@@ -2,38 +2,189 @@
 Database service for managing transactions and balances
 Improved with better error handling and data models
 """
+import json
 import sqlite3
-from datetime import datetime
-from typing import List, Tuple, Optional
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Hashable, List, Tuple, Optional, Dict
 import logging
 from pathlib import Path
 
 from app.models import Transaction, ExchangeDirection, BankAccount
+from app.utils.bank_registry import BankRegistry, get_bank_registry
+from app.utils.similarity import normalize_name, name_similarity, NameIndex
 
 logger = logging.getLogger(__name__)
 
 
+def utc_now() -> datetime:
+    """Current UTC time as a naive datetime, the clock CURRENT_TIMESTAMP columns use"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Convert an aware datetime to naive UTC; naive values are taken as UTC already"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
 class DatabaseService:
     """Manages SQLite database operations with improved structure"""
     
-    def __init__(self, db_path: str):
+    def __init__(
+        self,
+        db_path: str,
+        cache_size_kb: int = 16384,
+        mmap_size: int = 64 * 1024 * 1024,
+        busy_timeout_ms: int = 5000,
+        bank_registry: Optional[BankRegistry] = None
+    ):
         """
         Initialize database service
         
         Args:
             db_path: Path to SQLite database file
+            cache_size_kb: Page cache size per connection in KiB
+            mmap_size: Bytes of the database file to memory-map (0 disables)
+            busy_timeout_ms: How long a writer waits for the write lock
+            bank_registry: Bank alias resolver (defaults to the shared registry)
         """
         self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        
+        # One long-lived connection per thread (event loop thread plus workers)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        
+        # Read-through cache for configuration data (rate, settings, bank accounts)
+        self._cache: Dict[Tuple, Any] = {}
+        self._cache_version = 0
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # Bumped by writes that change what users are shown (rate, active accounts, display names)
+        self.display_version = 0
+        
+        # Per-currency trigram index over active account names (built lazily)
+        self._name_indexes: Dict[str, NameIndex] = {}
+        self._name_index_lock = threading.Lock()
+        
+        self.bank_registry = bank_registry or get_bank_registry()
+        
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self.init_database()
+        self._register_account_banks()
         logger.info(f"Database service initialized: {db_path}")
     
-    def get_connection(self) -> sqlite3.Connection:
-        """Get database connection with row factory"""
-        conn = sqlite3.connect(self.db_path)
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a connection with WAL journaling and tuned pragmas"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False
+        )
         conn.row_factory = sqlite3.Row
+        
+        # WAL lets readers run while a write is in progress; NORMAL sync is
+        # durable across application crashes and only fsyncs on checkpoint
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        Get this thread's persistent database connection
+        
+        The connection is opened on first use and reused by every later call
+        from the same thread; callers must commit or roll back but not close it.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
         return conn
     
+    def close(self):
+        """Close all persistent connections"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.error(f"Error closing database connection: {e}")
+        
+        # Threads that reconnect afterwards get a fresh connection
+        self._local = threading.local()
+        logger.info("Database connections closed")
+    
+    # Config Cache Methods
+    def _cache_lookup(self, key: Tuple[Hashable, ...]) -> Tuple[bool, Any, int]:
+        """
+        Look up a cached value
+        
+        Returns:
+            Tuple of (hit, value, version); pass version to _cache_store on a miss
+        """
+        with self._cache_lock:
+            if key in self._cache:
+                self.cache_hits += 1
+                return True, self._cache[key], self._cache_version
+            self.cache_misses += 1
+            return False, None, self._cache_version
+    
+    def _cache_store(self, key: Tuple[Hashable, ...], value: Any, version: int):
+        """Store a loaded value unless a write invalidated the cache while it was loading"""
+        with self._cache_lock:
+            if version == self._cache_version:
+                self._cache[key] = value
+    
+    def invalidate_cache(self, *groups: str):
+        """
+        Drop cached configuration data
+        
+        Args:
+            groups: Cache groups to drop ('rate', 'setting', 'bank_accounts');
+                drops everything if none given
+        """
+        with self._cache_lock:
+            self._cache_version += 1
+            if not groups:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] in groups]:
+                    del self._cache[key]
+    
+    def _bump_display_version(self):
+        """Mark user-facing screens built from rate and account data as stale"""
+        with self._cache_lock:
+            self.display_version += 1
+    
+    def get_cache_stats(self) -> Dict:
+        """Get configuration cache hit/miss counters"""
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': self.cache_hits / total if total else 0.0,
+                'entries': len(self._cache),
+                'version': self._cache_version,
+                'display_version': self.display_version
+            }
+    
     def init_database(self):
         """Initialize database tables with improved schema"""
         conn = self.get_connection()
@@ -59,12 +210,22 @@ class DatabaseService:
                     admin_receiving_bank TEXT,
                     receipt_path TEXT,
                     admin_receipt_path TEXT,
+                    receipt_file_id TEXT,
+                    admin_receipt_file_id TEXT,
                     status TEXT DEFAULT 'pending',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     confirmed_at TIMESTAMP
                 )
             """)
             
+            # Migration: Telegram file_id columns for databases created before them
+            cursor.execute("PRAGMA table_info(transactions)")
+            transaction_columns = {row['name'] for row in cursor.fetchall()}
+            for column in ('receipt_file_id', 'admin_receipt_file_id'):
+                if column not in transaction_columns:
+                    cursor.execute(f"ALTER TABLE transactions ADD COLUMN {column} TEXT")
+                    logger.info(f"Added transactions.{column} column")
+            
             # Create indexes separately
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_id ON transactions(user_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON transactions(status)")
@@ -105,6 +266,93 @@ class DatabaseService:
                 )
             """)
             
+            # OCR result cache table (keyed by hash of normalized image bytes)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    image_hash TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache(last_used_at)")
+            
+            # Telegram file index (file_unique_id -> stored receipt and OCR result)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS receipt_files (
+                    file_unique_id TEXT PRIMARY KEY,
+                    file_path TEXT NOT NULL,
+                    ocr_result TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Content-addressed receipt files, reference-counted from transactions
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS receipt_blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    file_path TEXT NOT NULL UNIQUE,
+                    size INTEGER,
+                    ref_count INTEGER NOT NULL DEFAULT 0,
+                    compressed INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    removed_at TIMESTAMP
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipt_blobs_created ON receipt_blobs(created_at)")
+            
+            # Receipts held by an exchange that has not created its transaction yet (one draft per user)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS receipt_holds (
+                    user_id INTEGER PRIMARY KEY,
+                    file_path TEXT NOT NULL,
+                    held_until TIMESTAMP NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_receipt_holds_path ON receipt_holds(file_path)")
+            
+            # Bot persistence (conversation states, user_data, chat_data) as one JSON row per key
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS persistence (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (kind, key)
+                )
+            """)
+            
+            # Append-only balance ledger (bank_accounts.balance is the materialized sum)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ledger_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    account_id INTEGER NOT NULL REFERENCES bank_accounts(id),
+                    entry_type TEXT NOT NULL CHECK (
+                        entry_type IN ('opening', 'credit', 'debit', 'adjustment', 'reversal')
+                    ),
+                    amount REAL NOT NULL,
+                    balance_after REAL NOT NULL,
+                    transaction_id INTEGER,
+                    note TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ledger_account_time ON ledger_entries(account_id, created_at, id)"
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ledger_transaction ON ledger_entries(transaction_id)")
+            
+            # Migration: opening entries for balances that predate the ledger
+            cursor.execute("""
+                INSERT INTO ledger_entries (account_id, entry_type, amount, balance_after, note, created_at)
+                SELECT id, 'opening', balance, balance, 'Opening balance', ?
+                FROM bank_accounts
+                WHERE balance != 0 AND id NOT IN (SELECT DISTINCT account_id FROM ledger_entries)
+            """, (utc_now(),))
+            if cursor.rowcount > 0:
+                logger.info(f"Ledger migration: {cursor.rowcount} opening balance entries created")
+            
             conn.commit()
             logger.info("Database tables initialized successfully")
             
@@ -112,24 +360,26 @@ class DatabaseService:
             logger.error(f"Error initializing database: {e}")
             conn.rollback()
             raise
-        finally:
-            conn.close()
     
     # Exchange Rate Methods
     def get_current_rate(self) -> float:
-        """Get current exchange rate"""
+        """Get current exchange rate (cached until the rate is updated)"""
+        hit, rate, version = self._cache_lookup(('rate',))
+        if hit:
+            return rate
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
             cursor.execute("SELECT rate FROM exchange_rate WHERE id = 1")
             result = cursor.fetchone()
-            return result['rate'] if result else 121.5
+            rate = result['rate'] if result else 121.5
+            self._cache_store(('rate',), rate, version)
+            return rate
         except Exception as e:
             logger.error(f"Error getting exchange rate: {e}")
             return 121.5
-        finally:
-            conn.close()
     
     def update_rate(self, new_rate: float):
         """Update exchange rate"""
@@ -142,12 +392,12 @@ class DatabaseService:
                 VALUES (1, ?, ?)
             """, (new_rate, datetime.now()))
             conn.commit()
+            self.invalidate_cache('rate')
+            self._bump_display_version()
             logger.info(f"Exchange rate updated to {new_rate}")
         except Exception as e:
             logger.error(f"Error updating exchange rate: {e}")
             conn.rollback()
-        finally:
-            conn.close()
     
     def initialize_exchange_rate(self, default_rate: float):
         """Initialize exchange rate if not set"""
@@ -162,14 +412,26 @@ class DatabaseService:
                     (default_rate,)
                 )
                 conn.commit()
+                self.invalidate_cache('rate')
+                self._bump_display_version()
                 logger.info(f"Exchange rate initialized to {default_rate}")
         except Exception as e:
             logger.error(f"Error initializing exchange rate: {e}")
             conn.rollback()
-        finally:
-            conn.close()
 
     # Bank Account Methods
+    def _register_bank_name(self, currency: str, bank_name: str):
+        """Make a bank name used by an account resolvable, unless it already is"""
+        if bank_name and self.bank_registry.resolve(bank_name, currency=currency) is None:
+            # Scoped ID so a THB and an MMK bank with the same name stay separate
+            self.bank_registry.register(f"{currency}:{bank_name}", currency, [bank_name])
+            logger.info(f"Registered bank name: {currency} {bank_name}")
+    
+    def _register_account_banks(self):
+        """Register the bank names of all active accounts with the bank registry"""
+        for account in self.get_bank_accounts():
+            self._register_bank_name(account.currency, account.bank_name)
+    
     def add_bank_account(
         self,
         currency: str,
@@ -189,22 +451,35 @@ class DatabaseService:
                 (currency, bank_name, account_number, account_name, display_name, balance)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (currency, bank_name, account_number, account_name, display_name, initial_balance))
-            conn.commit()
             account_id = cursor.lastrowid
+            if initial_balance:
+                cursor.execute("""
+                    INSERT INTO ledger_entries (account_id, entry_type, amount, balance_after, note, created_at)
+                    VALUES (?, 'opening', ?, ?, 'Opening balance', ?)
+                """, (account_id, initial_balance, initial_balance, utc_now()))
+            conn.commit()
+            self.invalidate_cache('bank_accounts')
+            self._bump_display_version()
+            self._index_account_name(currency, account_id, account_name)
+            self._register_bank_name(currency, bank_name)
             logger.info(f"Bank account added: {bank_name} - {account_number}")
             return account_id
         except sqlite3.IntegrityError:
             logger.warning(f"Bank account already exists: {bank_name} - {account_number}")
+            conn.rollback()
             return None
         except Exception as e:
             logger.error(f"Error adding bank account: {e}")
             conn.rollback()
             return None
-        finally:
-            conn.close()
     
     def get_bank_accounts(self, currency: Optional[str] = None, active_only: bool = True) -> List[BankAccount]:
-        """Get bank accounts"""
+        """Get bank accounts (cached until accounts or balances change)"""
+        cache_key = ('bank_accounts', currency, active_only)
+        hit, accounts, version = self._cache_lookup(cache_key)
+        if hit:
+            return list(accounts)
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -236,40 +511,64 @@ class DatabaseService:
                     is_active=bool(row['is_active']),
                     display_name=row['display_name'],
                     created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                    updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None
+                    updated_at=datetime.fromisoformat(row['updated_at']) if row['updated_at'] else None,
+                    normalized_name=normalize_name(row['account_name'])
                 )
                 accounts.append(account)
             
-            return accounts
+            self._cache_store(cache_key, accounts, version)
+            return list(accounts)
             
         except Exception as e:
             logger.error(f"Error getting bank accounts: {e}")
             return []
-        finally:
-            conn.close()
     
-    def update_balance(self, currency: str, bank_name: str, amount_change: float):
-        """Update balance for a specific bank"""
+    def update_balance(
+        self,
+        currency: str,
+        bank_name: str,
+        amount_change: float,
+        entry_type: str = 'adjustment',
+        transaction_id: Optional[int] = None,
+        note: Optional[str] = None
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Post a balance change for a bank to the ledger
+        
+        Args:
+            currency: Account currency
+            bank_name: Bank name of the active account
+            amount_change: Signed amount to add
+            entry_type: Ledger entry type ('credit', 'debit', 'adjustment' or 'reversal')
+            transaction_id: Related exchange transaction (optional)
+            note: Free-text audit note (optional)
+        
+        Returns:
+            Tuple of (balance_before, balance_after) read in the same
+            transaction as the write, or None if no active account was found
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            cursor.execute("""
-                UPDATE bank_accounts 
-                SET balance = balance + ?, updated_at = ?
-                WHERE currency = ? AND bank_name = ? AND is_active = 1
-            """, (amount_change, datetime.now(), currency, bank_name))
-            
-            if cursor.rowcount == 0:
+            cursor.execute("BEGIN IMMEDIATE")
+            account = self._find_account(cursor, currency, bank_name)
+            if not account:
+                conn.rollback()
                 logger.warning(f"No active account found for {currency} {bank_name}")
-            else:
-                conn.commit()
-                logger.info(f"Balance updated: {currency} {bank_name} {amount_change:+.2f}")
+                return None
+            
+            balance_before, balance_after = self._post_ledger_entry(
+                cursor, account['id'], amount_change, entry_type, transaction_id, note
+            )
+            conn.commit()
+            self.invalidate_cache('bank_accounts')
+            logger.info(f"Balance updated: {currency} {bank_name} {amount_change:+.2f} ({entry_type})")
+            return balance_before, balance_after
         except Exception as e:
             logger.error(f"Error updating balance: {e}")
             conn.rollback()
-        finally:
-            conn.close()
+            return None
     
     def add_admin_bank_account(
         self,
@@ -301,16 +600,52 @@ class DatabaseService:
                 WHERE id = ?
             """, (datetime.now(), account_id))
             
+            conn.commit()
             if cursor.rowcount == 0:
                 logger.warning(f"No account found with ID {account_id}")
             else:
-                conn.commit()
+                self.invalidate_cache('bank_accounts')
+                self._bump_display_version()
+                self._unindex_account_name(account_id)
                 logger.info(f"Bank account #{account_id} deactivated")
         except Exception as e:
             logger.error(f"Error deactivating account: {e}")
             conn.rollback()
-        finally:
-            conn.close()
+    
+    def update_bank_display_name(self, account_id: int, display_name: str) -> bool:
+        """
+        Update display name of a bank account
+        
+        Args:
+            account_id: Bank account ID
+            display_name: New display name
+        
+        Returns:
+            True if the account exists and was updated
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                UPDATE bank_accounts 
+                SET display_name = ?, updated_at = ?
+                WHERE id = ?
+            """, (display_name, datetime.now(), account_id))
+            
+            conn.commit()
+            if cursor.rowcount == 0:
+                logger.warning(f"No account found with ID {account_id}")
+                return False
+            
+            self.invalidate_cache('bank_accounts')
+            self._bump_display_version()
+            logger.info(f"Bank account #{account_id} display name updated: {display_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Error updating display name: {e}")
+            conn.rollback()
+            return False
     
     def get_balances(self) -> List[Tuple[str, str, float, Optional[str]]]:
         """Get all balances"""
@@ -328,8 +663,6 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"Error getting balances: {e}")
             return []
-        finally:
-            conn.close()
     
     def initialize_balances(self, initial_balances: List[Tuple[str, str, float]]):
         """Initialize balances for bank accounts"""
@@ -349,6 +682,194 @@ class DatabaseService:
                 )
                 logger.info(f"Initialized {currency} {bank} with balance {balance}")
 
+    # Ledger Methods
+    @staticmethod
+    def _find_account(cursor: sqlite3.Cursor, currency: str, bank_name: str) -> Optional[sqlite3.Row]:
+        """Find the active account (id, balance) for a bank inside an open transaction"""
+        cursor.execute("""
+            SELECT id, balance FROM bank_accounts
+            WHERE currency = ? AND bank_name = ? AND is_active = 1
+            ORDER BY id LIMIT 1
+        """, (currency, bank_name))
+        return cursor.fetchone()
+    
+    @staticmethod
+    def _post_ledger_entry(
+        cursor: sqlite3.Cursor,
+        account_id: int,
+        amount: float,
+        entry_type: str,
+        transaction_id: Optional[int] = None,
+        note: Optional[str] = None
+    ) -> Tuple[float, float]:
+        """
+        Append a ledger entry and update the materialized balance
+        
+        Must run inside the caller's transaction. Entries are stamped in UTC,
+        the same clock as transactions.created_at.
+        
+        Returns:
+            Tuple of (balance_before, balance_after)
+        """
+        cursor.execute(
+            "UPDATE bank_accounts SET balance = balance + ?, updated_at = ? WHERE id = ?",
+            (amount, datetime.now(), account_id)
+        )
+        cursor.execute("SELECT balance FROM bank_accounts WHERE id = ?", (account_id,))
+        balance_after = cursor.fetchone()['balance']
+        cursor.execute("""
+            INSERT INTO ledger_entries
+            (account_id, entry_type, amount, balance_after, transaction_id, note, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (account_id, entry_type, amount, balance_after, transaction_id, note, utc_now()))
+        return balance_after - amount, balance_after
+    
+    def get_balance(self, currency: str, bank_name: str) -> float:
+        """Get current balance of the active account for a bank (0.0 if none)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            account = self._find_account(cursor, currency, bank_name)
+            return account['balance'] if account else 0.0
+        except Exception as e:
+            logger.error(f"Error getting balance for {currency} {bank_name}: {e}")
+            return 0.0
+    
+    def set_balance(
+        self,
+        currency: str,
+        bank_name: str,
+        new_balance: float,
+        note: Optional[str] = None
+    ) -> Optional[float]:
+        """
+        Set balance for a bank by posting the difference as an adjustment
+        
+        Creates the account with an opening entry if it does not exist yet.
+        
+        Args:
+            currency: Account currency
+            bank_name: Bank name
+            new_balance: Target balance
+            note: Free-text audit note (optional)
+        
+        Returns:
+            Previous balance or None on error
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            account = self._find_account(cursor, currency, bank_name)
+            
+            if account:
+                old_balance = account['balance']
+                if new_balance != old_balance:
+                    self._post_ledger_entry(
+                        cursor, account['id'], new_balance - old_balance, 'adjustment', note=note
+                    )
+            else:
+                old_balance = 0.0
+                cursor.execute("""
+                    INSERT INTO bank_accounts (currency, bank_name, account_number, account_name, balance)
+                    VALUES (?, ?, '', '', 0)
+                """, (currency, bank_name))
+                new_account_id = cursor.lastrowid
+                self._post_ledger_entry(cursor, new_account_id, new_balance, 'opening', note=note)
+            
+            conn.commit()
+            self.invalidate_cache('bank_accounts')
+            if not account:
+                self._bump_display_version()
+                self._index_account_name(currency, new_account_id, '')
+                self._register_bank_name(currency, bank_name)
+            logger.info(f"Balance set: {currency} {bank_name} {old_balance:,.2f} -> {new_balance:,.2f}")
+            return old_balance
+        except Exception as e:
+            logger.error(f"Error setting balance: {e}")
+            conn.rollback()
+            return None
+    
+    def get_balance_at(self, account_id: int, at: datetime) -> float:
+        """
+        Get an account's balance as of a point in time
+        
+        Ledger entries are stamped in UTC (see utc_now).
+        
+        Args:
+            account_id: Bank account ID
+            at: Point in time; naive values are UTC, aware values are converted
+        
+        Returns:
+            Balance after the last entry at or before `at` (0.0 if none)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT balance_after FROM ledger_entries
+                WHERE account_id = ? AND created_at <= ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            """, (account_id, _as_utc(at)))
+            row = cursor.fetchone()
+            return row['balance_after'] if row else 0.0
+        except Exception as e:
+            logger.error(f"Error getting balance at {at} for account #{account_id}: {e}")
+            return 0.0
+    
+    def get_ledger_history(
+        self,
+        account_id: int,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 50
+    ) -> List[Dict]:
+        """
+        Get ledger entries for an account, newest first
+        
+        Times are UTC like get_balance_at: naive values are UTC, aware values
+        are converted, and created_at in the result is UTC.
+        
+        Args:
+            account_id: Bank account ID
+            since: Only entries at or after this time (optional)
+            until: Only entries at or before this time (optional)
+            limit: Maximum number of entries
+        
+        Returns:
+            List of entry dictionaries
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            query = """
+                SELECT id, account_id, entry_type, amount, balance_after, transaction_id, note, created_at
+                FROM ledger_entries
+                WHERE account_id = ?
+            """
+            params = [account_id]
+            
+            if since:
+                query += " AND created_at >= ?"
+                params.append(_as_utc(since))
+            if until:
+                query += " AND created_at <= ?"
+                params.append(_as_utc(until))
+            
+            query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+            params.append(limit)
+            
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error getting ledger history for account #{account_id}: {e}")
+            return []
+    
     # Transaction Methods
     def create_transaction(
         self,
@@ -365,7 +886,8 @@ class DatabaseService:
         user_account_name: str,
         from_bank: str,
         admin_receiving_bank: str,
-        receipt_path: Optional[str] = None
+        receipt_path: Optional[str] = None,
+        receipt_file_id: Optional[str] = None
     ) -> int:
         """Create a new transaction"""
         conn = self.get_connection()
@@ -377,16 +899,17 @@ class DatabaseService:
                     user_id, username, exchange_direction, from_currency, to_currency,
                     sent_amount, received_amount, exchange_rate,
                     user_bank_name, user_account_number, user_account_name,
-                    from_bank, admin_receiving_bank, receipt_path, status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+                    from_bank, admin_receiving_bank, receipt_path, receipt_file_id, status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
             """, (
                 user_id, username, exchange_direction, from_currency, to_currency,
                 sent_amount, received_amount, exchange_rate,
                 user_bank_name, user_account_number, user_account_name,
-                from_bank, admin_receiving_bank, receipt_path
+                from_bank, admin_receiving_bank, receipt_path, receipt_file_id
             ))
             
             transaction_id = cursor.lastrowid
+            self._adjust_receipt_refs(cursor, None, receipt_path)
             conn.commit()
             logger.info(f"Transaction created: #{transaction_id} ({exchange_direction})")
             return transaction_id
@@ -395,8 +918,33 @@ class DatabaseService:
             logger.error(f"Error creating transaction: {e}")
             conn.rollback()
             return 0
-        finally:
-            conn.close()
+    
+    @staticmethod
+    def _row_to_transaction(row: sqlite3.Row) -> Transaction:
+        """Build Transaction model from a transactions row"""
+        return Transaction(
+            id=row['id'],
+            user_id=row['user_id'],
+            username=row['username'],
+            exchange_direction=ExchangeDirection(row['exchange_direction']),
+            from_currency=row['from_currency'],
+            to_currency=row['to_currency'],
+            sent_amount=row['sent_amount'],
+            received_amount=row['received_amount'],
+            exchange_rate=row['exchange_rate'],
+            user_bank_name=row['user_bank_name'],
+            user_account_number=row['user_account_number'],
+            user_account_name=row['user_account_name'],
+            from_bank=row['from_bank'],
+            admin_receiving_bank=row['admin_receiving_bank'],
+            receipt_path=row['receipt_path'],
+            admin_receipt_path=row['admin_receipt_path'],
+            receipt_file_id=row['receipt_file_id'],
+            admin_receipt_file_id=row['admin_receipt_file_id'],
+            status=row['status'],
+            created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
+            confirmed_at=datetime.fromisoformat(row['confirmed_at']) if row['confirmed_at'] else None
+        )
     
     def get_transaction(self, transaction_id: int) -> Optional[Transaction]:
         """Get transaction by ID"""
@@ -410,33 +958,34 @@ class DatabaseService:
             if not row:
                 return None
             
-            return Transaction(
-                id=row['id'],
-                user_id=row['user_id'],
-                username=row['username'],
-                exchange_direction=ExchangeDirection(row['exchange_direction']),
-                from_currency=row['from_currency'],
-                to_currency=row['to_currency'],
-                sent_amount=row['sent_amount'],
-                received_amount=row['received_amount'],
-                exchange_rate=row['exchange_rate'],
-                user_bank_name=row['user_bank_name'],
-                user_account_number=row['user_account_number'],
-                user_account_name=row['user_account_name'],
-                from_bank=row['from_bank'],
-                admin_receiving_bank=row['admin_receiving_bank'],
-                receipt_path=row['receipt_path'],
-                admin_receipt_path=row['admin_receipt_path'],
-                status=row['status'],
-                created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                confirmed_at=datetime.fromisoformat(row['confirmed_at']) if row['confirmed_at'] else None
-            )
+            return self._row_to_transaction(row)
             
         except Exception as e:
             logger.error(f"Error getting transaction: {e}")
             return None
-        finally:
-            conn.close()
+    
+    def get_user_recent_pending_transaction(self, user_id: int) -> Optional[Transaction]:
+        """Get a user's most recent pending transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT * FROM transactions
+                WHERE user_id = ? AND status = 'pending'
+                ORDER BY created_at DESC, id DESC
+                LIMIT 1
+            """, (user_id,))
+            row = cursor.fetchone()
+            
+            if not row:
+                return None
+            
+            return self._row_to_transaction(row)
+            
+        except Exception as e:
+            logger.error(f"Error getting pending transaction for user {user_id}: {e}")
+            return None
     
     def update_transaction_status(
         self,
@@ -450,11 +999,13 @@ class DatabaseService:
         
         try:
             if admin_receipt_path:
+                old_path = self._get_admin_receipt_path(cursor, transaction_id)
                 cursor.execute("""
                     UPDATE transactions 
                     SET status = ?, admin_receipt_path = ?, confirmed_at = ?
                     WHERE id = ?
                 """, (status, admin_receipt_path, datetime.now(), transaction_id))
+                self._adjust_receipt_refs(cursor, old_path, admin_receipt_path)
             else:
                 cursor.execute("""
                     UPDATE transactions 
@@ -468,53 +1019,226 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"Error updating transaction status: {e}")
             conn.rollback()
-        finally:
-            conn.close()
     
-    def update_transaction_admin_receipt(self, transaction_id: int, admin_receipt_path: str):
-        """Update admin receipt path for a transaction"""
+    def confirm_transaction(self, transaction_id: int, payout_bank: str) -> Dict:
+        """
+        Debit the payout bank and confirm a pending transaction atomically
+        
+        Funds check, debit and status change run in one BEGIN IMMEDIATE
+        transaction, so concurrent confirmations cannot overdraw an account or
+        confirm the same transaction twice.
+        
+        Args:
+            transaction_id: Transaction ID
+            payout_bank: Bank (of the transaction's to_currency) used for the payout
+        
+        Returns:
+            Dictionary with 'status' ('confirmed', 'insufficient_funds',
+            'not_found', 'not_pending' or 'error'), 'transaction' and the
+            to_before/to_after/from_before/from_after balances
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
+        result = {
+            'status': 'error',
+            'transaction': None,
+            'to_before': None,
+            'to_after': None,
+            'from_before': None,
+            'from_after': None
+        }
         
         try:
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                result['status'] = 'not_found'
+                return result
+            
+            transaction = self._row_to_transaction(row)
+            result['transaction'] = transaction
+            if transaction.status != 'pending':
+                conn.rollback()
+                result['status'] = 'not_pending'
+                return result
+            
+            # Receiving side was already credited when the receipt was submitted
+            if transaction.admin_receiving_bank:
+                from_account = self._find_account(cursor, transaction.from_currency, transaction.admin_receiving_bank)
+                if from_account:
+                    result['from_before'] = from_account['balance'] - transaction.sent_amount
+                    result['from_after'] = from_account['balance']
+            
+            to_account = self._find_account(cursor, transaction.to_currency, payout_bank)
+            to_before = to_account['balance'] if to_account else 0
+            to_after = to_before - transaction.received_amount
+            result['to_before'] = to_before
+            result['to_after'] = to_after
+            
+            if not to_account or to_after < 0:
+                conn.rollback()
+                result['status'] = 'insufficient_funds'
+                logger.warning(
+                    f"Insufficient funds for transaction #{transaction_id}: "
+                    f"{transaction.to_currency} {payout_bank} {to_before:,.2f} < {transaction.received_amount:,.2f}"
+                )
+                return result
+            
+            now = datetime.now()
+            self._post_ledger_entry(
+                cursor, to_account['id'], -transaction.received_amount, 'debit',
+                transaction_id, f"Payout via {payout_bank}"
+            )
             cursor.execute("""
                 UPDATE transactions 
-                SET admin_receipt_path = ?
+                SET status = 'confirmed', confirmed_at = ?
                 WHERE id = ?
-            """, (admin_receipt_path, transaction_id))
+            """, (now, transaction_id))
             
             conn.commit()
-            logger.info(f"Transaction #{transaction_id} admin receipt updated")
+            self.invalidate_cache('bank_accounts')
+            transaction.status = 'confirmed'
+            transaction.confirmed_at = now
+            result['status'] = 'confirmed'
+            logger.info(
+                f"Transaction #{transaction_id} confirmed: "
+                f"{transaction.to_currency} {payout_bank} {-transaction.received_amount:+.2f}"
+            )
+            return result
             
         except Exception as e:
-            logger.error(f"Error updating admin receipt: {e}")
+            logger.error(f"Error confirming transaction #{transaction_id}: {e}")
             conn.rollback()
-        finally:
-            conn.close()
+            result['status'] = 'error'
+            return result
     
-    def update_transaction_received_amount(self, transaction_id: int, received_amount: float):
-        """Update received amount for a transaction (when actual amount differs from calculated)"""
+    def cancel_transaction(self, transaction_id: int) -> Dict:
+        """
+        Cancel a transaction and reverse its ledger entries atomically
+        
+        Every account the transaction touched (receipt credit, payout debit)
+        gets a reversal entry for its net amount in the same transaction as the
+        status change.
+        
+        Args:
+            transaction_id: Transaction ID
+        
+        Returns:
+            Dictionary with 'status' ('cancelled', 'not_found', 'not_pending'
+            or 'error'), 'transaction' and 'reversals' (account_id, amount,
+            balance_after per reversed account)
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
+        result = {'status': 'error', 'transaction': None, 'reversals': []}
         
         try:
+            cursor.execute("BEGIN IMMEDIATE")
+            
+            cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                result['status'] = 'not_found'
+                return result
+            
+            transaction = self._row_to_transaction(row)
+            result['transaction'] = transaction
+            # A confirmed payout has left the account; only pending transactions can be reversed
+            if transaction.status != 'pending':
+                conn.rollback()
+                result['status'] = 'not_pending'
+                return result
+            
             cursor.execute("""
-                UPDATE transactions 
-                SET received_amount = ?
-                WHERE id = ?
-            """, (received_amount, transaction_id))
+                SELECT account_id, SUM(amount) AS net
+                FROM ledger_entries
+                WHERE transaction_id = ?
+                GROUP BY account_id
+            """, (transaction_id,))
+            
+            for entry in cursor.fetchall():
+                if not entry['net']:
+                    continue
+                _, balance_after = self._post_ledger_entry(
+                    cursor, entry['account_id'], -entry['net'], 'reversal',
+                    transaction_id, f"Cancelled transaction #{transaction_id}"
+                )
+                result['reversals'].append({
+                    'account_id': entry['account_id'],
+                    'amount': -entry['net'],
+                    'balance_after': balance_after
+                })
+            
+            cursor.execute(
+                "UPDATE transactions SET status = 'cancelled', confirmed_at = ? WHERE id = ?",
+                (datetime.now(), transaction_id)
+            )
             
             conn.commit()
-            logger.info(f"Transaction #{transaction_id} received_amount updated to {received_amount}")
+            if result['reversals']:
+                self.invalidate_cache('bank_accounts')
+            transaction.status = 'cancelled'
+            result['status'] = 'cancelled'
+            logger.info(f"Transaction #{transaction_id} cancelled ({len(result['reversals'])} reversals)")
+            return result
             
         except Exception as e:
-            logger.error(f"Error updating received amount: {e}")
+            logger.error(f"Error cancelling transaction #{transaction_id}: {e}")
             conn.rollback()
-        finally:
-            conn.close()
+            result['status'] = 'error'
+            return result
     
-    def get_recent_transactions(self, limit: int = 10) -> List[Transaction]:
-        """Get recent transactions"""
+    def update_transaction_admin_receipt(
+        self,
+        transaction_id: int,
+        admin_receipt_path: Optional[str],
+        admin_receipt_file_id: Optional[str] = None
+    ):
+        """Update admin receipt path (and Telegram file_id) for a transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            old_path = self._get_admin_receipt_path(cursor, transaction_id)
+            cursor.execute("""
+                UPDATE transactions 
+                SET admin_receipt_path = ?, admin_receipt_file_id = ?
+                WHERE id = ?
+            """, (admin_receipt_path, admin_receipt_file_id, transaction_id))
+            self._adjust_receipt_refs(cursor, old_path, admin_receipt_path)
+            
+            conn.commit()
+            logger.info(f"Transaction #{transaction_id} admin receipt updated")
+            
+        except Exception as e:
+            logger.error(f"Error updating admin receipt: {e}")
+            conn.rollback()
+    
+    def update_transaction_received_amount(self, transaction_id: int, received_amount: float):
+        """Update received amount for a transaction (when actual amount differs from calculated)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                UPDATE transactions 
+                SET received_amount = ?
+                WHERE id = ?
+            """, (received_amount, transaction_id))
+            
+            conn.commit()
+            logger.info(f"Transaction #{transaction_id} received_amount updated to {received_amount}")
+            
+        except Exception as e:
+            logger.error(f"Error updating received amount: {e}")
+            conn.rollback()
+    
+    def get_recent_transactions(self, limit: int = 10) -> List[Transaction]:
+        """Get recent transactions"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -529,68 +1253,175 @@ class DatabaseService:
             transactions = []
             
             for row in rows:
-                transaction = Transaction(
-                    id=row['id'],
-                    user_id=row['user_id'],
-                    username=row['username'],
-                    exchange_direction=ExchangeDirection(row['exchange_direction']),
-                    from_currency=row['from_currency'],
-                    to_currency=row['to_currency'],
-                    sent_amount=row['sent_amount'],
-                    received_amount=row['received_amount'],
-                    exchange_rate=row['exchange_rate'],
-                    user_bank_name=row['user_bank_name'],
-                    user_account_number=row['user_account_number'],
-                    user_account_name=row['user_account_name'],
-                    from_bank=row['from_bank'],
-                    admin_receiving_bank=row['admin_receiving_bank'],
-                    receipt_path=row['receipt_path'],
-                    admin_receipt_path=row['admin_receipt_path'],
-                    status=row['status'],
-                    created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                    confirmed_at=datetime.fromisoformat(row['confirmed_at']) if row['confirmed_at'] else None
-                )
-                transactions.append(transaction)
+                transactions.append(self._row_to_transaction(row))
             
             return transactions
             
         except Exception as e:
             logger.error(f"Error getting recent transactions: {e}")
             return []
-        finally:
-            conn.close()
+    
+    def get_transactions_page(
+        self,
+        start: str,
+        end: str,
+        limit: int = 20,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> Tuple[List[Transaction], bool]:
+        """
+        Get one page of transactions in a created_at range, newest first
+        
+        Uses keyset pagination on (created_at, id), which idx_created_at
+        covers (the index implicitly ends with the rowid), so every page is an
+        index range scan regardless of how deep it is.
+        
+        Args:
+            start: Range start, inclusive ('YYYY-MM-DD HH:MM:SS', same clock as created_at)
+            end: Range end, exclusive
+            limit: Page size
+            before_id: Return rows older than this transaction (next page)
+            after_id: Return rows newer than this transaction (previous page)
+        
+        Returns:
+            Tuple of (transactions, has_more) where has_more tells whether rows
+            exist beyond this page in the paging direction
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            query = "SELECT * FROM transactions WHERE created_at >= ? AND created_at < ?"
+            params: List[Any] = [start, end]
+            order = "DESC"
+            
+            if before_id is not None:
+                query += " AND (created_at, id) < (SELECT created_at, id FROM transactions WHERE id = ?)"
+                params.append(before_id)
+            elif after_id is not None:
+                query += " AND (created_at, id) > (SELECT created_at, id FROM transactions WHERE id = ?)"
+                params.append(after_id)
+                order = "ASC"
+            
+            query += f" ORDER BY created_at {order}, id {order} LIMIT ?"
+            params.append(limit + 1)
+            
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if order == "ASC":
+                rows.reverse()
+            
+            return [self._row_to_transaction(row) for row in rows], has_more
+            
+        except Exception as e:
+            logger.error(f"Error getting transactions page: {e}")
+            return [], False
+    
+    def get_transaction_summary(self, start: str, end: str) -> Dict:
+        """
+        Get counts and volumes for transactions in a created_at range
+        
+        Args:
+            start: Range start, inclusive
+            end: Range end, exclusive
+        
+        Returns:
+            Dictionary with 'total', per-status 'counts' and confirmed 'volumes'
+            keyed by (from_currency, to_currency) as (sent, received) sums
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        summary = {'total': 0, 'counts': {}, 'volumes': {}}
+        
+        try:
+            cursor.execute("""
+                SELECT status, from_currency, to_currency,
+                       COUNT(*) AS count,
+                       SUM(sent_amount) AS sent,
+                       SUM(received_amount) AS received
+                FROM transactions
+                WHERE created_at >= ? AND created_at < ?
+                GROUP BY status, from_currency, to_currency
+            """, (start, end))
+            
+            for row in cursor.fetchall():
+                summary['total'] += row['count']
+                summary['counts'][row['status']] = summary['counts'].get(row['status'], 0) + row['count']
+                if row['status'] == 'confirmed':
+                    summary['volumes'][(row['from_currency'], row['to_currency'])] = (row['sent'], row['received'])
+            
+            return summary
+            
+        except Exception as e:
+            logger.error(f"Error getting transaction summary: {e}")
+            return summary
     
     # Validation Methods
+    # Account Name Index Methods
+    def _get_name_index(self, currency: str) -> NameIndex:
+        """Get the name index for a currency, building it on first use"""
+        with self._name_index_lock:
+            index = self._name_indexes.get(currency)
+            if index is None:
+                index = NameIndex()
+                for account in self.get_bank_accounts(currency=currency, active_only=True):
+                    index.add(account.id, account.normalized_name)
+                self._name_indexes[currency] = index
+                logger.info(f"Account name index built for {currency}: {len(index)} accounts")
+            return index
+    
+    def _index_account_name(self, currency: str, account_id: int, account_name: str):
+        """Add a new active account to its currency index (if built)"""
+        with self._name_index_lock:
+            index = self._name_indexes.get(currency)
+            if index is not None:
+                index.add(account_id, normalize_name(account_name))
+    
+    def _unindex_account_name(self, account_id: int):
+        """Remove a deactivated account from the name indexes"""
+        with self._name_index_lock:
+            for index in self._name_indexes.values():
+                index.remove(account_id)
+    
     def validate_receiver_account(
         self,
         account_name: str,
         bank_name: Optional[str],
-        currency: str
+        currency: str,
+        threshold: float = 0.80
     ) -> Optional[BankAccount]:
         """Validate if receiver account matches admin accounts"""
         accounts = self.get_bank_accounts(currency=currency, active_only=True)
         
-        # Normalize input
-        normalized_name = self._normalize_name(account_name)
+        # Normalize input once; account names are normalized when loaded
+        normalized_name = normalize_name(account_name)
+        
+        # Only score accounts the trigram index considers plausible
+        candidate_ids = set(self._get_name_index(currency).candidates(normalized_name, threshold))
         
         best_match = None
         best_similarity = 0.0
-        threshold = 0.80  # 80% similarity
         
         for account in accounts:
-            # Calculate name similarity
-            similarity = self._calculate_similarity(account_name, account.account_name)
+            if account.id not in candidate_ids:
+                continue
+            
+            # Banded comparison gives up early once the threshold (or the
+            # best match so far) is out of reach
+            similarity = name_similarity(
+                normalized_name, account.normalized_name, max(threshold, best_similarity)
+            )
+            if similarity < threshold or similarity <= best_similarity:
+                continue
             
             # Check bank match if provided
-            bank_matches = True
-            if bank_name:
-                bank_matches = self._banks_match(bank_name, account.bank_name)
+            if bank_name and not self._banks_match(bank_name, account.bank_name):
+                continue
             
-            # Track best match
-            if similarity >= threshold and bank_matches:
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = account
+            best_similarity = similarity
+            best_match = account
         
         if best_match:
             logger.info(f"Validated account: {account_name} → {best_match.account_name} ({best_similarity:.2%})")
@@ -601,102 +1432,35 @@ class DatabaseService:
     
     def _normalize_name(self, name: str) -> str:
         """Normalize name for comparison"""
-        if not name:
-            return ""
-        
-        normalized = name.lower().strip()
-        
-        # Remove titles
-        prefixes = ['miss', 'mr', 'mrs', 'ms', 'dr', 'prof']
-        for prefix in prefixes:
-            if normalized.startswith(prefix + ' ') or normalized.startswith(prefix + '.'):
-                normalized = normalized[len(prefix):].strip(' .')
-                break
-        
-        # Remove special characters
-        normalized = ''.join(c for c in normalized if c.isalnum() or c.isspace())
-        
-        # Remove spaces
-        return ''.join(normalized.split())
+        return normalize_name(name)
     
     def _calculate_similarity(self, str1: str, str2: str) -> float:
         """Calculate Levenshtein similarity between two strings"""
-        s1 = self._normalize_name(str1)
-        s2 = self._normalize_name(str2)
-        
-        if s1 == s2:
-            return 1.0
-        
-        if not s1 or not s2:
-            return 0.0
-        
-        # Levenshtein distance
-        len1, len2 = len(s1), len(s2)
-        matrix = [[0] * (len2 + 1) for _ in range(len1 + 1)]
-        
-        for i in range(len1 + 1):
-            matrix[i][0] = i
-        for j in range(len2 + 1):
-            matrix[0][j] = j
-        
-        for i in range(1, len1 + 1):
-            for j in range(1, len2 + 1):
-                cost = 0 if s1[i-1] == s2[j-1] else 1
-                matrix[i][j] = min(
-                    matrix[i-1][j] + 1,
-                    matrix[i][j-1] + 1,
-                    matrix[i-1][j-1] + cost
-                )
-        
-        distance = matrix[len1][len2]
-        max_len = max(len1, len2)
-        return 1 - (distance / max_len)
+        return name_similarity(normalize_name(str1), normalize_name(str2))
     
     def _banks_match(self, bank1: str, bank2: str) -> bool:
         """Check if two bank names match"""
-        # Bank aliases
-        aliases = {
-            'scb': 'siamcommercialbank',
-            'siamcommercial': 'siamcommercialbank',
-            'ktb': 'krungthaibank',
-            'krungthai': 'krungthaibank',
-            'kbank': 'kasikorn',
-            'kasikorn': 'kasikorn',
-            'bbl': 'bangkokbank',
-            'bangkok': 'bangkokbank',
-        }
-        
-        norm1 = self._normalize_name(bank1)
-        norm2 = self._normalize_name(bank2)
-        
-        # Apply aliases
-        check1 = aliases.get(norm1, norm1)
-        check2 = aliases.get(norm2, norm2)
-        
-        # Check various matching strategies
-        return (
-            check1 == check2 or
-            check1 in check2 or
-            check2 in check1 or
-            norm1 in norm2 or
-            norm2 in norm1
-        )
+        return self.bank_registry.same_bank(bank1, bank2)
     
     # Settings Methods
     def get_setting(self, key: str) -> Optional[str]:
-        """Get bot setting"""
+        """Get bot setting (cached until the setting is changed)"""
+        hit, value, version = self._cache_lookup(('setting', key))
+        if hit:
+            return value
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
             cursor.execute("SELECT value FROM bot_settings WHERE key = ?", (key,))
             result = cursor.fetchone()
-            return result['value'] if result else None
+            value = result['value'] if result else None
+            self._cache_store(('setting', key), value, version)
+            return value
         except Exception as e:
             logger.error(f"Error getting setting {key}: {e}")
             return None
-        finally:
-            conn.close()
     
     def set_setting(self, key: str, value: str):
         """Set bot setting"""
@@ -709,9 +1473,431 @@ class DatabaseService:
                 VALUES (?, ?, ?)
             """, (key, value, datetime.now()))
             conn.commit()
+            self.invalidate_cache('setting')
             logger.info(f"Setting updated: {key}")
         except Exception as e:
             logger.error(f"Error setting {key}: {e}")
             conn.rollback()
-        finally:
-            conn.close()
+    
+    # OCR Cache Methods
+    def get_ocr_cache(self, image_hash: str, ttl_seconds: int) -> Optional[Dict]:
+        """
+        Get cached OCR result for an image hash
+        
+        Args:
+            image_hash: Hash of the normalized image bytes
+            ttl_seconds: Maximum age of a cached entry
+        
+        Returns:
+            Cached OCR result or None if missing or expired
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT result FROM ocr_cache
+                WHERE image_hash = ? AND created_at >= ?
+            """, (image_hash, datetime.now() - timedelta(seconds=ttl_seconds)))
+            row = cursor.fetchone()
+            return json.loads(row['result']) if row else None
+            
+        except Exception as e:
+            logger.error(f"Error getting OCR cache: {e}")
+            return None
+    
+    def touch_ocr_cache(self, image_hash: str):
+        """Mark a cached OCR result as used, for least-recently-used eviction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "UPDATE ocr_cache SET last_used_at = ? WHERE image_hash = ?",
+                (datetime.now(), image_hash)
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error touching OCR cache: {e}")
+            conn.rollback()
+    
+    def set_ocr_cache(self, image_hash: str, result: Dict, ttl_seconds: int, max_entries: int):
+        """
+        Store OCR result and evict expired and least recently used entries
+        
+        Args:
+            image_hash: Hash of the normalized image bytes
+            result: OCR result to cache
+            ttl_seconds: Maximum age of a cached entry
+            max_entries: Maximum number of cached entries to keep
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            now = datetime.now()
+            cursor.execute("""
+                INSERT OR REPLACE INTO ocr_cache (image_hash, result, created_at, last_used_at)
+                VALUES (?, ?, ?, ?)
+            """, (image_hash, json.dumps(result, ensure_ascii=False), now, now))
+            
+            # Drop expired entries
+            cursor.execute(
+                "DELETE FROM ocr_cache WHERE created_at < ?",
+                (now - timedelta(seconds=ttl_seconds),)
+            )
+            
+            # Keep only the most recently used entries
+            cursor.execute("""
+                DELETE FROM ocr_cache WHERE image_hash IN (
+                    SELECT image_hash FROM ocr_cache
+                    ORDER BY last_used_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (max_entries,))
+            
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error setting OCR cache: {e}")
+            conn.rollback()
+    
+    # Receipt Store Methods
+    @staticmethod
+    def _get_admin_receipt_path(cursor: sqlite3.Cursor, transaction_id: int) -> Optional[str]:
+        """Get current admin receipt path of a transaction"""
+        cursor.execute("SELECT admin_receipt_path FROM transactions WHERE id = ?", (transaction_id,))
+        row = cursor.fetchone()
+        return row['admin_receipt_path'] if row else None
+    
+    @staticmethod
+    def _adjust_receipt_refs(cursor: sqlite3.Cursor, old_path: Optional[str], new_path: Optional[str]):
+        """
+        Move a transaction reference from one stored receipt to another
+        
+        Paths outside the receipt store (legacy files) have no blob row and
+        are ignored.
+        """
+        if old_path == new_path:
+            return
+        if old_path:
+            cursor.execute(
+                "UPDATE receipt_blobs SET ref_count = MAX(ref_count - 1, 0) WHERE file_path = ?",
+                (old_path,)
+            )
+        if new_path:
+            cursor.execute(
+                "UPDATE receipt_blobs SET ref_count = ref_count + 1 WHERE file_path = ?",
+                (new_path,)
+            )
+    
+    def register_receipt_blob(self, content_hash: str, file_path: str, size: int):
+        """
+        Record a stored receipt file (no-op if already stored)
+        
+        Args:
+            content_hash: SHA-256 of the receipt bytes
+            file_path: Where the receipt is stored
+            size: File size in bytes
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            now = datetime.now()
+            # A removed blob uploaded again starts a fresh retention period
+            cursor.execute("""
+                INSERT INTO receipt_blobs (content_hash, file_path, size, created_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(content_hash) DO UPDATE SET
+                    size = excluded.size,
+                    compressed = 0,
+                    created_at = excluded.created_at,
+                    removed_at = NULL
+                WHERE receipt_blobs.removed_at IS NOT NULL
+            """, (content_hash, file_path, size, now))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error registering receipt {content_hash[:12]}: {e}")
+            conn.rollback()
+    
+    def hold_receipt_blob(self, user_id: int, file_path: str, held_until: datetime):
+        """
+        Keep a receipt from retention until the user's exchange creates its transaction
+        
+        Each user has one draft, so a new hold replaces the user's previous one.
+        Expired holds are dropped here.
+        
+        Args:
+            user_id: Telegram user whose exchange uploaded the receipt
+            file_path: Stored receipt path
+            held_until: The hold lapses after this, for abandoned exchanges
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("DELETE FROM receipt_holds WHERE held_until <= ?", (datetime.now(),))
+            cursor.execute("""
+                INSERT INTO receipt_holds (user_id, file_path, held_until) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    file_path = excluded.file_path,
+                    held_until = excluded.held_until
+            """, (user_id, file_path, held_until))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error holding receipt for user {user_id}: {e}")
+            conn.rollback()
+    
+    def release_receipt_blob(self, user_id: int):
+        """Drop the user's receipt hold (exchange completed or cancelled)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("DELETE FROM receipt_holds WHERE user_id = ?", (user_id,))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error releasing receipt hold for user {user_id}: {e}")
+            conn.rollback()
+    
+    def get_receipt_blob(self, content_hash: str) -> Optional[Dict]:
+        """Get stored receipt record by content hash"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT * FROM receipt_blobs WHERE content_hash = ?", (content_hash,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Error getting receipt {content_hash[:12]}: {e}")
+            return None
+    
+    def get_receipt_blobs_to_remove(
+        self,
+        orphan_before: datetime,
+        remove_before: Optional[datetime] = None,
+        limit: int = 200
+    ) -> List[Dict]:
+        """
+        Get stored receipts due for removal
+        
+        Receipts held by an unfinished exchange (see hold_receipt_blob) are
+        never removed while the hold lasts.
+        
+        Args:
+            orphan_before: Unreferenced receipts stored before this are removed
+            remove_before: Receipts stored before this are removed unless a
+                pending transaction references them (None disables)
+            limit: Maximum rows
+        
+        Returns:
+            List of dictionaries with content_hash, file_path and size
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT content_hash, file_path, size FROM receipt_blobs
+                WHERE removed_at IS NULL
+                AND file_path NOT IN (SELECT file_path FROM receipt_holds WHERE held_until > ?)
+                AND (
+                    (ref_count = 0 AND created_at < ?)
+                    OR (
+                        ? IS NOT NULL AND created_at < ?
+                        AND file_path NOT IN (
+                            SELECT receipt_path FROM transactions
+                            WHERE status = 'pending' AND receipt_path IS NOT NULL
+                            UNION
+                            SELECT admin_receipt_path FROM transactions
+                            WHERE status = 'pending' AND admin_receipt_path IS NOT NULL
+                        )
+                    )
+                )
+                ORDER BY created_at
+                LIMIT ?
+            """, (datetime.now(), orphan_before, remove_before, remove_before, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error getting receipts to remove: {e}")
+            return []
+    
+    def get_receipt_blobs_to_recompress(self, recompress_before: datetime, limit: int = 200) -> List[Dict]:
+        """
+        Get stored receipts due for recompression
+        
+        Args:
+            recompress_before: Receipts stored before this are recompressed
+            limit: Maximum rows
+        
+        Returns:
+            List of dictionaries with content_hash, file_path and size
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("""
+                SELECT content_hash, file_path, size FROM receipt_blobs
+                WHERE removed_at IS NULL AND compressed = 0 AND created_at < ?
+                ORDER BY created_at
+                LIMIT ?
+            """, (recompress_before, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error getting receipts to recompress: {e}")
+            return []
+    
+    def mark_receipt_blob_compressed(self, content_hash: str, size: int):
+        """Record that a stored receipt was recompressed"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "UPDATE receipt_blobs SET compressed = 1, size = ? WHERE content_hash = ?",
+                (size, content_hash)
+            )
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error marking receipt {content_hash[:12]} compressed: {e}")
+            conn.rollback()
+    
+    def mark_receipt_blob_removed(self, content_hash: str):
+        """Record that a stored receipt was deleted and drop its file index entries"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "UPDATE receipt_blobs SET removed_at = ? WHERE content_hash = ?",
+                (datetime.now(), content_hash)
+            )
+            cursor.execute("""
+                DELETE FROM receipt_files
+                WHERE file_path = (SELECT file_path FROM receipt_blobs WHERE content_hash = ?)
+            """, (content_hash,))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error marking receipt {content_hash[:12]} removed: {e}")
+            conn.rollback()
+    
+    # Receipt File Index Methods
+    def get_receipt_file(self, file_unique_id: str) -> Optional[Dict]:
+        """
+        Get stored receipt for a Telegram file
+        
+        Args:
+            file_unique_id: Telegram file_unique_id of the photo
+        
+        Returns:
+            Dictionary with file_path and ocr_result (may be None) or None if unknown
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "SELECT file_path, ocr_result FROM receipt_files WHERE file_unique_id = ?",
+                (file_unique_id,)
+            )
+            row = cursor.fetchone()
+            
+            if not row:
+                return None
+            
+            return {
+                'file_path': row['file_path'],
+                'ocr_result': json.loads(row['ocr_result']) if row['ocr_result'] else None
+            }
+        except Exception as e:
+            logger.error(f"Error getting receipt file {file_unique_id}: {e}")
+            return None
+    
+    def save_receipt_file(self, file_unique_id: str, file_path: str, ocr_result: Optional[Dict] = None):
+        """
+        Index a downloaded Telegram file, keeping any previous OCR result
+        
+        Args:
+            file_unique_id: Telegram file_unique_id of the photo
+            file_path: Where the receipt is stored
+            ocr_result: OCR result for the receipt (optional)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            now = datetime.now()
+            cursor.execute("""
+                INSERT INTO receipt_files (file_unique_id, file_path, ocr_result, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(file_unique_id) DO UPDATE SET
+                    file_path = excluded.file_path,
+                    ocr_result = COALESCE(excluded.ocr_result, receipt_files.ocr_result),
+                    updated_at = excluded.updated_at
+            """, (
+                file_unique_id,
+                file_path,
+                json.dumps(ocr_result, ensure_ascii=False) if ocr_result else None,
+                now,
+                now
+            ))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Error saving receipt file {file_unique_id}: {e}")
+            conn.rollback()
+    
+    # Persistence Methods
+    def get_persistence_entries(self, kind: str) -> Dict[str, str]:
+        """
+        Get stored persistence rows of one kind
+        
+        Args:
+            kind: Row kind (user, chat, bot or conversation:<name>)
+        
+        Returns:
+            Dictionary of key -> JSON data
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT key, data FROM persistence WHERE kind = ?", (kind,))
+            return {row['key']: row['data'] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Error loading persistence for {kind}: {e}")
+            return {}
+    
+    def write_persistence_entries(self, entries: List[Tuple[str, str, Optional[str]]]) -> bool:
+        """
+        Upsert or delete persistence rows in one transaction
+        
+        Args:
+            entries: (kind, key, JSON data) tuples; data None deletes the row
+        
+        Returns:
+            True if all rows were written
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            now = datetime.now()
+            cursor.executemany("""
+                INSERT INTO persistence (kind, key, data, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(kind, key) DO UPDATE SET
+                    data = excluded.data,
+                    updated_at = excluded.updated_at
+            """, [(kind, key, data, now) for kind, key, data in entries if data is not None])
+            cursor.executemany(
+                "DELETE FROM persistence WHERE kind = ? AND key = ?",
+                [(kind, key) for kind, key, data in entries if data is None]
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error writing {len(entries)} persistence rows: {e}")
+            conn.rollback()
+            return False
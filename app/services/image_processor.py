@@ -0,0 +1,358 @@
+"""
+Image preprocessing for OCR
+Runs decode/resize/encode in a bounded process pool with a synchronous fallback
+and picks the cheapest resolution tier that meets the OCR target
+"""
+import asyncio
+import io
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImageTier:
+    """Resolution/quality tier for OCR payloads"""
+    name: str
+    max_size: int
+    quality: int
+    detail: str
+
+
+# Ordered from cheapest to most detailed
+OCR_TIERS: List[ImageTier] = [
+    ImageTier("low", 512, 75, "low"),
+    ImageTier("medium", 1024, 80, "high"),
+    ImageTier("high", 1536, 85, "high"),
+    ImageTier("full", 2048, 90, "high"),
+]
+
+
+@dataclass
+class ProcessedImage:
+    """Preprocessed OCR payload with measurements"""
+    data: bytes
+    tier: str
+    detail: str
+    width: int
+    height: int
+    decode_ms: float
+    encode_ms: float
+    token_cost: int
+    
+    @property
+    def payload_bytes(self) -> int:
+        """Size of the encoded payload"""
+        return len(self.data)
+
+
+def get_tier(name: str) -> ImageTier:
+    """Get tier by name"""
+    for tier in OCR_TIERS:
+        if tier.name == name:
+            return tier
+    raise ValueError(f"Unknown image tier: {name}")
+
+
+def select_tier(native_size: Tuple[int, int], target_size: int) -> ImageTier:
+    """
+    Choose the smallest tier that meets the OCR target
+    
+    The target is the long side in pixels OCR needs. Images smaller than the
+    target only need the smallest tier that keeps their native resolution.
+    
+    Args:
+        native_size: Original (width, height)
+        target_size: Long side in pixels required for OCR
+    
+    Returns:
+        Selected tier
+    """
+    needed = min(max(native_size), target_size)
+    for tier in OCR_TIERS:
+        if tier.max_size >= needed:
+            return tier
+    return OCR_TIERS[-1]
+
+
+def estimate_image_tokens(
+    width: int,
+    height: int,
+    detail: str,
+    base_tokens: int = 85,
+    tile_tokens: int = 170
+) -> int:
+    """
+    Estimate vision input tokens for an image (OpenAI tiling rules)
+    
+    Args:
+        width: Image width sent to the model
+        height: Image height sent to the model
+        detail: "low" or "high"
+        base_tokens: Fixed tokens per image
+        tile_tokens: Tokens per 512px tile in high detail
+    
+    Returns:
+        Estimated token count
+    """
+    if detail == "low":
+        return base_tokens
+    
+    # Fit within 2048x2048, then scale shortest side down to 768
+    scale = min(1.0, 2048 / max(width, height))
+    w, h = width * scale, height * scale
+    scale = min(1.0, 768 / min(w, h))
+    w, h = w * scale, h * scale
+    
+    tiles = math.ceil(w / 512) * math.ceil(h / 512)
+    return base_tokens + tile_tokens * tiles
+
+
+def normalize_image(
+    data: bytes,
+    target_size: int = 2048,
+    tier_name: Optional[str] = None,
+    base_tokens: int = 85,
+    tile_tokens: int = 170
+) -> ProcessedImage:
+    """
+    Normalize raw image bytes to an RGB JPEG for OCR
+    
+    JPEGs are decoded in draft mode directly at the reduced scale of the
+    selected tier instead of at native resolution. Module-level so it can be
+    pickled and run in a worker process.
+    
+    Args:
+        data: Raw image bytes
+        target_size: Long side in pixels required for OCR
+        tier_name: Force a tier instead of selecting one from target_size
+        base_tokens: Fixed vision tokens per image (for cost estimate)
+        tile_tokens: Vision tokens per high-detail tile (for cost estimate)
+    
+    Returns:
+        Processed image with payload and measurements
+    """
+    start = time.perf_counter()
+    
+    with Image.open(io.BytesIO(data)) as img:
+        if tier_name:
+            tier = get_tier(tier_name)
+        else:
+            tier = select_tier(img.size, target_size)
+        
+        # Decode JPEG at reduced scale (1/2, 1/4, 1/8) when possible
+        if img.format == 'JPEG':
+            img.draft('RGB', (tier.max_size, tier.max_size))
+        
+        # Convert to RGB
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        # Resize if too large
+        img.thumbnail((tier.max_size, tier.max_size), Image.Resampling.LANCZOS)
+        decoded = time.perf_counter()
+        
+        # Encode as JPEG
+        buffered = io.BytesIO()
+        img.save(buffered, format="JPEG", quality=tier.quality)
+        encoded = time.perf_counter()
+        
+        return ProcessedImage(
+            data=buffered.getvalue(),
+            tier=tier.name,
+            detail=tier.detail,
+            width=img.width,
+            height=img.height,
+            decode_ms=(decoded - start) * 1000,
+            encode_ms=(encoded - decoded) * 1000,
+            token_cost=estimate_image_tokens(
+                img.width, img.height, tier.detail, base_tokens, tile_tokens
+            )
+        )
+
+
+class ImageProcessor:
+    """Run image preprocessing off the event loop"""
+    
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_input_bytes: int = 20 * 1024 * 1024,
+        target_size: int = 2048,
+        base_tokens: int = 85,
+        tile_tokens: int = 170
+    ):
+        """
+        Initialize image processor
+        
+        Args:
+            max_workers: Worker processes in the pool (0 disables the pool)
+            max_input_bytes: Largest image accepted for preprocessing
+            target_size: Long side in pixels required for OCR
+            base_tokens: Fixed vision tokens per image (for cost estimate)
+            tile_tokens: Vision tokens per high-detail tile (for cost estimate)
+        """
+        self.max_workers = max(0, max_workers)
+        self.max_input_bytes = max_input_bytes
+        self.target_size = target_size
+        self.base_tokens = base_tokens
+        self.tile_tokens = tile_tokens
+        
+        # Per-tier totals: count, payload bytes, decode/encode time, tokens
+        self.tier_stats: Dict[str, Dict[str, float]] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pool_disabled = self.max_workers == 0
+        
+        # Bound queued jobs so bursts wait here instead of piling up in the pool
+        self._slots = asyncio.Semaphore(max(1, self.max_workers * 2))
+        
+        logger.info(
+            f"Image processor initialized (workers: {self.max_workers}, target: {self.target_size}px)"
+        )
+    
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """Create the process pool on first use"""
+        if self._pool_disabled:
+            return None
+        
+        if self._executor is None:
+            try:
+                # spawn avoids forking a process that already runs threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            except Exception as e:
+                logger.error(f"Could not start image process pool, using sync fallback: {e}")
+                self._pool_disabled = True
+                return None
+        
+        return self._executor
+    
+    def _check_size(self, data: bytes):
+        """Reject images above the size limit"""
+        if len(data) > self.max_input_bytes:
+            raise ValueError(
+                f"Image too large: {len(data)} bytes (limit {self.max_input_bytes})"
+            )
+    
+    @staticmethod
+    def read_bytes(image: Union[str, bytes]) -> bytes:
+        """Get raw bytes from a path or bytes"""
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        with open(image, 'rb') as f:
+            return f.read()
+    
+    def _job(self, data: bytes, tier_name: Optional[str]):
+        """Build picklable preprocessing call"""
+        return partial(
+            normalize_image,
+            data,
+            target_size=self.target_size,
+            tier_name=tier_name,
+            base_tokens=self.base_tokens,
+            tile_tokens=self.tile_tokens
+        )
+    
+    def _record(self, result: ProcessedImage) -> ProcessedImage:
+        """Record tier measurements"""
+        stats = self.tier_stats.setdefault(result.tier, {
+            'count': 0, 'payload_bytes': 0, 'decode_ms': 0.0, 'encode_ms': 0.0, 'tokens': 0
+        })
+        stats['count'] += 1
+        stats['payload_bytes'] += result.payload_bytes
+        stats['decode_ms'] += result.decode_ms
+        stats['encode_ms'] += result.encode_ms
+        stats['tokens'] += result.token_cost
+        
+        logger.info(
+            f"Image preprocessed: tier={result.tier} {result.width}x{result.height} "
+            f"bytes={result.payload_bytes} decode={result.decode_ms:.1f}ms "
+            f"encode={result.encode_ms:.1f}ms tokens={result.token_cost}"
+        )
+        return result
+    
+    def get_tier_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get per-tier averages for tuning the size/cost trade-off
+        
+        Returns:
+            Dictionary of tier name to count and average bytes, times and tokens
+        """
+        summary = {}
+        for tier, stats in self.tier_stats.items():
+            count = stats['count']
+            summary[tier] = {
+                'count': count,
+                'avg_payload_bytes': stats['payload_bytes'] / count,
+                'avg_decode_ms': stats['decode_ms'] / count,
+                'avg_encode_ms': stats['encode_ms'] / count,
+                'avg_tokens': stats['tokens'] / count,
+            }
+        return summary
+    
+    def process(self, image: Union[str, bytes], tier_name: Optional[str] = None) -> ProcessedImage:
+        """
+        Normalize image synchronously in the calling thread
+        
+        Args:
+            image: Path to image file or raw image bytes
+            tier_name: Force a tier instead of selecting one from the target
+        
+        Returns:
+            Processed image
+        """
+        data = self.read_bytes(image)
+        self._check_size(data)
+        return self._record(self._job(data, tier_name)())
+    
+    async def aprocess(self, image: Union[str, bytes], tier_name: Optional[str] = None) -> ProcessedImage:
+        """
+        Normalize image in the process pool without blocking the event loop
+        
+        Falls back to a worker thread when the pool is disabled or broken.
+        
+        Args:
+            image: Path to image file or raw image bytes
+            tier_name: Force a tier instead of selecting one from the target
+        
+        Returns:
+            Processed image
+        """
+        if isinstance(image, (bytes, bytearray)):
+            data = bytes(image)
+        else:
+            data = await asyncio.to_thread(self.read_bytes, image)
+        self._check_size(data)
+        job = self._job(data, tier_name)
+        
+        executor = self._get_executor()
+        if executor is not None:
+            async with self._slots:
+                try:
+                    loop = asyncio.get_running_loop()
+                    return self._record(await loop.run_in_executor(executor, job))
+                except BrokenProcessPool as e:
+                    logger.error(f"Image process pool broken, using sync fallback: {e}")
+                    self._pool_disabled = True
+                    self._executor = None
+        
+        return self._record(await asyncio.to_thread(job))
+    
+    def shutdown(self):
+        """Shut down the process pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Image process pool shut down")
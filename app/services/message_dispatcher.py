@@ -0,0 +1,394 @@
+"""
+Outbound message dispatcher
+Queues bot API sends, keeps them within Telegram's global and per-chat flood
+limits and sends higher-priority messages first
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Union
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Send priority (lower is sent first)"""
+    INTERACTIVE = 0   # Replies and edits the user is waiting on
+    USER = 1          # Confirmations and notices sent to users
+    ADMIN = 2         # New transaction notifications and alerts for admins
+    BROADCAST = 3     # Balance updates
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize bucket (starts full)
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self, now: float):
+        """Consume one token"""
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float):
+        """Stop handing out tokens for a while (Telegram RetryAfter)"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    chat_id: Any = field(compare=False)
+    func: Callable[..., Awaitable] = field(compare=False)
+    args: tuple = field(compare=False)
+    kwargs: dict = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    not_before: float = field(default=0.0, compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class MessageDispatcher:
+    """
+    Single outbound queue for bot API sends
+
+    Jobs are taken in priority order, skipping any whose chat is rate limited,
+    already has a send in flight (keeps per-chat order) or is backing off.
+    A job is only started when both the global bucket and the chat's bucket
+    have a token. RetryAfter blocks the chat for the requested time and
+    requeues the job; timeouts and network errors are retried with backoff.
+    Bad requests and forbidden chats fail at once so callers can fall back.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        private_chat_rate: float = 1.0,
+        private_chat_burst: int = 3,
+        group_chat_rate: float = 20 / 60,
+        group_chat_burst: int = 5,
+        max_in_flight: int = 8,
+        max_retries: int = 3,
+        retry_delay: float = 2.0,
+        latency_window: int = 500
+    ):
+        """
+        Initialize dispatcher (the worker starts on first send)
+
+        Args:
+            global_rate: Messages per second across all chats
+            private_chat_rate: Messages per second to one private chat
+            private_chat_burst: Burst size for a private chat
+            group_chat_rate: Messages per second to one group chat
+            group_chat_burst: Burst size for a group chat
+            max_in_flight: Maximum concurrent API calls
+            max_retries: Attempts for timeouts and network errors
+            retry_delay: First backoff delay in seconds (doubles per attempt)
+            latency_window: Number of recent sends kept per priority for metrics
+        """
+        self.global_rate = global_rate
+        self.private_chat_rate = private_chat_rate
+        self.private_chat_burst = private_chat_burst
+        self.group_chat_rate = group_chat_rate
+        self.group_chat_burst = group_chat_burst
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(1, max_retries)
+        self.retry_delay = retry_delay
+
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._heap: List[_Job] = []
+        self._seq = itertools.count()
+        self._busy_chats: Set[Any] = set()
+        self._in_flight: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self._latencies: Dict[Priority, Deque[float]] = {
+            priority: deque(maxlen=latency_window) for priority in Priority
+        }
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'retry_after': 0}
+
+    def _bucket(self, chat_id) -> TokenBucket:
+        """Get (or create) the bucket for a chat"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            try:
+                is_group = int(chat_id) < 0
+            except (TypeError, ValueError):
+                is_group = str(chat_id).startswith('@')
+            if is_group:
+                bucket = TokenBucket(self.group_chat_rate, self.group_chat_burst)
+            else:
+                bucket = TokenBucket(self.private_chat_rate, self.private_chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _ensure_worker(self):
+        """Start the worker in the running loop if needed"""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(
+        self,
+        chat_id,
+        func: Callable[..., Awaitable],
+        /,
+        *args,
+        priority: Union[Priority, int] = Priority.USER,
+        **kwargs
+    ) -> asyncio.Future:
+        """
+        Queue an API call without waiting for it
+
+        Args:
+            chat_id: Chat the call sends to (used for rate limiting)
+            func: Coroutine function to call (e.g. bot.send_message, message.edit_text)
+            *args: Positional arguments for func
+            priority: Send priority
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            Future resolved with the call's result
+        """
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        job = _Job(
+            priority=int(priority),
+            seq=next(self._seq),
+            chat_id=str(chat_id),
+            func=func,
+            args=args,
+            kwargs=kwargs,
+            future=loop.create_future(),
+            enqueued_at=time.monotonic()
+        )
+        heapq.heappush(self._heap, job)
+        self._wakeup.set()
+        return job.future
+
+    async def send(
+        self,
+        chat_id,
+        func: Callable[..., Awaitable],
+        /,
+        *args,
+        priority: Union[Priority, int] = Priority.USER,
+        **kwargs
+    ):
+        """Queue an API call and wait for its result (errors are raised)"""
+        return await self.submit(chat_id, func, *args, priority=priority, **kwargs)
+
+    async def send_message(self, bot, chat_id, priority: Union[Priority, int] = Priority.USER, **kwargs):
+        """Queue bot.send_message and wait for the sent message"""
+        return await self.send(chat_id, bot.send_message, chat_id=chat_id, priority=priority, **kwargs)
+
+    async def reply_text(self, message, text: str, priority: Union[Priority, int] = Priority.INTERACTIVE, **kwargs):
+        """Queue message.reply_text and wait for the reply"""
+        return await self.send(message.chat_id, message.reply_text, text, priority=priority, **kwargs)
+
+    async def edit_text(self, message, text: str, priority: Union[Priority, int] = Priority.INTERACTIVE, **kwargs):
+        """Queue message.edit_text (e.g. a callback query's message) and wait for the edit"""
+        return await self.send(message.chat_id, message.edit_text, text, priority=priority, **kwargs)
+
+    def post_message(self, bot, chat_id, priority: Union[Priority, int] = Priority.BROADCAST, **kwargs):
+        """Queue bot.send_message without waiting; failures are logged"""
+        future = self.submit(chat_id, bot.send_message, chat_id=chat_id, priority=priority, **kwargs)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"Queued message failed: {future.exception()}")
+
+    def _next_job(self, now: float) -> Union[_Job, float, None]:
+        """
+        Pop the highest-priority job that may be sent now
+
+        Returns:
+            The job, else seconds until one may become ready (None if only
+            jobs for busy chats remain or the queue is empty)
+        """
+        deferred = []
+        wait = None
+        chosen = None
+
+        while self._heap:
+            job = heapq.heappop(self._heap)
+            if job.chat_id in self._busy_chats:
+                deferred.append(job)
+                continue
+
+            delay = max(job.not_before - now, self._bucket(job.chat_id).delay(now), self._global.delay(now))
+            if delay > 0:
+                deferred.append(job)
+                wait = delay if wait is None else min(wait, delay)
+                continue
+
+            chosen = job
+            break
+
+        for job in deferred:
+            heapq.heappush(self._heap, job)
+        return chosen if chosen else wait
+
+    async def _run(self):
+        """Worker: start jobs as tokens and in-flight slots allow"""
+        while True:
+            now = time.monotonic()
+            result = self._next_job(now) if len(self._in_flight) < self.max_in_flight else None
+
+            if isinstance(result, _Job):
+                self._global.take(now)
+                self._bucket(result.chat_id).take(now)
+                self._busy_chats.add(result.chat_id)
+                task = asyncio.create_task(self._execute(result))
+                self._in_flight.add(task)
+                # _execute frees its own slot; this covers tasks cancelled before they ran
+                task.add_done_callback(self._in_flight.discard)
+                continue
+
+            # Sleep until a new job, a finished send or the next token
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=result)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, job: _Job):
+        """Run one API call and settle, retry or requeue its job"""
+        job.attempts += 1
+        try:
+            result = await job.func(*job.args, **job.kwargs)
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+            logger.warning(f"Flood limit for chat {job.chat_id}, retrying in {retry_after}s")
+            self.stats['retry_after'] += 1
+            self._bucket(job.chat_id).block(time.monotonic(), float(retry_after))
+            heapq.heappush(self._heap, job)
+        except (BadRequest, Forbidden) as e:
+            # Permanent (BadRequest subclasses NetworkError, so it must not reach the retry branch)
+            self._finish(job, error=e)
+        except (TimedOut, NetworkError) as e:
+            if job.attempts < self.max_retries:
+                delay = self.retry_delay * 2 ** (job.attempts - 1)
+                logger.warning(f"Network timeout on attempt {job.attempts}, retrying in {delay}s...")
+                self.stats['retries'] += 1
+                job.not_before = time.monotonic() + delay
+                heapq.heappush(self._heap, job)
+            else:
+                self._finish(job, error=e)
+        except Exception as e:
+            self._finish(job, error=e)
+        else:
+            self._finish(job, result=result)
+        finally:
+            # Free the slot before waking the worker, which checks for free slots
+            self._in_flight.discard(asyncio.current_task())
+            self._busy_chats.discard(job.chat_id)
+            self._wakeup.set()
+
+    def _finish(self, job: _Job, result=None, error: Optional[BaseException] = None):
+        """Resolve a job's future and record metrics"""
+        self._latencies[Priority(job.priority)].append(time.monotonic() - job.enqueued_at)
+        if error is not None:
+            self.stats['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+        else:
+            self.stats['sent'] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    def get_metrics(self) -> Dict:
+        """
+        Get queue depth and send latency (enqueue to completion) metrics
+
+        Returns:
+            Dictionary with counters, queue depth per priority and
+            p50/p95/max latency in milliseconds per priority
+        """
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for job in self._heap:
+            depth[Priority(job.priority).name.lower()] += 1
+
+        latency = {}
+        for priority, samples in self._latencies.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            latency[priority.name.lower()] = {
+                'p50_ms': ordered[len(ordered) // 2] * 1000,
+                'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                'max_ms': ordered[-1] * 1000,
+                'samples': len(ordered),
+            }
+
+        return {
+            **self.stats,
+            'queue_depth': len(self._heap),
+            'queue_depth_by_priority': depth,
+            'in_flight': len(self._in_flight),
+            'latency': latency,
+        }
+
+    async def close(self, timeout: float = 10.0):
+        """
+        Wait for queued sends to finish, then stop the worker
+
+        Args:
+            timeout: Seconds to wait before cancelling what is left
+        """
+        if self._worker is None:
+            return
+
+        deadline = time.monotonic() + timeout
+        while (self._heap or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        for job in self._heap:
+            if not job.future.done():
+                job.future.cancel()
+        self._heap.clear()
+        for task in list(self._in_flight):
+            task.cancel()
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        logger.info(f"Message dispatcher stopped: {self.stats}")
@@ -0,0 +1,193 @@
+"""
+OCR backends
+Provider interface for vision OCR calls plus OpenAI-compatible implementations
+"""
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+
+def build_vision_content(prompt: str, image_base64: str, detail: str) -> List[Dict]:
+    """
+    Build OpenAI chat content parts for a prompt and a JPEG image
+    
+    Args:
+        prompt: Instruction text
+        image_base64: Base64 encoded JPEG image
+        detail: Vision detail level ("low" or "high")
+    
+    Returns:
+        List of content parts
+    """
+    return [
+        {"type": "text", "text": prompt},
+        {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{image_base64}",
+                "detail": detail
+            }
+        }
+    ]
+
+
+class OCRBackend(ABC):
+    """Interface for vision OCR providers"""
+    
+    name = "base"
+    
+    @abstractmethod
+    def complete(self, prompt: str, image_base64: str, detail: str) -> str:
+        """
+        Run a vision call and return the raw text response
+        
+        Args:
+            prompt: Instruction text
+            image_base64: Base64 encoded JPEG image
+            detail: Vision detail level ("low" or "high")
+        
+        Returns:
+            Model response text
+        """
+    
+    @abstractmethod
+    async def acomplete(self, prompt: str, image_base64: str, detail: str) -> str:
+        """Async version of complete"""
+    
+    def close(self):
+        """Release backend resources"""
+    
+    async def aclose(self):
+        """Release backend resources, including async clients (call from the event loop)"""
+        self.close()
+
+
+class LangChainOCRBackend(OCRBackend):
+    """OpenAI Vision through langchain_openai.ChatOpenAI"""
+    
+    name = "langchain"
+    
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", base_url: Optional[str] = None):
+        """
+        Initialize LangChain backend
+        
+        Args:
+            api_key: OpenAI API key
+            model: OpenAI model to use
+            base_url: OpenAI-compatible endpoint (defaults to the OpenAI API)
+        """
+        try:
+            from langchain_openai import ChatOpenAI
+            from langchain_core.messages import HumanMessage
+        except ImportError as e:
+            logger.error(f"Required packages not installed: {e}")
+            raise
+        
+        self.llm = ChatOpenAI(
+            model=model,
+            api_key=api_key,
+            base_url=base_url,
+            temperature=0,
+            max_tokens=1000
+        )
+        self.HumanMessage = HumanMessage
+    
+    def _build_message(self, prompt: str, image_base64: str, detail: str):
+        """Build HumanMessage with prompt text and image"""
+        return self.HumanMessage(content=build_vision_content(prompt, image_base64, detail))
+    
+    def complete(self, prompt: str, image_base64: str, detail: str) -> str:
+        response = self.llm.invoke([self._build_message(prompt, image_base64, detail)])
+        return response.content
+    
+    async def acomplete(self, prompt: str, image_base64: str, detail: str) -> str:
+        response = await self.llm.ainvoke([self._build_message(prompt, image_base64, detail)])
+        return response.content
+
+
+class OpenAIOCRBackend(OCRBackend):
+    """OpenAI Vision through the openai SDK directly"""
+    
+    name = "openai"
+    
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini", base_url: Optional[str] = None):
+        """
+        Initialize OpenAI SDK backend
+        
+        Args:
+            api_key: OpenAI API key
+            model: OpenAI model to use
+            base_url: OpenAI-compatible endpoint (defaults to the OpenAI API)
+        """
+        try:
+            from openai import OpenAI, AsyncOpenAI
+        except ImportError as e:
+            logger.error(f"Required packages not installed: {e}")
+            raise
+        
+        self.model = model
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.async_client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+    
+    def _request(self, prompt: str, image_base64: str, detail: str) -> Dict:
+        """Build chat completion request arguments"""
+        return {
+            'model': self.model,
+            'temperature': 0,
+            'max_tokens': 1000,
+            'messages': [{
+                'role': 'user',
+                'content': build_vision_content(prompt, image_base64, detail)
+            }]
+        }
+    
+    def complete(self, prompt: str, image_base64: str, detail: str) -> str:
+        response = self.client.chat.completions.create(**self._request(prompt, image_base64, detail))
+        return response.choices[0].message.content or ""
+    
+    async def acomplete(self, prompt: str, image_base64: str, detail: str) -> str:
+        response = await self.async_client.chat.completions.create(
+            **self._request(prompt, image_base64, detail)
+        )
+        return response.choices[0].message.content or ""
+    
+    def close(self):
+        self.client.close()
+    
+    async def aclose(self):
+        self.client.close()
+        await self.async_client.close()
+
+
+OCR_BACKENDS: Dict[str, Type[OCRBackend]] = {
+    LangChainOCRBackend.name: LangChainOCRBackend,
+    OpenAIOCRBackend.name: OpenAIOCRBackend,
+}
+
+
+def create_ocr_backend(
+    name: str,
+    api_key: str,
+    model: str = "gpt-4o-mini",
+    base_url: Optional[str] = None
+) -> OCRBackend:
+    """
+    Create an OCR backend by name
+    
+    Args:
+        name: Backend name ("langchain" or "openai")
+        api_key: OpenAI API key
+        model: Model to use
+        base_url: OpenAI-compatible endpoint (e.g. a local fake server)
+    
+    Returns:
+        OCR backend instance
+    """
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name}. Available: {', '.join(OCR_BACKENDS)}")
+    
+    backend = OCR_BACKENDS[name](api_key=api_key, model=model, base_url=base_url or None)
+    logger.info(f"OCR backend: {name} ({model}{', ' + base_url if base_url else ''})")
+    return backend
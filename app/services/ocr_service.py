@@ -2,137 +2,201 @@
 OCR service for receipt processing using OpenAI Vision
 Improved with better error handling and caching
 """
+import asyncio
 import base64
+import hashlib
 import json
 import logging
-from typing import Optional, Dict
-from PIL import Image
-import io
+from typing import Optional, Dict, Tuple, Union
+
+from app.services.image_processor import ImageProcessor, ProcessedImage
+from app.services.ocr_backends import OCRBackend, create_ocr_backend
 
 logger = logging.getLogger(__name__)
 
 
+RECEIPT_PROMPT = """Analyze this bank transfer receipt and extract the following information:
+
+1. Transfer amount (numeric value only, no currency symbols)
+2. Sender bank name
+3. Receiver bank name
+4. Sender account name
+5. Receiver account name
+6. Transaction status (successful, pending, or failed)
+7. Transaction reference number
+
+Important:
+- For bank names, use common abbreviations if visible (e.g., SCB, KTB, KBank)
+- For names, extract exactly as shown (including titles like MISS, MR, etc.)
+- For amount, extract only the numeric value
+- Look for keywords like "สำเร็จ" (successful), "Success", "Completed"
+
+Return ONLY valid JSON format with no additional text:
+{
+    "amount": <number or null>,
+    "sender_bank": "<bank name or null>",
+    "receiver_bank": "<bank name or null>",
+    "sender_name": "<name or null>",
+    "receiver_name": "<name or null>",
+    "status": "<status or null>",
+    "reference": "<ref or null>"
+}"""
+
+
 class OCRService:
     """Handle OCR operations using OpenAI Vision"""
     
-    def __init__(self, api_key: str, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        max_concurrency: int = 4,
+        db_service=None,
+        cache_ttl_seconds: int = 72 * 3600,
+        cache_max_entries: int = 5000,
+        image_processor: Optional[ImageProcessor] = None,
+        two_pass: bool = False,
+        backend: Optional[OCRBackend] = None
+    ):
         """
         Initialize OCR service
         
         Args:
             api_key: OpenAI API key
             model: OpenAI model to use
+            max_concurrency: Maximum number of vision calls in flight at once
+            db_service: Async database service used for the OCR result cache (optional)
+            cache_ttl_seconds: Maximum age of a cached OCR result
+            cache_max_entries: Maximum number of cached OCR results
+            image_processor: Image preprocessor (defaults to in-thread processing)
+            two_pass: Try a low-detail call first and escalate to the target
+                tier only when required fields are missing or invalid
+            backend: OCR provider (defaults to OpenAI through LangChain)
         """
         try:
-            from langchain_openai import ChatOpenAI
-            from langchain_core.messages import HumanMessage
-            
             self.api_key = api_key
             self.model = model
-            self.llm = ChatOpenAI(
-                model=model,
-                api_key=api_key,
-                temperature=0,
-                max_tokens=1000
+            self.backend = backend or create_ocr_backend("langchain", api_key, model)
+            
+            # Limits concurrent async vision calls (shared by all handlers)
+            self.max_concurrency = max(1, max_concurrency)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            
+            self.image_processor = image_processor or ImageProcessor(max_workers=0)
+            
+            # OCR result cache keyed by image hash
+            self.db = db_service
+            self.cache_ttl_seconds = cache_ttl_seconds
+            self.cache_max_entries = cache_max_entries
+            self.cache_hits = 0
+            self.cache_misses = 0
+            
+            # Two-pass (low detail first) escalation mode
+            self.two_pass = two_pass
+            self.pass_stats = {
+                'low_attempts': 0,
+                'low_accepted': 0,
+                'escalations': 0,
+                'high_accepted': 0,
+            }
+            
+            logger.info(
+                f"OCR Service initialized with {model} "
+                f"(max concurrency: {self.max_concurrency}, two-pass: {self.two_pass})"
             )
-            self.HumanMessage = HumanMessage
-            logger.info(f"OCR Service initialized with {model}")
             
-        except ImportError as e:
-            logger.error(f"Required packages not installed: {e}")
-            raise
         except Exception as e:
             logger.error(f"Error initializing OCR service: {e}")
             raise
     
-    def image_to_base64(self, image_path: str) -> str:
+    def image_to_jpeg(self, image: Union[str, bytes]) -> bytes:
         """
-        Convert image to base64
+        Normalize image to RGB JPEG bytes
         
         Args:
-            image_path: Path to image file
+            image: Path to image file or raw image bytes
         
         Returns:
-            Base64 encoded image string
+            JPEG encoded image bytes
         """
         try:
-            with Image.open(image_path) as img:
-                # Convert to RGB
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-                
-                # Resize if too large
-                max_size = (2048, 2048)
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                # Convert to base64
-                buffered = io.BytesIO()
-                img.save(buffered, format="JPEG", quality=90)
-                return base64.b64encode(buffered.getvalue()).decode()
-                
+            return self.image_processor.process(image).data
         except Exception as e:
-            logger.error(f"Error converting image to base64: {e}")
+            logger.error(f"Error converting image to JPEG: {e}")
             raise
     
-    def extract_receipt_info(self, image_path: str) -> Optional[Dict]:
+    def image_to_base64(self, image: Union[str, bytes]) -> str:
         """
-        Extract information from receipt using OpenAI Vision
+        Convert image to base64
+        
+        Args:
+            image: Path to image file or raw image bytes
+        
+        Returns:
+            Base64 encoded image string
+        """
+        return base64.b64encode(self.image_to_jpeg(image)).decode()
+    
+    @staticmethod
+    def image_hash(image_bytes: bytes) -> str:
+        """Get cache key for normalized image bytes"""
+        return hashlib.sha256(image_bytes).hexdigest()
+    
+    async def _get_cached_result(self, image_hash: str) -> Optional[Dict]:
+        """Look up cached OCR result and update hit/miss counters"""
+        if not self.db:
+            return None
+        
+        result = await self.db.get_ocr_cache(image_hash, self.cache_ttl_seconds)
+        if result is not None:
+            self.cache_hits += 1
+            # Queued on the database writer; the hit does not wait for it
+            self.db.touch_ocr_cache(image_hash)
+            logger.info(f"OCR cache hit: {image_hash[:12]} (hits={self.cache_hits}, misses={self.cache_misses})")
+        else:
+            self.cache_misses += 1
+        return result
+    
+    async def _store_cached_result(self, image_hash: str, result: Optional[Dict]):
+        """Store successful OCR result in cache"""
+        if self.db and result:
+            await self.db.set_ocr_cache(image_hash, result, self.cache_ttl_seconds, self.cache_max_entries)
+    
+    async def _aprepare_image(self, image: Union[str, bytes]) -> Tuple[str, Optional[Dict], ProcessedImage]:
+        """
+        Normalize image in the image process pool and check the OCR cache
+        
+        Args:
+            image: Path to image file or raw image bytes
+        
+        Returns:
+            Tuple of (image_hash, cached_result, processed_image)
+        """
+        processed = await self.image_processor.aprocess(image)
+        image_hash = self.image_hash(processed.data)
+        cached = await self._get_cached_result(image_hash)
+        return image_hash, cached, processed
+    
+    def get_cache_stats(self) -> Dict:
+        """Get OCR cache hit/miss counters"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_rate': self.cache_hits / total if total else 0.0
+        }
+    
+    def _parse_response(self, content: str) -> Optional[Dict]:
+        """
+        Parse JSON from model response
         
         Args:
-            image_path: Path to receipt image
+            content: Raw model response text
         
         Returns:
             Dictionary with extracted information or None if failed
         """
         try:
-            image_base64 = self.image_to_base64(image_path)
-            
-            prompt_text = """Analyze this bank transfer receipt and extract the following information:
-
-1. Transfer amount (numeric value only, no currency symbols)
-2. Sender bank name
-3. Receiver bank name
-4. Sender account name
-5. Receiver account name
-6. Transaction status (successful, pending, or failed)
-7. Transaction reference number
-
-Important:
-- For bank names, use common abbreviations if visible (e.g., SCB, KTB, KBank)
-- For names, extract exactly as shown (including titles like MISS, MR, etc.)
-- For amount, extract only the numeric value
-- Look for keywords like "สำเร็จ" (successful), "Success", "Completed"
-
-Return ONLY valid JSON format with no additional text:
-{
-    "amount": <number or null>,
-    "sender_bank": "<bank name or null>",
-    "receiver_bank": "<bank name or null>",
-    "sender_name": "<name or null>",
-    "receiver_name": "<name or null>",
-    "status": "<status or null>",
-    "reference": "<ref or null>"
-}"""
-            
-            # Create message with image
-            message = self.HumanMessage(
-                content=[
-                    {"type": "text", "text": prompt_text},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}",
-                            "detail": "high"
-                        }
-                    }
-                ]
-            )
-            
-            # Invoke the model
-            response = self.llm.invoke([message])
-            content = response.content
-            
-            # Parse JSON from response
             if "```json" in content:
                 content = content.split("```json")[1].split("```")[0].strip()
             elif "```" in content:
@@ -144,8 +208,155 @@ Return ONLY valid JSON format with no additional text:
             
         except json.JSONDecodeError as e:
             logger.error(f"JSON parsing error: {e}")
-            logger.error(f"Response content: {content if 'content' in locals() else 'N/A'}")
+            logger.error(f"Response content: {content}")
+            return None
+    
+    @staticmethod
+    def _needs_escalation(result: Optional[Dict]) -> bool:
+        """
+        Check whether a low-detail result is missing or has invalid key fields
+        
+        Args:
+            result: Parsed OCR result
+        
+        Returns:
+            True if amount, receiver_name or status is null or invalid
+        """
+        if not result:
+            return True
+        
+        try:
+            if float(result.get('amount')) <= 0:
+                return True
+        except (TypeError, ValueError):
+            return True
+        
+        for field in ('receiver_name', 'status'):
+            value = result.get(field)
+            if not isinstance(value, str) or not value.strip() or value.strip().lower() == 'null':
+                return True
+        
+        return False
+    
+    def _use_two_pass(self, processed: ProcessedImage) -> bool:
+        """Two-pass only helps when the target tier is above the low tier"""
+        return self.two_pass and processed.detail != 'low'
+    
+    def _record_pass(self, low_result: Optional[Dict]) -> bool:
+        """Update per-pass counters; returns True if the low pass is accepted"""
+        self.pass_stats['low_attempts'] += 1
+        if self._needs_escalation(low_result):
+            self.pass_stats['escalations'] += 1
+            logger.info("Low-detail OCR incomplete, escalating to high detail")
+            return False
+        
+        self.pass_stats['low_accepted'] += 1
+        return True
+    
+    def get_pass_stats(self) -> Dict:
+        """Get two-pass hit rates"""
+        stats = dict(self.pass_stats)
+        attempts = stats['low_attempts']
+        stats['low_hit_rate'] = stats['low_accepted'] / attempts if attempts else 0.0
+        stats['escalation_rate'] = stats['escalations'] / attempts if attempts else 0.0
+        return stats
+    
+    def _invoke(self, processed: ProcessedImage) -> Optional[Dict]:
+        """Call the OCR backend for a preprocessed image"""
+        image_base64 = base64.b64encode(processed.data).decode()
+        content = self.backend.complete(RECEIPT_PROMPT, image_base64, processed.detail)
+        return self._parse_response(content)
+    
+    async def _ainvoke(self, processed: ProcessedImage) -> Optional[Dict]:
+        """Call the OCR backend asynchronously for a preprocessed image"""
+        image_base64 = base64.b64encode(processed.data).decode()
+        async with self._semaphore:
+            content = await self.backend.acomplete(RECEIPT_PROMPT, image_base64, processed.detail)
+        return self._parse_response(content)
+    
+    def extract_receipt_info(self, image: Union[str, bytes]) -> Optional[Dict]:
+        """
+        Extract information from receipt using OpenAI Vision
+        
+        Blocking call without the OCR cache, which is only reachable through
+        the async database service - use aextract_receipt_info from async handlers.
+        
+        Args:
+            image: Path to receipt image or raw image bytes
+        
+        Returns:
+            Dictionary with extracted information or None if failed
+        """
+        try:
+            image = self.image_processor.read_bytes(image)
+            processed = self.image_processor.process(image)
+            
+            result = None
+            if self._use_two_pass(processed):
+                low_result = self._invoke(self.image_processor.process(image, tier_name='low'))
+                if self._record_pass(low_result):
+                    result = low_result
+            
+            if result is None:
+                result = self._invoke(processed)
+                if self._use_two_pass(processed) and not self._needs_escalation(result):
+                    self.pass_stats['high_accepted'] += 1
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"OCR Error: {e}")
             return None
+    
+    async def aextract_receipt_info(self, image: Union[str, bytes]) -> Optional[Dict]:
+        """
+        Extract information from receipt without blocking the event loop
+        
+        Image encoding runs in the image process pool, the cache lookup on a
+        database reader thread and the backend is called through its async
+        client. Cache hits return without waiting for a slot; at most
+        max_concurrency model calls run at the same time. In two-pass mode a low-detail call is made
+        first and the target tier is only sent if key fields are missing.
+        
+        Args:
+            image: Path to receipt image or raw image bytes
+        
+        Returns:
+            Dictionary with extracted information or None if failed
+        """
+        try:
+            if isinstance(image, str):
+                image = await asyncio.to_thread(self.image_processor.read_bytes, image)
+            
+            image_hash, cached, processed = await self._aprepare_image(image)
+            if cached is not None:
+                return cached
+            
+            result = None
+            if self._use_two_pass(processed):
+                low_image = await self.image_processor.aprocess(image, tier_name='low')
+                low_result = await self._ainvoke(low_image)
+                if self._record_pass(low_result):
+                    result = low_result
+            
+            if result is None:
+                result = await self._ainvoke(processed)
+                if self._use_two_pass(processed) and not self._needs_escalation(result):
+                    self.pass_stats['high_accepted'] += 1
+            
+            await self._store_cached_result(image_hash, result)
+            return result
+            
         except Exception as e:
             logger.error(f"OCR Error: {e}")
             return None
+    
+    def close(self):
+        """Release OCR resources"""
+        self.image_processor.shutdown()
+        self.backend.close()
+    
+    async def aclose(self):
+        """Release OCR resources, including the backend's async client"""
+        self.image_processor.shutdown()
+        await self.backend.aclose()
@@ -0,0 +1,205 @@
+"""
+Content-addressed receipt storage
+Stores receipt images under the SHA-256 of their bytes in sharded
+subdirectories, so identical uploads share one file and no directory grows
+past a few hundred entries
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+from app.utils.file_utils import write_file
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptStore:
+    """Hash-named receipt files in <root>/<ab>/<cd>/<hash>.jpg"""
+
+    def __init__(self, root: Union[str, Path], shard_levels: int = 2, shard_width: int = 2):
+        """
+        Initialize receipt store
+
+        Args:
+            root: Store root directory
+            shard_levels: Number of nested shard directories
+            shard_width: Hex characters of the hash per shard directory
+        """
+        self.root = Path(root)
+        self.shard_levels = shard_levels
+        self.shard_width = shard_width
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        """Get content address of receipt bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    def path_for(self, content_hash: str) -> Path:
+        """Get sharded path for a content hash"""
+        shards = [
+            content_hash[i * self.shard_width:(i + 1) * self.shard_width]
+            for i in range(self.shard_levels)
+        ]
+        return self.root.joinpath(*shards, f"{content_hash}.jpg")
+
+    def locate(self, data: bytes) -> Tuple[str, str]:
+        """
+        Get content hash and path for receipt bytes without touching disk
+
+        Args:
+            data: Receipt image bytes
+
+        Returns:
+            Tuple of (content_hash, file_path)
+        """
+        content_hash = self.content_hash(data)
+        return content_hash, str(self.path_for(content_hash))
+
+    def put(self, data: bytes) -> Tuple[str, str]:
+        """
+        Store receipt bytes, skipping the write if the content is already stored
+
+        Args:
+            data: Receipt image bytes
+
+        Returns:
+            Tuple of (content_hash, file_path)
+
+        Raises:
+            OSError: If the receipt could not be written
+        """
+        content_hash, file_path = self.locate(data)
+        if os.path.exists(file_path):
+            logger.debug(f"Receipt {content_hash[:12]} already stored")
+            return content_hash, file_path
+
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        if not write_file(file_path, data):
+            raise OSError(f"Could not store receipt {content_hash[:12]} at {file_path}")
+        return content_hash, file_path
+
+    def recompress(self, file_path: str, quality: int = 60, max_size: int = 1280) -> Optional[int]:
+        """
+        Re-encode a stored receipt at lower quality and resolution
+
+        The file keeps its name (the hash of the original upload). It is only
+        replaced if the re-encoded image is smaller.
+
+        Args:
+            file_path: Stored receipt path
+            quality: JPEG quality
+            max_size: Maximum long side in pixels
+
+        Returns:
+            New file size in bytes, or None if the file is missing or unreadable
+        """
+        try:
+            with Image.open(file_path) as img:
+                img = img.convert('RGB')
+                img.thumbnail((max_size, max_size))
+                buffer = io.BytesIO()
+                img.save(buffer, format='JPEG', quality=quality, optimize=True)
+
+            data = buffer.getvalue()
+            if len(data) < os.path.getsize(file_path):
+                write_file(file_path, data)
+                return len(data)
+            return os.path.getsize(file_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error recompressing receipt {file_path}: {e}")
+            return None
+
+    def remove(self, file_path: str) -> bool:
+        """
+        Delete a stored receipt and any shard directories it leaves empty
+
+        Args:
+            file_path: Stored receipt path
+
+        Returns:
+            True if the file is gone
+        """
+        path = Path(file_path)
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"Error removing receipt {file_path}: {e}")
+            return False
+
+        parent = path.parent
+        while parent != self.root and self.root in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+        return True
+
+    async def apply_retention(
+        self,
+        db_service,
+        recompress_after_days: int = 30,
+        retention_days: int = 0,
+        orphan_after_hours: int = 24,
+        quality: int = 60,
+        max_size: int = 1280,
+        batch_size: int = 200
+    ) -> Dict[str, int]:
+        """
+        Recompress old receipts and remove expired or unreferenced ones
+
+        File work runs in worker threads; the receipt_blobs table is read and
+        updated through the async database service.
+
+        Args:
+            db_service: Async database service holding the receipt_blobs table
+            recompress_after_days: Recompress receipts older than this (0 disables)
+            retention_days: Remove receipts older than this unless a pending
+                transaction still references them (0 keeps them forever)
+            orphan_after_hours: Remove receipts no transaction references and no
+                unfinished exchange holds after this
+            quality: JPEG quality for recompression
+            max_size: Maximum long side in pixels for recompression
+            batch_size: Maximum receipts handled per action and run
+
+        Returns:
+            Dictionary with recompressed, removed and bytes_saved counts
+        """
+        now = datetime.now()
+        stats = {'recompressed': 0, 'removed': 0, 'bytes_saved': 0}
+
+        remove_before = now - timedelta(days=retention_days) if retention_days > 0 else None
+        orphan_before = now - timedelta(hours=orphan_after_hours)
+        for blob in await db_service.get_receipt_blobs_to_remove(orphan_before, remove_before, batch_size):
+            if await asyncio.to_thread(self.remove, blob['file_path']):
+                await db_service.mark_receipt_blob_removed(blob['content_hash'])
+                stats['removed'] += 1
+                stats['bytes_saved'] += blob['size'] or 0
+
+        if recompress_after_days > 0:
+            recompress_before = now - timedelta(days=recompress_after_days)
+            for blob in await db_service.get_receipt_blobs_to_recompress(recompress_before, batch_size):
+                new_size = await asyncio.to_thread(self.recompress, blob['file_path'], quality, max_size)
+                if new_size is None:
+                    await db_service.mark_receipt_blob_removed(blob['content_hash'])
+                    continue
+                await db_service.mark_receipt_blob_compressed(blob['content_hash'], new_size)
+                stats['recompressed'] += 1
+                stats['bytes_saved'] += max(0, (blob['size'] or 0) - new_size)
+
+        if stats['recompressed'] or stats['removed']:
+            logger.info(
+                f"Receipt retention: {stats['recompressed']} recompressed, {stats['removed']} removed, "
+                f"{stats['bytes_saved'] / 1024:,.0f} KiB saved"
+            )
+        return stats
@@ -0,0 +1,222 @@
+"""
+SQLite bot persistence
+Stores conversation states, user_data, chat_data and bot_data as one JSON
+row per key in the bot database, writing only the rows whose content changed
+"""
+import asyncio
+import base64
+import json
+import logging
+import pickle
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_KIND = 'conversation:'
+# Marks a value stored as base64 pickle because JSON cannot represent it
+PICKLE_KEY = '__pickle__'
+
+
+class SQLitePersistence(BasePersistence[Dict, Dict, Dict]):
+    """
+    PTB persistence backed by the persistence table
+
+    PTB hands over the data of every user and chat touched since the last
+    update. Each value is encoded as canonical JSON and compared with what
+    was last stored for that row; only changed rows are staged. Rows staged
+    in the same tick (one persistence run, or a conversation state change)
+    are written together in one transaction on the database writer thread.
+    Empty user/chat data and ended conversations delete their row, so the
+    table only holds users who are mid-exchange.
+
+    A top-level value JSON cannot represent (a datetime, a PTB object) is
+    pickled within its row instead, so a conversation state is never stored
+    without its data. A value that cannot be pickled either raises.
+    """
+
+    def __init__(self, db_service, update_interval: float = 10, store_bot_data: bool = True):
+        """
+        Initialize persistence
+
+        Args:
+            db_service: Async database service
+            update_interval: Seconds between PTB's persistence runs
+            store_bot_data: Persist bot_data as well as user and chat data
+        """
+        super().__init__(
+            store_data=PersistenceInput(bot_data=store_bot_data, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = db_service
+        self._stored: Dict[Tuple[str, str], str] = {}
+        self._pending: Dict[Tuple[str, str], Optional[str]] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        self.stats = {'staged': 0, 'unchanged': 0, 'written': 0, 'batches': 0, 'failed': 0, 'pickled': 0}
+
+    @staticmethod
+    def _encode(value: Any) -> str:
+        """Canonical JSON, so equal data always encodes to the same text"""
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+    def _serialize(self, kind: str, key: str, value: Any) -> str:
+        """Encode a row, pickling the top-level values JSON cannot represent"""
+        try:
+            return self._encode(value)
+        except (TypeError, ValueError):
+            if not isinstance(value, dict):
+                raise
+
+        encoded = {}
+        for name, item in value.items():
+            try:
+                self._encode(item)
+            except (TypeError, ValueError):
+                logger.debug(f"Persisting {kind}/{key} field {name!r} as pickle, it is not JSON serializable")
+                item = {PICKLE_KEY: base64.b64encode(pickle.dumps(item)).decode('ascii')}
+                self.stats['pickled'] += 1
+            encoded[name] = item
+        return self._encode(encoded)
+
+    @staticmethod
+    def _deserialize(kind: str, key: str, raw: str) -> Any:
+        """Decode a row written by _serialize"""
+        value = json.loads(raw)
+        if not isinstance(value, dict):
+            return value
+
+        for name, item in list(value.items()):
+            if isinstance(item, dict) and item.keys() == {PICKLE_KEY}:
+                try:
+                    value[name] = pickle.loads(base64.b64decode(item[PICKLE_KEY]))
+                except Exception as e:
+                    logger.warning(f"Dropping unreadable field {name!r} of persistence row {kind}/{key}: {e}")
+                    del value[name]
+        return value
+
+    async def _load(self, kind: str) -> Dict[str, Any]:
+        """Load all rows of a kind and remember what is stored"""
+        rows = await self.db.get_persistence_entries(kind)
+        data = {}
+        for key, raw in rows.items():
+            try:
+                data[key] = self._deserialize(kind, key, raw)
+            except ValueError:
+                logger.warning(f"Dropping unreadable persistence row {kind}/{key}")
+                continue
+            self._stored[(kind, key)] = raw
+        return data
+
+    def _stage(self, kind: str, key: str, value: Any):
+        """
+        Queue a row for writing if its content changed
+
+        Args:
+            kind: Row kind
+            key: Row key
+            value: New value (None deletes the row)
+
+        Raises:
+            TypeError: If a value can be neither JSON encoded nor pickled
+        """
+        if value is None:
+            raw = None
+        else:
+            try:
+                raw = self._serialize(kind, key, value)
+            except (TypeError, ValueError, AttributeError, pickle.PicklingError) as e:
+                raise TypeError(f"Cannot persist {kind}/{key}: {e}") from e
+
+        row = (kind, key)
+        if self._pending.get(row, self._stored.get(row)) == raw:
+            self.stats['unchanged'] += 1
+            return
+
+        self._pending[row] = raw
+        self.stats['staged'] += 1
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_soon())
+
+    async def _write_soon(self):
+        # Yield once so the rest of the current persistence run is staged too
+        await asyncio.sleep(0)
+        # Rows staged while a batch was being written go in the next batch
+        while self._pending:
+            if not await self._write_pending():
+                break
+
+    async def _write_pending(self) -> bool:
+        """Write staged rows in one transaction; failed rows stay staged"""
+        if not self._pending:
+            return True
+
+        batch, self._pending = self._pending, {}
+        entries = [(kind, key, raw) for (kind, key), raw in batch.items()]
+        if not await self.db.write_persistence_entries(entries):
+            self.stats['failed'] += 1
+            for row, raw in batch.items():
+                self._pending.setdefault(row, raw)
+            return False
+
+        for row, raw in batch.items():
+            if raw is None:
+                self._stored.pop(row, None)
+            else:
+                self._stored[row] = raw
+        self.stats['written'] += len(entries)
+        self.stats['batches'] += 1
+        return True
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return {int(key): value for key, value in (await self._load('user')).items()}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {int(key): value for key, value in (await self._load('chat')).items()}
+
+    async def get_bot_data(self) -> Dict:
+        return (await self._load('bot')).get('bot', {})
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        rows = await self._load(CONVERSATION_KIND + name)
+        return {tuple(json.loads(key)): state for key, state in rows.items()}
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        self._stage(CONVERSATION_KIND + name, self._encode(list(key)), new_state)
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        self._stage('user', str(user_id), data or None)
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        self._stage('chat', str(chat_id), data or None)
+
+    async def update_bot_data(self, data: Dict) -> None:
+        self._stage('bot', 'bot', data or None)
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage('chat', str(chat_id), None)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage('user', str(user_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        """Nothing to do: this process is the only writer"""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        """Nothing to do: this process is the only writer"""
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        """Nothing to do: this process is the only writer"""
+
+    async def flush(self) -> None:
+        """Write everything still staged (called on shutdown)"""
+        if self._write_task and not self._write_task.done():
+            await self._write_task
+        await self._write_pending()
+        logger.info(f"Persistence flushed: {self.stats}")
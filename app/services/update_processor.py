@@ -0,0 +1,154 @@
+"""
+Keyed update processor
+Handles updates concurrently on a bounded number of workers while keeping
+updates from the same chat (or user) strictly in arrival order
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyQueue:
+    """FIFO lock for one ordering key plus the number of updates holding or waiting on it"""
+    __slots__ = ('lock', 'depth')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Concurrent update processing with per-key ordering
+
+    PTB's own semaphore (max_pending) bounds how many updates may be admitted
+    at once. An admitted update first takes its key's FIFO lock, so updates
+    for one chat run one at a time in arrival order, and only then a worker
+    slot, so updates waiting behind their chat never occupy a worker.
+    Updates without a chat or user are not ordered.
+    """
+
+    def __init__(self, workers: int = 8, max_pending: int = 256, latency_window: int = 500):
+        """
+        Initialize processor
+
+        Args:
+            workers: Maximum updates handled at the same time
+            max_pending: Maximum updates admitted (waiting or running) at once
+            latency_window: Number of recent updates kept for wait/run metrics
+        """
+        super().__init__(max(max_pending, workers, 2))
+        self.workers = max(1, workers)
+        self._worker_slots = asyncio.Semaphore(self.workers)
+        self._keys: Dict[Hashable, _KeyQueue] = {}
+        self._admitted = 0
+        self._running = 0
+        self._waits: Deque[float] = deque(maxlen=latency_window)
+        self._runs: Deque[float] = deque(maxlen=latency_window)
+        self.stats = {'processed': 0, 'failed': 0, 'ordered_waits': 0, 'max_key_depth': 0}
+
+    @staticmethod
+    def ordering_key(update: Any) -> Optional[Hashable]:
+        """Get the key whose updates must stay ordered (chat, else user)"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return ('user', update.effective_user.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Run an update after earlier updates for its key, on a free worker"""
+        key = self.ordering_key(update)
+        admitted = time.monotonic()
+        self._admitted += 1
+        try:
+            if key is None:
+                await self._run(coroutine, admitted)
+            else:
+                await self._run_in_order(key, coroutine, admitted)
+        finally:
+            self._admitted -= 1
+
+    async def _run_in_order(self, key: Hashable, coroutine: Awaitable[Any], admitted: float):
+        """Run an update once every earlier update for its key has finished"""
+        queue = self._keys.get(key)
+        if queue is None:
+            queue = self._keys[key] = _KeyQueue()
+        queue.depth += 1
+        if queue.depth > 1:
+            self.stats['ordered_waits'] += 1
+            self.stats['max_key_depth'] = max(self.stats['max_key_depth'], queue.depth)
+
+        try:
+            async with queue.lock:
+                await self._run(coroutine, admitted)
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0:
+                del self._keys[key]
+
+    async def _run(self, coroutine: Awaitable[Any], admitted: float):
+        """Await the update's coroutine on a worker slot, recording wait and run time"""
+        async with self._worker_slots:
+            started = time.monotonic()
+            self._waits.append(started - admitted)
+            self._running += 1
+            try:
+                await coroutine
+                self.stats['processed'] += 1
+            except Exception:
+                # Application.process_update handles handler errors; this is a safety net
+                self.stats['failed'] += 1
+                raise
+            finally:
+                self._running -= 1
+                self._runs.append(time.monotonic() - started)
+
+    async def initialize(self) -> None:
+        """Nothing to allocate"""
+
+    async def shutdown(self) -> None:
+        """Log final counters"""
+        logger.info(f"Update processor stopped: {self.stats}")
+
+    @staticmethod
+    def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+        ordered = sorted(samples)
+        return {
+            'p50_ms': ordered[len(ordered) // 2] * 1000,
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            'max_ms': ordered[-1] * 1000,
+        }
+
+    def get_metrics(self) -> Dict:
+        """
+        Get worker usage and per-key queue metrics
+
+        Returns:
+            Dictionary with counters, running/queued updates, keys with a
+            backlog, the deepest current key queue and p50/p95/max wait
+            (admission to start) and run times in milliseconds
+        """
+        depths = [queue.depth for queue in self._keys.values()]
+        metrics = {
+            **self.stats,
+            'workers': self.workers,
+            'running': self._running,
+            'queued': self._admitted - self._running,
+            'active_keys': len(depths),
+            'backlogged_keys': sum(1 for depth in depths if depth > 1),
+            'deepest_key_queue': max(depths, default=0),
+        }
+        if self._waits:
+            metrics['wait'] = self._percentiles(self._waits)
+            metrics['run'] = self._percentiles(self._runs)
+        return metrics
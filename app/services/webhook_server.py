@@ -0,0 +1,218 @@
+"""
+Embedded webhook listener
+Minimal asyncio HTTP/1.1 server that receives Telegram updates, checks the
+secret token and puts decoded updates on the application's update queue
+"""
+import asyncio
+import hmac
+import json
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    408: 'Request Timeout',
+    413: 'Payload Too Large',
+}
+
+
+class HTTPError(Exception):
+    """Malformed request; the connection is closed after the response"""
+
+    def __init__(self, status: int):
+        super().__init__(REASONS.get(status, str(status)))
+        self.status = status
+
+
+async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    """Read header lines up to the blank line; names are lowercased"""
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+async def read_http_request(
+    reader: asyncio.StreamReader,
+    max_body_bytes: int = 1024 * 1024,
+    read_timeout: float = 10.0
+) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """
+    Read one HTTP/1.1 request
+
+    Args:
+        reader: Connection stream
+        max_body_bytes: Largest accepted body
+        read_timeout: Seconds allowed for the request line, for the headers
+            and for the body each, so a stalled client cannot hold the
+            connection open
+
+    Returns:
+        Tuple of (method, path, headers with lowercase names, body), or None
+        if the client closed the connection or sent nothing before the timeout
+    """
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), read_timeout)
+    except asyncio.TimeoutError:
+        # Idle keep-alive connection
+        return None
+    if not request_line:
+        return None
+
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400)
+
+    try:
+        headers = await asyncio.wait_for(_read_headers(reader), read_timeout)
+    except asyncio.TimeoutError:
+        raise HTTPError(408)
+
+    try:
+        length = int(headers.get('content-length', '0'))
+    except ValueError:
+        raise HTTPError(400)
+    if length < 0:
+        raise HTTPError(400)
+    if length > max_body_bytes:
+        raise HTTPError(413)
+
+    try:
+        body = await asyncio.wait_for(reader.readexactly(length), read_timeout) if length else b''
+    except asyncio.TimeoutError:
+        raise HTTPError(408)
+    return method.upper(), path, headers, body
+
+
+def http_response(status: int, body: bytes = b'', content_type: str = 'application/json', keep_alive: bool = True) -> bytes:
+    """Build an HTTP/1.1 response"""
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+class WebhookServer:
+    """Receives Telegram webhook POSTs and feeds application.update_queue"""
+
+    def __init__(
+        self,
+        application,
+        listen: str = '0.0.0.0',
+        port: int = 8443,
+        url_path: str = '/telegram',
+        secret_token: Optional[str] = None,
+        max_body_bytes: int = 1024 * 1024,
+        read_timeout: float = 10.0
+    ):
+        """
+        Initialize webhook server
+
+        Args:
+            application: PTB Application (bot and update_queue are used)
+            listen: Interface to bind
+            port: Port to bind (0 picks a free port)
+            url_path: Path Telegram posts updates to
+            secret_token: Expected X-Telegram-Bot-Api-Secret-Token (None disables the check)
+            max_body_bytes: Largest accepted update
+            read_timeout: Seconds a client may take to send each part of a request
+        """
+        self.application = application
+        self.listen = listen
+        self.port = port
+        self.url_path = '/' + url_path.strip('/')
+        self.secret_token = secret_token
+        self.max_body_bytes = max_body_bytes
+        self.read_timeout = read_timeout
+        self._server: Optional[asyncio.base_events.Server] = None
+        self.stats = {'received': 0, 'rejected': 0, 'invalid': 0, 'decode_ms_total': 0.0}
+
+    async def start(self):
+        """Bind and start accepting connections"""
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Webhook server listening on {self.listen}:{self.port}{self.url_path}")
+
+    async def stop(self):
+        """Stop accepting connections"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            logger.info(f"Webhook server stopped: {self.stats}")
+
+    def _authorized(self, headers: Dict[str, str]) -> bool:
+        if not self.secret_token:
+            return True
+        return hmac.compare_digest(headers.get(SECRET_HEADER, ''), self.secret_token)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    request = await read_http_request(reader, self.max_body_bytes, self.read_timeout)
+                except HTTPError as e:
+                    writer.write(http_response(e.status, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                status = await self._handle_request(*request)
+                keep_alive = request[2].get('connection', '').lower() != 'close'
+                writer.write(http_response(status, keep_alive=keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Webhook connection error: {e}")
+        finally:
+            writer.close()
+
+    async def _handle_request(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> int:
+        """Check, decode and enqueue one update; returns the HTTP status"""
+        if path.split('?', 1)[0] != self.url_path:
+            return 404
+        if method != 'POST':
+            return 405
+        if not self._authorized(headers):
+            self.stats['rejected'] += 1
+            logger.warning("Webhook request with invalid secret token rejected")
+            return 403
+
+        started = time.perf_counter()
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+            if update is None:
+                # de_json returns None for empty payloads ([], {}, null)
+                raise ValueError("empty update")
+        except Exception as e:
+            self.stats['invalid'] += 1
+            logger.warning(f"Invalid webhook update: {e}")
+            return 400
+        self.stats['decode_ms_total'] += (time.perf_counter() - started) * 1000
+
+        await self.application.update_queue.put(update)
+        self.stats['received'] += 1
+        return 200
@@ -10,6 +10,10 @@ from .validators import validate_bank_info, validate_amount
 from .logger import setup_logger
 from .init_database import initialize_database, initialize_bank_accounts, initialize_settings
 from .currency_utils import round_mmk_amount, round_thb_amount, calculate_exchange, format_amount
+from .file_utils import write_file
+from .similarity import normalize_name, name_similarity, levenshtein_distance, NameIndex
+from .bank_registry import BankRegistry, normalize_bank, get_bank_registry
+from .telegram_utils import send_receipt_photo
 
 __all__ = [
     'private_chat_only',
@@ -29,4 +33,13 @@ __all__ = [
     'round_thb_amount',
     'calculate_exchange',
     'format_amount',
+    'write_file',
+    'normalize_name',
+    'name_similarity',
+    'levenshtein_distance',
+    'NameIndex',
+    'BankRegistry',
+    'normalize_bank',
+    'get_bank_registry',
+    'send_receipt_photo',
 ]
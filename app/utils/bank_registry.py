@@ -0,0 +1,190 @@
+"""
+Bank name registry
+
+Resolves free-text bank names from receipts and user input (e.g. "SCB Easy",
+"Kasikorn Bank", "KBZ Pay") to canonical bank IDs.
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+# Aliases shorter than this only match the whole bank string, never a part of it
+MIN_SUBSTRING_ALIAS = 3
+
+# Bounded memo of resolved strings
+MAX_RESOLVED_ENTRIES = 4096
+
+
+def normalize_bank(text: str) -> str:
+    """
+    Normalize bank text for lookup
+
+    Lowercases and keeps only letters and digits, so "Bangkok Bank",
+    "bangkok-bank" and "BangkokBank" all map to "bangkokbank".
+
+    Args:
+        text: Raw bank text
+
+    Returns:
+        Normalized bank key
+    """
+    if not text:
+        return ""
+    return ''.join(ch for ch in text.lower() if ch.isalnum())
+
+
+class BankRegistry:
+    """
+    Alias table compiled into an exact-match dict plus one regex per currency
+
+    A bank string is first looked up whole (a single dict probe). Otherwise
+    the compiled alternation of all aliases, longest first, finds the first
+    alias contained in it. Results are memoized so repeated strings resolve
+    with one dict lookup.
+    """
+
+    def __init__(self, banks: Optional[Dict[str, Tuple[str, Iterable[str]]]] = None):
+        """
+        Initialize registry
+
+        Args:
+            banks: Mapping of bank ID to (currency, aliases)
+        """
+        self._lock = threading.Lock()
+        self._banks: Dict[str, Tuple[str, List[str]]] = {}
+        self._exact: Dict[Optional[str], Dict[str, str]] = {}
+        self._patterns: Dict[Optional[str], Optional[Pattern]] = {}
+        self._resolved: Dict[Tuple[str, Optional[str]], Optional[str]] = {}
+
+        for bank_id, (currency, aliases) in (banks or {}).items():
+            self._banks[bank_id] = (currency, list(aliases))
+        self._compile()
+
+    @classmethod
+    def from_config(cls, config) -> 'BankRegistry':
+        """Build registry from Config.BANK_ALIASES"""
+        return cls(config.BANK_ALIASES)
+
+    def register(self, bank_id: str, currency: str, aliases: Iterable[str]):
+        """
+        Add a bank (or more aliases for an existing bank) and recompile
+
+        Args:
+            bank_id: Canonical bank ID
+            currency: Currency the bank operates in
+            aliases: Alternative names for the bank
+        """
+        with self._lock:
+            _, existing = self._banks.get(bank_id, (currency, []))
+            self._banks[bank_id] = (currency, existing + list(aliases))
+            self._compile()
+
+    def _compile(self):
+        """Rebuild lookup tables (caller holds the lock or is __init__)"""
+        exact: Dict[Optional[str], Dict[str, str]] = {None: {}}
+        substring: Dict[Optional[str], List[str]] = {None: []}
+
+        for bank_id, (currency, aliases) in self._banks.items():
+            keys = {normalize_bank(bank_id)} | {normalize_bank(alias) for alias in aliases}
+            keys.discard("")
+            for key in keys:
+                for scope in (None, currency):
+                    exact.setdefault(scope, {}).setdefault(key, bank_id)
+                    if len(key) >= MIN_SUBSTRING_ALIAS:
+                        substring.setdefault(scope, []).append(key)
+
+        patterns: Dict[Optional[str], Optional[Pattern]] = {}
+        for scope, keys in substring.items():
+            # Longest first so "kbzpay" wins over "kbz"
+            keys = sorted(set(keys), key=lambda k: (-len(k), k))
+            patterns[scope] = re.compile('|'.join(map(re.escape, keys))) if keys else None
+
+        self._exact = exact
+        self._patterns = patterns
+        self._resolved = {}
+
+    def resolve(self, text: str, currency: Optional[str] = None) -> Optional[str]:
+        """
+        Resolve free-text bank name to a canonical bank ID
+
+        Args:
+            text: Bank name as written on a receipt or by a user
+            currency: Only consider banks for this currency (optional)
+
+        Returns:
+            Bank ID or None if no alias matches
+        """
+        key = normalize_bank(text)
+        if not key:
+            return None
+
+        memo_key = (key, currency)
+        resolved = self._resolved
+        if memo_key in resolved:
+            return resolved[memo_key]
+
+        bank_id = self._exact.get(currency, {}).get(key)
+        if bank_id is None:
+            pattern = self._patterns.get(currency)
+            match = pattern.search(key) if pattern else None
+            if match:
+                bank_id = self._exact[currency][match.group()]
+
+        if len(resolved) >= MAX_RESOLVED_ENTRIES:
+            resolved.clear()
+        resolved[memo_key] = bank_id
+        return bank_id
+
+    def display_names(self, currency: Optional[str] = None) -> List[str]:
+        """
+        Get one display name per registered bank
+
+        Args:
+            currency: Only banks for this currency (optional)
+
+        Returns:
+            First alias (or the ID) of each bank, in registration order
+        """
+        return [
+            aliases[0] if aliases else bank_id
+            for bank_id, (bank_currency, aliases) in list(self._banks.items())
+            if currency is None or bank_currency == currency
+        ]
+
+    def currency_of(self, bank_id: str) -> Optional[str]:
+        """Get currency of a registered bank"""
+        entry = self._banks.get(bank_id)
+        return entry[0] if entry else None
+
+    def same_bank(self, bank1: str, bank2: str) -> bool:
+        """
+        Check if two bank strings refer to the same bank
+
+        Banks that both resolve are compared by ID. If either is unknown,
+        falls back to containment of the normalized strings.
+
+        Args:
+            bank1: First bank string
+            bank2: Second bank string
+
+        Returns:
+            True if the banks match
+        """
+        id1 = self.resolve(bank1)
+        id2 = self.resolve(bank2)
+        if id1 and id2:
+            return id1 == id2
+
+        norm1 = normalize_bank(bank1)
+        norm2 = normalize_bank(bank2)
+        if not norm1 or not norm2:
+            return False
+        return norm1 in norm2 or norm2 in norm1
+
+
+@lru_cache(maxsize=1)
+def get_bank_registry() -> BankRegistry:
+    """Shared registry built once from Config"""
+    from app.config.settings import Config
+    return BankRegistry.from_config(Config)
@@ -0,0 +1,32 @@
+"""File utilities"""
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def write_file(path: str, data: bytes) -> bool:
+    """
+    Write bytes to a file atomically
+    
+    The data is written to a temporary file first and moved into place, so
+    readers never see a partially written file.
+    
+    Args:
+        path: Destination file path
+        data: File contents
+    
+    Returns:
+        True if written, False otherwise
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.error(f"Error writing file {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
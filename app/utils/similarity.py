@@ -0,0 +1,281 @@
+"""
+Name similarity utilities for receiver account validation
+"""
+import threading
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Set
+
+# Titles stripped from the start of names before comparison
+NAME_PREFIXES = ('miss', 'mr', 'mrs', 'ms', 'dr', 'prof')
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize name for comparison
+    
+    Lowercases, strips a leading title, drops punctuation and removes spaces.
+    
+    Args:
+        name: Raw name
+    
+    Returns:
+        Normalized name
+    """
+    if not name:
+        return ""
+    
+    normalized = name.lower().strip()
+    
+    # Remove titles
+    for prefix in NAME_PREFIXES:
+        if normalized.startswith(prefix + ' ') or normalized.startswith(prefix + '.'):
+            normalized = normalized[len(prefix):].strip(' .')
+            break
+    
+    # Remove special characters
+    normalized = ''.join(c for c in normalized if c.isalnum() or c.isspace())
+    
+    # Remove spaces
+    return ''.join(normalized.split())
+
+
+def levenshtein_distance(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """
+    Levenshtein distance with two-row memory and an optional band
+    
+    With max_distance k only cells within k of the diagonal are computed and
+    the scan stops as soon as a whole row exceeds k, so mismatches cost
+    O(k * n) or less instead of O(n * m).
+    
+    Args:
+        s1: First string
+        s2: Second string
+        max_distance: Stop once the distance is known to exceed this (optional)
+    
+    Returns:
+        Edit distance, or max_distance + 1 if it exceeds max_distance
+    """
+    if s1 == s2:
+        return 0
+    
+    # Keep the shorter string on the columns to minimise row size
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    len1, len2 = len(s1), len(s2)
+    
+    k = max(len1, len2) if max_distance is None else max_distance
+    over = k + 1
+    
+    if len1 - len2 > k:
+        return over
+    if len2 == 0:
+        return len1
+    
+    previous = [j if j <= k else over for j in range(len2 + 1)]
+    
+    for i in range(1, len1 + 1):
+        lo = max(1, i - k)
+        hi = min(len2, i + k)
+        
+        current = [over] * (len2 + 1)
+        current[0] = i if i <= k else over
+        row_min = current[0]
+        c1 = s1[i - 1]
+        
+        for j in range(lo, hi + 1):
+            value = previous[j - 1] if c1 == s2[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if value > over:
+                value = over
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        
+        # Every path through this row already costs more than k
+        if row_min > k:
+            return over
+        
+        previous = current
+    
+    return min(previous[len2], over)
+
+
+def name_similarity(name1: str, name2: str, threshold: float = 0.0) -> float:
+    """
+    Levenshtein similarity between two normalized names
+    
+    Args:
+        name1: First normalized name
+        name2: Second normalized name
+        threshold: Minimum similarity of interest; results below it are
+            reported as 0.0 without finishing the computation
+    
+    Returns:
+        Similarity between 0.0 and 1.0
+    """
+    if name1 == name2:
+        return 1.0
+    
+    if not name1 or not name2:
+        return 0.0
+    
+    max_len = max(len(name1), len(name2))
+    
+    # similarity >= threshold  <=>  distance <= (1 - threshold) * max_len
+    max_distance = int((1 - threshold) * max_len + 1e-9)
+    distance = levenshtein_distance(name1, name2, max_distance)
+    if distance > max_distance:
+        return 0.0
+    
+    return 1 - (distance / max_len)
+
+
+class NameIndex:
+    """
+    Trigram inverted index over normalized names
+    
+    Finds names that may be within a similarity threshold of a query without
+    scoring every name. Uses the q-gram count filter: two strings within edit
+    distance k share at least max(len) + q - 1 - q * k padded q-grams, so
+    names sharing fewer are dropped before the exact comparison. Only the
+    rarest query grams are probed for candidates (prefix filter). Names too
+    short for the filter to prune are found through a length bucket instead.
+    
+    Safe to share between threads: lookups and updates hold the index lock,
+    so a reader never walks a posting set while a writer is changing it.
+    """
+    
+    def __init__(self, q: int = 3):
+        """
+        Initialize empty index
+        
+        Args:
+            q: Gram length
+        """
+        self.q = q
+        self._names: Dict[Hashable, str] = {}
+        self._grams: Dict[Hashable, Counter] = {}
+        self._postings: Dict[str, Set[Hashable]] = {}
+        self._by_length: Dict[int, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._names)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._names
+    
+    def grams(self, name: str) -> Counter:
+        """Padded q-gram multiset of a normalized name"""
+        padded = '\x02' * (self.q - 1) + name + '\x03' * (self.q - 1)
+        return Counter(padded[i:i + self.q] for i in range(len(padded) - self.q + 1))
+    
+    def add(self, key: Hashable, name: str):
+        """
+        Add or replace a name
+        
+        Args:
+            key: Identifier returned by candidates (e.g. account ID)
+            name: Normalized name
+        """
+        grams = self.grams(name)
+        with self._lock:
+            self._remove(key)
+            self._names[key] = name
+            self._grams[key] = grams
+            self._by_length.setdefault(len(name), set()).add(key)
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(key)
+    
+    def remove(self, key: Hashable):
+        """Remove a name if present"""
+        with self._lock:
+            self._remove(key)
+    
+    def _remove(self, key: Hashable):
+        """Remove a name if present (caller holds the lock)"""
+        name = self._names.pop(key, None)
+        if name is None:
+            return
+        
+        bucket = self._by_length[len(name)]
+        bucket.discard(key)
+        if not bucket:
+            del self._by_length[len(name)]
+        
+        for gram in self._grams.pop(key):
+            posting = self._postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self._postings[gram]
+    
+    def _required(self, query_len: int, length: int, threshold: float) -> Optional[int]:
+        """Shared grams a name of this length needs (None if its length rules it out)"""
+        max_len = max(query_len, length)
+        k = int((1 - threshold) * max_len + 1e-9)
+        if abs(query_len - length) > k:
+            return None
+        return max_len + self.q - 1 - self.q * k
+    
+    def candidates(self, name: str, threshold: float) -> List[Hashable]:
+        """
+        Keys whose names may have name_similarity >= threshold with name
+        
+        Args:
+            name: Normalized query name
+            threshold: Similarity threshold
+        
+        Returns:
+            Candidate keys (a superset of the true matches)
+        """
+        if not name:
+            return []
+        
+        query_grams = self.grams(name)
+        with self._lock:
+            return self._candidates(name, query_grams, threshold)
+    
+    def _candidates(self, name: str, query_grams: Counter, threshold: float) -> List[Hashable]:
+        """Candidate lookup (caller holds the lock)"""
+        query_len = len(name)
+        needs = {}
+        for length in self._by_length:
+            need = self._required(query_len, length, threshold)
+            if need is not None:
+                needs[length] = need
+        
+        # Lengths where the count bound cannot prune anything
+        result = []
+        for length, need in needs.items():
+            if need <= 0:
+                result.extend(self._by_length[length])
+        
+        positive = [need for need in needs.values() if need > 0]
+        if not positive:
+            return result
+        
+        # A name sharing >= need query grams shares at least one of any
+        # (total - need + 1) of them, so probing the rarest ones is enough
+        probe_budget = sum(query_grams.values()) - min(positive) + 1
+        seen = set()
+        
+        for gram in sorted(query_grams, key=lambda g: len(self._postings.get(g, ()))):
+            if probe_budget <= 0:
+                break
+            probe_budget -= query_grams[gram]
+            
+            for key in self._postings.get(gram, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                
+                need = needs.get(len(self._names[key]))
+                if need is None or need <= 0:
+                    continue
+                if sum((query_grams & self._grams[key]).values()) >= need:
+                    result.append(key)
+        
+        return result
@@ -0,0 +1,48 @@
+"""Telegram sending utilities"""
+import logging
+import os
+from typing import Optional
+
+from telegram import Bot, Message
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+
+async def send_receipt_photo(
+    bot: Bot,
+    chat_id,
+    file_id: Optional[str] = None,
+    file_path: Optional[str] = None,
+    **kwargs
+) -> Optional[Message]:
+    """
+    Send a receipt photo by Telegram file_id, uploading from disk only as a fallback
+
+    A file_id re-sends a photo already on Telegram's servers without
+    uploading any bytes. If it is missing or rejected (e.g. expired), the
+    stored file is uploaded instead.
+
+    Args:
+        bot: Bot instance
+        chat_id: Destination chat
+        file_id: Telegram file_id of the photo (optional)
+        file_path: Stored receipt path (optional)
+        **kwargs: Passed to send_photo (caption, reply_markup, ...)
+
+    Returns:
+        Sent message, or None if there is no photo to send
+    """
+    if file_id:
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+        except BadRequest as e:
+            logger.warning(f"Sending photo by file_id failed, uploading from disk: {e}")
+
+    if file_path and os.path.exists(file_path):
+        with open(file_path, 'rb') as photo:
+            return await bot.send_photo(chat_id=chat_id, photo=photo, **kwargs)
+
+    if file_path:
+        logger.warning(f"Receipt file not found at: {file_path}")
+    return None
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Benchmark and check receiver-name similarity
+
+Compares the banded two-row Levenshtein in app.utils.similarity with the
+previous full-matrix implementation on long romanized Burmese and Thai names,
+and the trigram candidate index with a linear scan over many accounts.
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.utils.similarity import normalize_name, name_similarity, levenshtein_distance, NameIndex
+
+
+def matrix_similarity(s1: str, s2: str) -> float:
+    """Previous implementation: full (len1+1) x (len2+1) matrix"""
+    if s1 == s2:
+        return 1.0
+    if not s1 or not s2:
+        return 0.0
+    
+    len1, len2 = len(s1), len(s2)
+    matrix = [[0] * (len2 + 1) for _ in range(len1 + 1)]
+    for i in range(len1 + 1):
+        matrix[i][0] = i
+    for j in range(len2 + 1):
+        matrix[0][j] = j
+    
+    for i in range(1, len1 + 1):
+        for j in range(1, len2 + 1):
+            cost = 0 if s1[i-1] == s2[j-1] else 1
+            matrix[i][j] = min(
+                matrix[i-1][j] + 1,
+                matrix[i][j-1] + 1,
+                matrix[i-1][j-1] + cost
+            )
+    
+    return 1 - (matrix[len1][len2] / max(len1, len2))
+
+
+ACCOUNT_NAMES = [
+    "DAW CHAW HSU THU ZAR",
+    "CHAW SU THU ZAR",
+    "MIN MYAT NWE",
+    "THIN ZAR HTET",
+    "U AUNG KYAW MYINT THEIN",
+    "DAW KHIN MYA MYA THWE",
+    "MAUNG THET PAING SOE HTUT",
+    "NANG KHAM HSENG HOM",
+    "MISS SIRIPORN CHAROENSUKWATTANA",
+    "MR THANAWAT PHONGPHANICHKUL",
+    "MRS KANOKWAN SRISUWANNAKHAM",
+    "MR PHATTHARAPHON JIRAPHATTHANAKUL",
+]
+
+OCR_NAMES = [
+    "DAW CHAW HSU THU ZAR",           # exact
+    "CHAW SU THUZAR",                 # spacing
+    "MIN MYAT NVVE",                  # OCR confusion
+    "MISS SIRIPORN CHAROENSUKWATANA", # dropped letter
+    "MR THANAWAT PHONGPHANICHKUN",    # substitution
+    "KYAW ZIN HTET AUNG",             # unrelated
+    "MR SOMCHAI SMITH",               # unrelated
+]
+
+
+def random_pairs(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    alphabet = "abcdefghiklmnoprstuwyz"
+    for _ in range(count):
+        a = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        b = list(a)
+        for _ in range(rng.randint(0, 12)):
+            op = rng.random()
+            pos = rng.randint(0, len(b))
+            if op < 0.33:
+                b.insert(pos, rng.choice(alphabet))
+            elif op < 0.66 and b:
+                b.pop(min(pos, len(b) - 1))
+            elif b:
+                b[min(pos, len(b) - 1)] = rng.choice(alphabet)
+        yield a, ''.join(b)
+
+
+def check_correctness(threshold: float = 0.80):
+    print("✓ Checking banded results against full matrix...")
+    checked = 0
+    for a, b in random_pairs(5000):
+        expected = matrix_similarity(a, b)
+        assert abs(name_similarity(a, b) - expected) < 1e-12, (a, b)
+        
+        banded = name_similarity(a, b, threshold)
+        if expected >= threshold:
+            assert abs(banded - expected) < 1e-12, (a, b, banded, expected)
+        else:
+            assert banded < threshold, (a, b, banded, expected)
+        
+        k = 3
+        distance = round((1 - expected) * max(len(a), len(b), 1))
+        assert levenshtein_distance(a, b, k) == min(distance, k + 1), (a, b)
+        checked += 1
+    print(f"  {checked} random pairs match")
+
+
+def benchmark(rounds: int = 300, threshold: float = 0.80):
+    accounts = [normalize_name(name) for name in ACCOUNT_NAMES]
+    
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for ocr_name in OCR_NAMES:
+            for account_name in ACCOUNT_NAMES:
+                matrix_similarity(normalize_name(ocr_name), normalize_name(account_name))
+    old = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for ocr_name in OCR_NAMES:
+            normalized = normalize_name(ocr_name)
+            for account_name in accounts:
+                name_similarity(normalized, account_name, threshold)
+    new = time.perf_counter() - started
+    
+    comparisons = rounds * len(OCR_NAMES) * len(ACCOUNT_NAMES)
+    print("✓ Benchmark (receipt name vs every account)...")
+    print(f"  Comparisons:       {comparisons:,}")
+    print(f"  Full matrix:       {old * 1e6 / comparisons:8.1f} µs/comparison")
+    print(f"  Banded two-row:    {new * 1e6 / comparisons:8.1f} µs/comparison")
+    print(f"  Speed-up:          {old / new:8.1f}x")
+
+
+SYLLABLES = [
+    # Burmese
+    "aung", "kyaw", "min", "myat", "thu", "zar", "htet", "naing", "soe", "win", "khin", "hla",
+    "myo", "zaw", "htun", "thein", "lwin", "maung", "nyein", "chan", "phyo", "wai", "yan", "moe",
+    "ei", "phyu", "thant", "sin", "khaing", "wint", "su", "mon", "hnin", "pwint", "yadanar", "thiri",
+    # Thai
+    "thi", "ri", "porn", "cha", "roen", "suk", "wat", "tha", "na", "phong", "kul", "sri",
+    "som", "chai", "pra", "sert", "wong", "sa", "kda", "nop", "pa", "rat", "ya", "kit",
+    "ti", "sak", "anan", "ta", "chot", "kan", "ok", "wan", "nat", "thong", "phon", "jira",
+]
+
+
+def synthetic_accounts(count: int, seed: int = 1):
+    """Generate long romanized names resembling collection accounts and agent wallets"""
+    rng = random.Random(seed)
+    return {
+        i: normalize_name(' '.join(
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+            for _ in range(rng.randint(2, 4))
+        ))
+        for i in range(count)
+    }
+
+
+def check_index(threshold: float = 0.80):
+    print("✓ Checking trigram index never misses a match...")
+    rng = random.Random(2)
+    names = synthetic_accounts(2000)
+    index = NameIndex()
+    for key, name in names.items():
+        index.add(key, name)
+    
+    for _ in range(200):
+        query = list(rng.choice(list(names.values())))
+        for _ in range(rng.randint(0, 4)):
+            query[rng.randrange(len(query))] = rng.choice("abcdefghiklmnoprstuwyz")
+        query = ''.join(query)
+        
+        expected = {k for k, v in names.items() if name_similarity(query, v) >= threshold}
+        assert expected <= set(index.candidates(query, threshold)), query
+    
+    for key in range(0, 2000, 2):
+        index.remove(key)
+    assert len(index) == 1000
+    assert all(key % 2 == 1 for key in index.candidates(names[1], threshold))
+    print("  200 queries matched, incremental removal consistent")
+
+
+def benchmark_index(count: int = 5000, queries: int = 200, threshold: float = 0.80):
+    rng = random.Random(3)
+    names = synthetic_accounts(count)
+    index = NameIndex()
+    
+    started = time.perf_counter()
+    for key, name in names.items():
+        index.add(key, name)
+    build = time.perf_counter() - started
+    
+    sample = [names[rng.randrange(count)] for _ in range(queries)]
+    sample = [name[:3] + 'x' + name[4:] for name in sample]
+    
+    started = time.perf_counter()
+    for query in sample:
+        [k for k, v in names.items() if name_similarity(query, v, threshold) >= threshold]
+    scan = time.perf_counter() - started
+    
+    scored = 0
+    started = time.perf_counter()
+    for query in sample:
+        candidates = index.candidates(query, threshold)
+        scored += len(candidates)
+        [k for k in candidates if name_similarity(query, names[k], threshold) >= threshold]
+    indexed = time.perf_counter() - started
+    
+    print(f"✓ Benchmark ({count:,} accounts, {queries} lookups)...")
+    print(f"  Index build:       {build * 1000:8.1f} ms")
+    print(f"  Linear scan:       {scan * 1000 / queries:8.2f} ms/lookup")
+    print(f"  Trigram index:     {indexed * 1000 / queries:8.2f} ms/lookup ({scored / queries:.1f} scored)")
+    print(f"  Speed-up:          {scan / indexed:8.1f}x")
+
+
+if __name__ == '__main__':
+    print("Testing name similarity...")
+    print("-" * 60)
+    check_correctness()
+    check_index()
+    benchmark()
+    benchmark_index()
+    print("-" * 60)
+    print("✅ Similarity checks passed")
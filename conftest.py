@@ -0,0 +1,34 @@
+"""
+Shared pytest fixtures
+
+Pytest puts this directory on sys.path, so tests import the app package
+directly.
+"""
+import pytest
+
+from app.config.settings import Config
+from app.services import DatabaseService
+from app.services.async_database_service import AsyncDatabaseService
+from app.utils.bank_registry import BankRegistry
+
+
+@pytest.fixture
+def bank_registry():
+    """Fresh alias registry, so banks registered by one test don't leak into the next"""
+    return BankRegistry.from_config(Config)
+
+
+@pytest.fixture
+def db(tmp_path, bank_registry):
+    """Empty database in a temporary directory"""
+    service = DatabaseService(str(tmp_path / 'test.db'), bank_registry=bank_registry)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def async_db(db):
+    """Async facade over the test database"""
+    service = AsyncDatabaseService(db)
+    yield service
+    service.close()
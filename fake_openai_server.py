@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible fake server for offline OCR load tests
+
+Serves POST /v1/chat/completions with canned receipt JSON, a configurable
+latency distribution and error rate. Seeded, so runs are reproducible.
+
+Usage:
+    python fake_openai_server.py --port 8089 --latency lognormal --latency-ms 800
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python main.py
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# THB receipts addressed to the seeded accounts in app/utils/init_database.py
+DEFAULT_RECEIPTS = [
+    {
+        "amount": 1000,
+        "sender_bank": "KBank",
+        "receiver_bank": "SCB",
+        "sender_name": "MR SOMCHAI SMITH",
+        "receiver_name": "MIN MYAT NWE",
+        "status": "Successful",
+        "reference": "FAKE0001"
+    },
+    {
+        "amount": 2500.50,
+        "sender_bank": "SCB",
+        "receiver_bank": "KTB",
+        "sender_name": "MISS SUDA JAIDEE",
+        "receiver_name": "THIN ZAR HTET",
+        "status": "Success",
+        "reference": "FAKE0002"
+    },
+    {
+        "amount": 780,
+        "sender_bank": "BBL",
+        "receiver_bank": "Siam Commercial",
+        "sender_name": "MR AUNG AUNG",
+        "receiver_name": "MIN MYAT NWE",
+        "status": "Transfer successful",
+        "reference": "FAKE0003"
+    },
+]
+
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'normal', 'lognormal')
+
+
+class FakeOpenAI:
+    """Response generator shared by all request threads"""
+    
+    def __init__(
+        self,
+        receipts: Optional[List[Dict]] = None,
+        latency: str = 'constant',
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        low_detail_miss_rate: float = 0.0,
+        seed: int = 0
+    ):
+        """
+        Initialize fake API
+        
+        Args:
+            receipts: Canned receipt dicts returned round-robin
+            latency: Latency distribution (constant, uniform, normal, lognormal)
+            latency_ms: Mean latency in milliseconds
+            latency_jitter_ms: Spread (uniform half-width / normal stddev / lognormal sigma * mean)
+            error_rate: Fraction of requests answered with error_status
+            error_status: HTTP status used for injected errors (429, 500, 503...)
+            low_detail_miss_rate: Fraction of detail=low requests answered with
+                amount null, to exercise two-pass escalation
+            seed: Random seed
+        """
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency}")
+        
+        self.receipts = receipts or DEFAULT_RECEIPTS
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.low_detail_miss_rate = low_detail_miss_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next = 0
+        self.stats = {'requests': 0, 'errors': 0, 'low_detail': 0, 'high_detail': 0}
+    
+    def _sample_latency(self) -> float:
+        """Draw one latency in seconds from the configured distribution"""
+        mean, jitter = self.latency_ms, self.latency_jitter_ms
+        if self.latency == 'uniform':
+            value = self._rng.uniform(mean - jitter, mean + jitter)
+        elif self.latency == 'normal':
+            value = self._rng.gauss(mean, jitter)
+        elif self.latency == 'lognormal':
+            # Median is latency_ms, sigma from jitter relative to the mean
+            sigma = jitter / mean if mean else 0.0
+            value = self._rng.lognormvariate(math.log(mean), sigma) if mean else 0.0
+        else:
+            value = mean
+        return max(0.0, value) / 1000
+    
+    def handle(self, request: Dict):
+        """
+        Produce the response for one chat completion request
+        
+        Args:
+            request: Parsed request body
+        
+        Returns:
+            Tuple of (delay_seconds, status_code, response_body)
+        """
+        detail = 'high'
+        for message in request.get('messages', []):
+            content = message.get('content')
+            if isinstance(content, list):
+                for part in content:
+                    if part.get('type') == 'image_url':
+                        detail = part.get('image_url', {}).get('detail', 'high')
+        
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats[f"{'low' if detail == 'low' else 'high'}_detail"] += 1
+            delay = self._sample_latency()
+            
+            if self._rng.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return delay, self.error_status, {
+                    'error': {'message': 'Injected error', 'type': 'server_error', 'code': self.error_status}
+                }
+            
+            receipt = dict(self.receipts[self._next % len(self.receipts)])
+            self._next += 1
+            if detail == 'low' and self._rng.random() < self.low_detail_miss_rate:
+                receipt['amount'] = None
+            request_id = self.stats['requests']
+        
+        content = json.dumps(receipt, ensure_ascii=False)
+        return delay, 200, {
+            'id': f"chatcmpl-fake-{request_id}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o-mini'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': len(content) // 4, 'total_tokens': len(content) // 4}
+        }
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """HTTP handler for /v1/chat/completions"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+    
+    def _send_json(self, status: int, body: Dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw = self.rfile.read(length)
+        
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+        
+        try:
+            request = json.loads(raw or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON'}})
+            return
+        
+        delay, status, body = self.server.fake.handle(request)
+        if delay:
+            time.sleep(delay)
+        self._send_json(status, body)
+    
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send_json(200, self.server.fake.stats)
+        else:
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+
+
+def start_server(fake: FakeOpenAI, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """
+    Start fake server in a daemon thread
+    
+    Args:
+        fake: Response generator
+        host: Bind address
+        port: Port (0 picks a free port)
+    
+    Returns:
+        Running server; base URL is http://host:server.server_port/v1
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI-compatible fake server for OCR load tests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--latency-ms', type=float, default=800.0)
+    parser.add_argument('--latency-jitter-ms', type=float, default=300.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--low-detail-miss-rate', type=float, default=0.0)
+    parser.add_argument('--receipts', help="JSON file with a list of canned receipt objects")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    receipts = None
+    if args.receipts:
+        with open(args.receipts, encoding='utf-8') as f:
+            receipts = json.load(f)
+    
+    fake = FakeOpenAI(
+        receipts=receipts,
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        low_detail_miss_rate=args.low_detail_miss_rate,
+        seed=args.seed
+    )
+    server = ThreadingHTTPServer((args.host, args.port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.fake = fake
+    logger.info(f"Fake OpenAI server on http://{args.host}:{args.port}/v1 ({args.latency} {args.latency_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Stats: {fake.stats}")
+
+
+if __name__ == '__main__':
+    main()
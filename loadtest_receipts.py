@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Offline throughput test for UserHandlers.handle_receipt
+
+Starts fake_openai_server in-process, points the OCR backend at it and feeds
+generated receipt photos through handle_receipt with stub Telegram objects
+against a temporary database. Reports throughput and latency percentiles.
+
+Usage:
+    python loadtest_receipts.py --requests 200 --concurrency 32 --latency-ms 800
+"""
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+from fake_openai_server import FakeOpenAI, LATENCY_DISTRIBUTIONS, start_server
+
+
+def make_receipt_image(index: int, size=(1080, 1920)) -> bytes:
+    """Generate a distinct receipt-like JPEG so every request misses the OCR cache"""
+    image = Image.new('RGB', size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for row in range(40):
+        y = 60 + row * 44
+        draw.rectangle([60, y, 60 + (index * 37 + row * 53) % 900, y + 20], fill=(30, 30, 30))
+    draw.text((60, 20), f"Receipt #{index}", fill=(0, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class StubMessage:
+    """Minimal telegram Message stand-in"""
+    
+    def __init__(self, chat_id: int = 0):
+        self.chat_id = chat_id
+    
+    async def edit_text(self, text, **kwargs):
+        return self
+    
+    async def reply_text(self, text, **kwargs):
+        return StubMessage(self.chat_id)
+
+
+class StubFile:
+    def __init__(self, data: bytes):
+        self.data = data
+    
+    async def download_as_bytearray(self):
+        return bytearray(self.data)
+
+
+class StubBot:
+    def __init__(self, files):
+        self.files = files
+    
+    async def get_file(self, file_id):
+        return StubFile(self.files[file_id])
+
+
+class StubApplication:
+    def __init__(self):
+        self.tasks = set()
+    
+    def create_task(self, coroutine, update=None):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+
+def make_update(index: int, user_id: int):
+    photo = SimpleNamespace(file_id=f"file-{index}", file_unique_id=f"unique-{index}")
+    message = StubMessage(user_id)
+    message.photo = [photo]
+    message.from_user = SimpleNamespace(id=user_id)
+    return SimpleNamespace(
+        message=message,
+        effective_chat=SimpleNamespace(type='private', id=user_id),
+        effective_user=message.from_user
+    )
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(args, base_url: str, workdir: Path):
+    from app.config.settings import Config
+    from app.services.database_service import DatabaseService
+    from app.services.async_database_service import AsyncDatabaseService
+    from app.services.image_processor import ImageProcessor
+    from app.services.ocr_backends import create_ocr_backend
+    from app.services.ocr_service import OCRService
+    from app.services.receipt_store import ReceiptStore
+    from app.handlers.user_handlers import UserHandlers
+    from app.utils.init_database import initialize_database
+    
+    db = DatabaseService(str(workdir / 'loadtest.db'))
+    initialize_database(db)
+    db.initialize_exchange_rate(Config.DEFAULT_EXCHANGE_RATE)
+    
+    async_db = AsyncDatabaseService(db)
+    ocr = OCRService(
+        'sk-fake',
+        max_concurrency=args.ocr_concurrency,
+        db_service=async_db,
+        image_processor=ImageProcessor(max_workers=args.image_workers),
+        two_pass=args.two_pass,
+        backend=create_ocr_backend(args.backend, 'sk-fake', base_url=base_url)
+    )
+    handlers = UserHandlers(async_db, ocr, ReceiptStore(workdir / 'receipts'))
+    
+    images = [make_receipt_image(i % args.unique_images) for i in range(args.unique_images)]
+    files = {f"file-{i}": images[i % args.unique_images] for i in range(args.requests)}
+    bot = StubBot(files)
+    application = StubApplication()
+    
+    latencies = []
+    outcomes = {}
+    gate = asyncio.Semaphore(args.concurrency)
+    
+    async def one(index: int):
+        async with gate:
+            context = SimpleNamespace(
+                bot=bot,
+                application=application,
+                user_data={'exchange_direction': 'THB_TO_MMK', 'from_currency': 'THB', 'to_currency': 'MMK'}
+            )
+            started = time.perf_counter()
+            state = await handlers.handle_receipt(make_update(index, 100000 + index), context)
+            latencies.append(time.perf_counter() - started)
+            outcomes[state] = outcomes.get(state, 0) + 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    if application.tasks:
+        await asyncio.gather(*application.tasks)
+    send_metrics = handlers.dispatcher.get_metrics()
+    await handlers.dispatcher.close()
+    await ocr.aclose()
+    async_db.close()
+    
+    state_names = {Config.ENTER_BANK_INFO: 'ENTER_BANK_INFO', Config.UPLOAD_RECEIPT: 'UPLOAD_RECEIPT'}
+    print("=" * 60)
+    print("handle_receipt load test")
+    print("=" * 60)
+    print(f"Requests:     {args.requests} (concurrency {args.concurrency}, OCR slots {args.ocr_concurrency})")
+    print(f"Elapsed:      {elapsed:.2f}s")
+    print(f"Throughput:   {args.requests / elapsed:.1f} receipts/s")
+    print(f"Latency p50:  {percentile(latencies, 50) * 1000:.0f} ms")
+    print(f"Latency p95:  {percentile(latencies, 95) * 1000:.0f} ms")
+    print(f"Latency p99:  {percentile(latencies, 99) * 1000:.0f} ms")
+    print(f"Latency mean: {statistics.mean(latencies) * 1000:.0f} ms")
+    print(f"Outcomes:     {', '.join(f'{state_names.get(k, k)}={v}' for k, v in outcomes.items())}")
+    print(f"OCR cache:    {ocr.get_cache_stats()}")
+    print(f"Sends:        {send_metrics['sent']} sent, {send_metrics['failed']} failed, "
+          f"latency {send_metrics['latency']}")
+    if args.two_pass:
+        print(f"Two-pass:     {ocr.get_pass_stats()}")
+    return outcomes
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline handle_receipt throughput test")
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--unique-images', type=int, default=None,
+                        help="Distinct images (defaults to one per request, i.e. no cache hits)")
+    parser.add_argument('--ocr-concurrency', type=int, default=4)
+    parser.add_argument('--image-workers', type=int, default=2)
+    parser.add_argument('--backend', choices=('langchain', 'openai'), default='openai')
+    parser.add_argument('--two-pass', action='store_true')
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--latency-ms', type=float, default=300.0)
+    parser.add_argument('--latency-jitter-ms', type=float, default=100.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--low-detail-miss-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    args.unique_images = args.unique_images or args.requests
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    
+    fake = FakeOpenAI(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        low_detail_miss_rate=args.low_detail_miss_rate,
+        seed=args.seed
+    )
+    server = start_server(fake)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            asyncio.run(run(args, base_url, Path(workdir)))
+    finally:
+        server.shutdown()
+        print(f"Fake server:  {fake.stats}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
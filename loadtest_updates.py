@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Offline update-delivery latency test: long polling vs webhook
+
+Runs a fake Bot API server in-process and a python-telegram-bot Application
+pointed at it. In polling mode synthetic updates are queued on the fake
+server and picked up by the Updater's getUpdates loop; in webhook mode they
+are POSTed to the embedded WebhookServer on localhost. Latency is measured
+from injection to the handler seeing the update.
+
+With --workers > 1 updates go through KeyedUpdateProcessor; --handler-ms
+makes the handler slow so per-chat ordering and worker usage show up.
+
+Usage:
+    python loadtest_updates.py --updates 500 --rate 200 --mode both
+    python loadtest_updates.py --mode webhook --workers 8 --handler-ms 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from app.services.update_processor import KeyedUpdateProcessor
+from app.services.webhook_server import WebhookServer
+
+TOKEN = '123456:LOADTEST'
+SECRET = 'loadtest-secret'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Load Test Bot', 'username': 'loadtest_bot'}
+
+
+class FakeBotAPI:
+    """Just enough of the Bot API for Application start-up and getUpdates"""
+
+    def __init__(self):
+        self.pending: List[dict] = []
+        self.condition = threading.Condition()
+        self.stats = {'get_updates': 0, 'delivered': 0}
+
+    def push(self, update: dict):
+        with self.condition:
+            self.pending.append(update)
+            self.condition.notify_all()
+
+    def get_updates(self, offset: int, timeout: float) -> List[dict]:
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.pending = [u for u in self.pending if u['update_id'] >= offset]
+            while not self.pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            updates = list(self.pending)
+        self.stats['get_updates'] += 1
+        self.stats['delivered'] += len(updates)
+        return updates
+
+    def call(self, method: str, params: dict):
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return self.get_updates(int(params.get('offset') or 0), float(params.get('timeout') or 0))
+        if method in ('deleteWebhook', 'setWebhook', 'close', 'logOut'):
+            return True
+        return True
+
+
+def start_fake_api(api: FakeBotAPI, port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake Bot API server in a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length).decode() if length else ''
+            try:
+                params = json.loads(raw) if raw.startswith('{') else {
+                    key: values[0] for key, values in parse_qs(raw).items()
+                }
+            except ValueError:
+                params = {}
+            method = self.path.rsplit('/', 1)[-1]
+            body = json.dumps({'ok': True, 'result': api.call(method, params)}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_update(update_id: int, users: int) -> dict:
+    """Synthetic private text message update"""
+    user_id = 1000 + update_id % users
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': f'User{user_id}'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+            'text': '/start',
+        },
+    }
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def build_application(args, api_port: int, received: Dict[int, float], done: asyncio.Event,
+                      out_of_order: List[int]) -> Application:
+    """Application against the fake Bot API whose only handler timestamps updates"""
+    last_seen: Dict[int, int] = {}
+
+    async def record(update: Update, context):
+        received[update.update_id] = time.perf_counter()
+        chat_id = update.effective_chat.id
+        if last_seen.get(chat_id, 0) > update.update_id:
+            out_of_order.append(update.update_id)
+        last_seen[chat_id] = update.update_id
+        if args.handler_ms:
+            await asyncio.sleep(args.handler_ms / 1000)
+        if len(received) >= args.updates:
+            done.set()
+
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(f"http://127.0.0.1:{api_port}/bot")
+        .get_updates_read_timeout(30.0)
+    )
+    if args.workers > 1:
+        builder = builder.concurrent_updates(KeyedUpdateProcessor(workers=args.workers))
+    application = builder.build()
+    application.add_handler(TypeHandler(Update, record))
+    return application
+
+
+class WebhookClient:
+    """Keep-alive HTTP/1.1 client posting updates to the webhook server"""
+
+    def __init__(self, port: int, path: str, secret: str):
+        self.port = port
+        self.path = path
+        self.secret = secret
+        self.reader = None
+        self.writer = None
+
+    async def post(self, payload: dict, secret: str = None) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        body = json.dumps(payload).encode()
+        head = (
+            f"POST {self.path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"X-Telegram-Bot-Api-Secret-Token: {secret if secret is not None else self.secret}\r\n\r\n"
+        )
+        self.writer.write(head.encode() + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        if length:
+            await self.reader.readexactly(length)
+        return status
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+async def inject(args, send) -> Dict[int, float]:
+    """Inject updates at the target rate from args.connections senders"""
+    sent: Dict[int, float] = {}
+    interval = 1 / args.rate if args.rate > 0 else 0
+    start = time.perf_counter()
+    next_id = iter(range(1, args.updates + 1))
+
+    async def sender(worker: int):
+        for update_id in next_id:
+            if interval:
+                delay = start + (update_id - 1) * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            sent[update_id] = time.perf_counter()
+            await send(worker, make_update(update_id, args.users))
+
+    await asyncio.gather(*(sender(worker) for worker in range(args.connections)))
+    return sent
+
+
+async def run_mode(mode: str, args, api: FakeBotAPI, api_port: int) -> dict:
+    received: Dict[int, float] = {}
+    done = asyncio.Event()
+    out_of_order: List[int] = []
+    application = build_application(args, api_port, received, done, out_of_order)
+    await application.initialize()
+
+    server = None
+    clients: List[WebhookClient] = []
+    if mode == 'polling':
+        await application.updater.start_polling(poll_interval=0.0, timeout=10)
+
+        async def send(worker, payload):
+            api.push(payload)
+    else:
+        server = WebhookServer(application, listen='127.0.0.1', port=0, url_path='/telegram', secret_token=SECRET)
+        await server.start()
+        clients = [WebhookClient(server.port, server.url_path, SECRET) for _ in range(args.connections)]
+
+        async def send(worker, payload):
+            status = await clients[worker].post(payload)
+            if status != 200:
+                raise RuntimeError(f"Webhook returned {status}")
+
+    await application.start()
+    started = time.perf_counter()
+    sent = await inject(args, send)
+    try:
+        await asyncio.wait_for(done.wait(), timeout=60)
+    except asyncio.TimeoutError:
+        print(f"{mode}: timed out with {len(received)}/{args.updates} updates handled")
+    elapsed = time.perf_counter() - started
+
+    rejected = None
+    if server:
+        probe = WebhookClient(server.port, server.url_path, SECRET)
+        rejected = await probe.post(make_update(0, 1), secret='wrong')
+        probe.close()
+
+    if application.updater.running:
+        await application.updater.stop()
+    await application.stop()
+    for client in clients:
+        client.close()
+    if server:
+        await server.stop()
+    processor = application.update_processor
+    processor_metrics = processor.get_metrics() if hasattr(processor, 'get_metrics') else None
+    await application.shutdown()
+
+    latencies = [(received[i] - sent[i]) * 1000 for i in received if i in sent]
+    return {
+        'handled': len(received),
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'rejected_status': rejected,
+        'out_of_order': len(out_of_order),
+        'processor': processor_metrics,
+    }
+
+
+async def run(args):
+    api = FakeBotAPI()
+    api_server = start_fake_api(api)
+    modes = ('polling', 'webhook') if args.mode == 'both' else (args.mode,)
+    try:
+        for mode in modes:
+            result = await run_mode(mode, args, api, api_server.server_port)
+            lat = result['latencies']
+            print(f"{mode:8s} handled {result['handled']}/{args.updates} in {result['elapsed']:.2f}s "
+                  f"({result['handled'] / result['elapsed']:.0f} updates/s)")
+            print(f"{'':8s} latency p50 {percentile(lat, 0.5):.1f} ms  p95 {percentile(lat, 0.95):.1f} ms  "
+                  f"max {max(lat, default=0):.1f} ms")
+            print(f"{'':8s} per-chat order violations: {result['out_of_order']}")
+            if result['processor']:
+                print(f"{'':8s} processor: {result['processor']}")
+            if result['rejected_status'] is not None:
+                print(f"{'':8s} wrong secret token -> HTTP {result['rejected_status']}")
+    finally:
+        api_server.shutdown()
+    print(f"Fake Bot API: {api.stats}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline polling vs webhook update latency test")
+    parser.add_argument('--mode', choices=('polling', 'webhook', 'both'), default='both')
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=200.0, help='Updates per second (0 = as fast as possible)')
+    parser.add_argument('--connections', type=int, default=4, help='Concurrent senders (webhook connections)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=1, help='Update workers (1 = sequential processing)')
+    parser.add_argument('--handler-ms', type=float, default=0.0, help='Simulated handler time')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
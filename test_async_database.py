@@ -0,0 +1,72 @@
+"""
+Tests for the async database facade
+"""
+import asyncio
+
+import pytest
+
+from app.services import DatabaseService
+from app.services.async_database_service import READ_METHODS, WRITE_METHODS
+
+
+def ocr_cache_last_used(db, image_hash):
+    row = db.get_connection().execute(
+        "SELECT last_used_at FROM ocr_cache WHERE image_hash = ?", (image_hash,)
+    ).fetchone()
+    return row['last_used_at']
+
+
+def test_every_public_method_is_declared(db):
+    public = {name for name in dir(DatabaseService) if not name.startswith('_') and callable(getattr(db, name))}
+    assert READ_METHODS <= public
+    assert WRITE_METHODS <= public
+    assert not READ_METHODS & WRITE_METHODS
+    # Connection management and schema set-up stay with the synchronous service
+    assert public - READ_METHODS - WRITE_METHODS == {'close', 'get_connection', 'init_database', 'invalidate_cache'}
+
+
+def test_only_declared_methods_pass_through(db, async_db):
+    for name in ('_calculate_similarity', 'get_connection', '_cache', '_name_indexes'):
+        with pytest.raises(AttributeError):
+            getattr(async_db, name)
+
+    assert async_db.bank_registry is db.bank_registry
+    db.update_rate(120.0)
+    assert async_db.display_version == db.display_version > 0
+
+
+def test_ocr_cache_lookup_does_not_write(db):
+    db.set_ocr_cache('abc', {'amount': 100}, ttl_seconds=3600, max_entries=10)
+    stored = ocr_cache_last_used(db, 'abc')
+
+    assert db.get_ocr_cache('abc', ttl_seconds=3600) == {'amount': 100}
+    assert ocr_cache_last_used(db, 'abc') == stored
+
+    db.touch_ocr_cache('abc')
+    assert ocr_cache_last_used(db, 'abc') > stored
+
+
+def test_recent_pending_transaction(db, async_db):
+    def create(user_id):
+        return db.create_transaction(
+            user_id=user_id, username='user', exchange_direction='THB_TO_MMK',
+            from_currency='THB', to_currency='MMK',
+            sent_amount=1000.0, received_amount=121500.0, exchange_rate=121.5,
+            user_bank_name='KBZ', user_account_number='999', user_account_name='AUNG AUNG',
+            from_bank='SCB', admin_receiving_bank='KBank'
+        )
+
+    first, second = create(1), create(1)
+    create(2)
+
+    async def run():
+        latest = await async_db.get_user_recent_pending_transaction(1)
+        await async_db.update_transaction_status(second, 'confirmed')
+        after_confirm = await async_db.get_user_recent_pending_transaction(1)
+        missing = await async_db.get_user_recent_pending_transaction(3)
+        return latest, after_confirm, missing
+
+    latest, after_confirm, missing = asyncio.run(run())
+    assert latest.id == second
+    assert after_confirm.id == first
+    assert missing is None
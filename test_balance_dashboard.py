@@ -0,0 +1,110 @@
+"""
+Tests for the balance dashboard: unknown balances and debounce re-arming
+"""
+import asyncio
+from types import SimpleNamespace
+
+from app.handlers.admin_handlers import AdminHandlers
+from app.services.balance_dashboard import BalanceDashboard
+from app.services.receipt_store import ReceiptStore
+
+
+class StubDB:
+    def __init__(self):
+        self.settings = {}
+        self.balances = [('THB', 'KBank', 1000.0, None)]
+        self.balance_reads = 0
+
+    async def get_setting(self, key):
+        return self.settings.get(key)
+
+    async def set_setting(self, key, value):
+        self.settings[key] = value
+
+    async def get_balances(self):
+        self.balance_reads += 1
+        return list(self.balances)
+
+
+class StubDispatcher:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, bot, chat_id, priority=None, **kwargs):
+        self.sent.append(kwargs['text'])
+        return SimpleNamespace(message_id=len(self.sent))
+
+    async def send(self, chat_id, func, /, *args, priority=None, **kwargs):
+        return await func(*args, **kwargs)
+
+
+class StubBot:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_message_text(self, **kwargs):
+        self.edits.append(kwargs['text'])
+
+    async def pin_chat_message(self, **kwargs):
+        return True
+
+
+def test_record_change_ignores_unknown_balances():
+    async def run():
+        dashboard = BalanceDashboard(StubDB(), StubDispatcher(), debounce_seconds=0)
+        await dashboard.record_change('THB', 'Unknown', None, None, 1)
+        await dashboard.record_change('THB', 'Unknown', 100.0, None, 1)
+        await dashboard.record_change('THB', 'KBank', 100.0, 150.0, 2)
+        return dashboard
+
+    dashboard = asyncio.run(run())
+    assert dashboard.stats['changes'] == 1
+    assert len(dashboard._logs['THB']) == 1
+
+
+def test_balance_update_survives_unknown_receiving_bank(tmp_path):
+    """confirm_transaction returns None balances when the receiving bank has no account"""
+    async def run():
+        db = StubDB()
+        dashboard = BalanceDashboard(db, StubDispatcher(), debounce_seconds=0)
+        handlers = AdminHandlers(db, None, ReceiptStore(tmp_path), StubDispatcher(), dashboard)
+        context = SimpleNamespace(bot=StubBot())
+        await handlers._send_balance_update(
+            context, 7, 1000.0, 121500.0, 'Unknown', 'KBZ',
+            None, None, 500000.0, 378500.0, 'THB', 'MMK'
+        )
+        await dashboard.close()
+        return dashboard
+
+    dashboard = asyncio.run(run())
+    assert dashboard.stats['changes'] == 1
+
+
+def test_schedule_during_flush_publishes_again():
+    async def run():
+        db = StubDB()
+        dispatcher = StubDispatcher()
+        dashboard = BalanceDashboard(db, dispatcher, debounce_seconds=0.01)
+        bot = StubBot()
+
+        await dashboard.record_change('THB', 'KBank', 900.0, 1000.0, 1)
+        dashboard.schedule(bot, -100)
+
+        # Record another change while the first flush is publishing
+        original_flush = dashboard.flush
+
+        async def slow_flush(*args):
+            await original_flush(*args)
+            if db.balance_reads == 1:
+                db.balances = [('THB', 'KBank', 1200.0, None)]
+                await dashboard.record_change('THB', 'KBank', 1000.0, 1200.0, 2)
+                dashboard.schedule(bot, -100)
+
+        dashboard.flush = slow_flush
+        await asyncio.sleep(0.1)
+        return db, dispatcher, bot
+
+    db, dispatcher, bot = asyncio.run(run())
+    assert db.balance_reads == 2
+    assert len(dispatcher.sent) == 1 and len(bot.edits) == 1
+    assert '1,200.00' in bot.edits[0]
@@ -0,0 +1,72 @@
+"""
+Tests for bank alias resolution and bank matching in receiver validation
+"""
+
+import pytest
+
+from app.utils.bank_registry import normalize_bank
+
+
+@pytest.fixture
+def db(db):
+    db.add_bank_account('MMK', 'KBZ', '222', 'AUNG AUNG')
+    db.add_bank_account('THB', 'Siam Commercial Bank', '111', 'MIN MYAT NWE')
+    return db
+
+
+def test_normalize_bank():
+    assert normalize_bank('Bangkok-Bank ') == normalize_bank('bangkokbank') == 'bangkokbank'
+    assert normalize_bank('') == ''
+
+
+@pytest.mark.parametrize('text, currency, expected', [
+    ('KBank', 'THB', 'KBANK'),
+    ('Kasikorn Bank', None, 'KBANK'),
+    ('SCB Easy', 'THB', 'SCB'),
+    ('Siam Commercial Bank PCL', 'THB', 'SCB'),
+    ('Bangkok Bank', 'THB', 'BBL'),
+    ('KBZ', 'MMK', 'KBZ'),
+    ('KBZ Pay', 'MMK', 'KBZ'),
+    ('KBZPay', 'MMK', 'KBZ'),
+    ('KPay', 'MMK', 'KBZ'),
+    ('AYA Pay', 'MMK', 'AYA'),
+    ('CBPay', 'MMK', 'CB'),
+    ('Wave Money', 'MMK', 'WAVE'),
+    ('KBZ', 'THB', None),
+    ('Nonexistent Bank', None, None),
+    ('', None, None),
+])
+def test_resolve(bank_registry, text, currency, expected):
+    assert bank_registry.resolve(text, currency=currency) == expected
+
+
+def test_wallets_match_their_bank(bank_registry):
+    assert bank_registry.same_bank('KBZ Pay', 'KBZ')
+    assert bank_registry.same_bank('KPay', 'KBZ Bank')
+    assert bank_registry.same_bank('AYA Pay', 'AYA')
+    assert not bank_registry.same_bank('KBZ Pay', 'AYA')
+    # Unknown banks fall back to containment
+    assert bank_registry.same_bank('Foo Bank', 'foobank ltd')
+
+
+def test_display_names(bank_registry):
+    assert bank_registry.display_names('MMK') == ['KBZ', 'AYA', 'CB Bank', 'Wave Money', 'UAB']
+    assert 'Bangkok Bank' in bank_registry.display_names('THB')
+
+
+def test_validate_receiver_accepts_wallet_of_account_bank(db):
+    match = db.validate_receiver_account('AUNG AUNG', 'KBZ Pay', 'MMK')
+    assert match is not None and match.bank_name == 'KBZ'
+    assert db.validate_receiver_account('AUNG AUNG', 'AYA', 'MMK') is None
+    assert db.validate_receiver_account('MIN MYAT NWE', 'SCB', 'THB') is not None
+
+
+def test_banks_added_at_runtime_resolve(db, bank_registry):
+    assert bank_registry.resolve('Yoma Bank', currency='MMK') is None
+    db.add_bank_account('MMK', 'Yoma Bank', '333', 'THIN ZAR HTET')
+
+    assert bank_registry.resolve('Yoma Bank', currency='MMK') == 'MMK:Yoma Bank'
+    assert bank_registry.resolve('Yoma Bank', currency='THB') is None
+    assert 'Yoma Bank' in bank_registry.display_names('MMK')
+    # Known banks are not registered a second time
+    assert bank_registry.display_names('MMK').count('KBZ') == 1
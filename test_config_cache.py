@@ -0,0 +1,77 @@
+"""
+Tests for the configuration cache in DatabaseService
+"""
+import pytest
+
+
+@pytest.fixture
+def db(db):
+    db.initialize_exchange_rate(130.0)
+    db.add_bank_account('THB', 'KBank', '111', 'MIN MYAT NWE')
+    return db
+
+
+def counters(db):
+    stats = db.get_cache_stats()
+    return stats['hits'], stats['misses']
+
+
+def test_repeat_reads_are_served_from_the_cache(db):
+    db.get_current_rate()
+    db.get_setting('admin_group_id')
+    db.get_bank_accounts('THB')
+    before = counters(db)
+
+    # A write behind the service's back is not seen while the cache holds the value
+    conn = db.get_connection()
+    conn.execute("UPDATE exchange_rate SET rate = 1.0")
+    conn.execute("UPDATE bank_accounts SET is_active = 0")
+    conn.commit()
+    assert db.get_current_rate() == 130.0
+    assert db.get_setting('admin_group_id') is None
+    assert len(db.get_bank_accounts('THB')) == 1
+
+    hits, misses = counters(db)
+    assert (hits - before[0], misses - before[1]) == (3, 0)
+
+
+def test_update_rate_invalidates_the_rate(db):
+    assert db.get_current_rate() == 130.0
+    db.update_rate(122.0)
+    _, misses = counters(db)
+    assert db.get_current_rate() == 122.0
+    assert counters(db)[1] == misses + 1
+
+
+def test_set_setting_invalidates_settings(db):
+    assert db.get_setting('admin_group_id') is None
+    db.set_setting('admin_group_id', '-100')
+    _, misses = counters(db)
+    assert db.get_setting('admin_group_id') == '-100'
+    assert counters(db)[1] == misses + 1
+
+
+def test_add_bank_account_invalidates_accounts(db):
+    assert [account.bank_name for account in db.get_bank_accounts('THB')] == ['KBank']
+    db.add_bank_account('THB', 'SCB', '222', 'SOMCHAI JAIDEE')
+    _, misses = counters(db)
+    assert [account.bank_name for account in db.get_bank_accounts('THB')] == ['KBank', 'SCB']
+    assert counters(db)[1] == misses + 1
+
+
+def test_deactivate_admin_bank_account_invalidates_accounts(db):
+    account_id = db.get_bank_accounts('THB')[0].id
+    db.deactivate_admin_bank_account(account_id)
+    _, misses = counters(db)
+    assert db.get_bank_accounts('THB') == []
+    assert counters(db)[1] == misses + 1
+
+
+def test_writes_only_drop_their_own_group(db):
+    db.get_current_rate()
+    db.get_bank_accounts('THB')
+    db.set_setting('admin_topic_id', '5')
+    hits, misses = counters(db)
+    db.get_current_rate()
+    db.get_bank_accounts('THB')
+    assert counters(db) == (hits + 2, misses)
@@ -0,0 +1,131 @@
+"""
+Tests for ledger-backed balances: confirm, cancel and balance history
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.database_service import utc_now
+
+
+@pytest.fixture
+def db(db):
+    db.add_bank_account('THB', 'KBank', '111', 'MIN MYAT NWE', initial_balance=0.0)
+    db.add_bank_account('MMK', 'KBZ', '222', 'THIN ZAR HTET', initial_balance=500000.0)
+    return db
+
+
+def create_pending(db, sent=1000.0, received=121500.0) -> int:
+    """Create a THB -> MMK transaction and credit the receiving account like handle_bank_info does"""
+    transaction_id = db.create_transaction(
+        user_id=1, username='user', exchange_direction='THB_TO_MMK',
+        from_currency='THB', to_currency='MMK',
+        sent_amount=sent, received_amount=received, exchange_rate=121.5,
+        user_bank_name='KBZ', user_account_number='999', user_account_name='AUNG AUNG',
+        from_bank='SCB', admin_receiving_bank='KBank'
+    )
+    db.update_balance('THB', 'KBank', sent, entry_type='credit', transaction_id=transaction_id)
+    return transaction_id
+
+
+def test_update_balance_returns_before_and_after(db):
+    assert db.update_balance('THB', 'KBank', 250.0) == (0.0, 250.0)
+    assert db.update_balance('THB', 'KBank', -50.0) == (250.0, 200.0)
+    assert db.update_balance('THB', 'NoSuchBank', 10.0) is None
+
+
+def test_confirm_debits_payout_and_reports_balances(db):
+    transaction_id = create_pending(db)
+    result = db.confirm_transaction(transaction_id, 'KBZ')
+
+    assert result['status'] == 'confirmed'
+    assert (result['to_before'], result['to_after']) == (500000.0, 378500.0)
+    assert (result['from_before'], result['from_after']) == (0.0, 1000.0)
+    assert db.get_balance('MMK', 'KBZ') == 378500.0
+    assert db.confirm_transaction(transaction_id, 'KBZ')['status'] == 'not_pending'
+
+
+def test_confirm_refuses_overdraft(db):
+    transaction_id = create_pending(db, received=600000.0)
+    assert db.confirm_transaction(transaction_id, 'KBZ')['status'] == 'insufficient_funds'
+    assert db.get_balance('MMK', 'KBZ') == 500000.0
+    assert db.get_transaction(transaction_id).status == 'pending'
+
+
+def test_confirm_with_unknown_receiving_bank_has_no_from_balances(db):
+    transaction_id = db.create_transaction(
+        user_id=1, username='user', exchange_direction='THB_TO_MMK',
+        from_currency='THB', to_currency='MMK',
+        sent_amount=1000.0, received_amount=121500.0, exchange_rate=121.5,
+        user_bank_name='KBZ', user_account_number='999', user_account_name='AUNG AUNG',
+        from_bank='SCB', admin_receiving_bank='Unknown'
+    )
+    result = db.confirm_transaction(transaction_id, 'KBZ')
+    assert result['status'] == 'confirmed'
+    assert result['from_before'] is None and result['from_after'] is None
+
+
+def test_cancel_pending_reverses_credit(db):
+    transaction_id = create_pending(db)
+    result = db.cancel_transaction(transaction_id)
+
+    assert result['status'] == 'cancelled'
+    assert [r['amount'] for r in result['reversals']] == [-1000.0]
+    assert db.get_balance('THB', 'KBank') == 0.0
+    assert db.cancel_transaction(transaction_id)['status'] == 'not_pending'
+
+
+def test_cancel_refuses_confirmed_transaction(db):
+    transaction_id = create_pending(db)
+    db.confirm_transaction(transaction_id, 'KBZ')
+
+    result = db.cancel_transaction(transaction_id)
+    assert result['status'] == 'not_pending'
+    assert result['transaction'].status == 'confirmed'
+    # The payout was made; neither side may be reversed
+    assert db.get_balance('MMK', 'KBZ') == 378500.0
+    assert db.get_balance('THB', 'KBank') == 1000.0
+
+
+def test_balance_history_matches_ledger(db):
+    account_id = db.get_bank_accounts('THB')[0].id
+    db.update_balance('THB', 'KBank', 100.0)
+    time.sleep(0.01)
+    middle = utc_now()
+    time.sleep(0.01)
+    db.update_balance('THB', 'KBank', 50.0)
+    db.set_balance('THB', 'KBank', 400.0)
+
+    assert db.get_balance_at(account_id, middle) == 100.0
+    assert db.get_balance_at(account_id, utc_now()) == 400.0
+
+    history = db.get_ledger_history(account_id)
+    assert [entry['balance_after'] for entry in history] == [400.0, 150.0, 100.0]
+    assert [entry['amount'] for entry in history] == [250.0, 50.0, 100.0]
+
+
+def test_ledger_uses_the_transaction_clock(db):
+    account_id = db.get_bank_accounts('THB')[0].id
+    transaction_id = db.create_transaction(
+        user_id=1, username='user', exchange_direction='THB_TO_MMK',
+        from_currency='THB', to_currency='MMK',
+        sent_amount=100.0, received_amount=12150.0, exchange_rate=121.5,
+        user_bank_name='KBZ', user_account_number='999', user_account_name='AUNG AUNG',
+        from_bank='SCB', admin_receiving_bank='KBank'
+    )
+    db.update_balance('THB', 'KBank', 100.0, entry_type='credit', transaction_id=transaction_id)
+
+    conn = db.get_connection()
+    transaction_at = conn.execute("SELECT created_at FROM transactions WHERE id = ?", (transaction_id,)).fetchone()[0]
+    entry_at = conn.execute(
+        "SELECT created_at FROM ledger_entries WHERE transaction_id = ?", (transaction_id,)
+    ).fetchone()[0]
+    gap = datetime.fromisoformat(entry_at) - datetime.fromisoformat(transaction_at)
+    assert timedelta(0) <= gap < timedelta(seconds=5)
+
+    # Aware times are converted, whatever their zone
+    later = datetime.now(timezone(timedelta(hours=7))) + timedelta(seconds=5)
+    earlier = datetime.now(timezone(timedelta(hours=-5))) - timedelta(seconds=5)
+    assert db.get_balance_at(account_id, later) == db.get_balance('THB', 'KBank')
+    assert db.get_ledger_history(account_id, since=earlier, until=later)[0]['transaction_id'] == transaction_id
@@ -0,0 +1,180 @@
+"""
+Tests for the rate-limited message dispatcher
+"""
+import asyncio
+import time
+
+import pytest
+from telegram.error import BadRequest, Forbidden, RetryAfter, TimedOut
+
+from app.services.message_dispatcher import MessageDispatcher, Priority
+
+
+class Recorder:
+    """Send stand-in recording when each call was made"""
+
+    def __init__(self, errors=None):
+        self.calls = []
+        self.errors = dict(errors or {})
+
+    async def send(self, text):
+        self.calls.append((text, time.monotonic()))
+        error = self.errors.pop(text, None)
+        if error is not None:
+            raise error
+        return text
+
+
+def test_finished_send_frees_its_slot_for_the_next_job():
+    """With one slot, the second send must start as soon as the first finishes"""
+    async def run():
+        dispatcher = MessageDispatcher(global_rate=100, private_chat_rate=100, max_in_flight=1)
+        sent = []
+
+        async def send(text):
+            sent.append(text)
+            return text
+
+        results = await asyncio.wait_for(
+            asyncio.gather(dispatcher.send(1, send, 'first'), dispatcher.send(2, send, 'second')),
+            timeout=2
+        )
+        await dispatcher.close()
+        return results, sent
+
+    results, sent = asyncio.run(run())
+    assert results == ['first', 'second']
+    assert sent == ['first', 'second']
+
+
+def test_higher_priority_jobs_start_first():
+    async def run():
+        dispatcher = MessageDispatcher(global_rate=100, private_chat_rate=100, max_in_flight=1)
+        sent = []
+
+        async def send(text):
+            sent.append(text)
+
+        futures = [
+            dispatcher.submit(1, send, 'balance', priority=Priority.BROADCAST),
+            dispatcher.submit(2, send, 'admin', priority=Priority.ADMIN),
+            dispatcher.submit(3, send, 'reply', priority=Priority.INTERACTIVE),
+        ]
+        await asyncio.wait_for(asyncio.gather(*futures), timeout=2)
+        await dispatcher.close()
+        return sent
+
+    assert asyncio.run(run()) == ['reply', 'admin', 'balance']
+
+
+def test_chat_bucket_paces_sends_to_one_chat():
+    async def run():
+        dispatcher = MessageDispatcher(global_rate=100, private_chat_rate=10, private_chat_burst=1)
+        recorder = Recorder()
+        await asyncio.wait_for(
+            asyncio.gather(*(dispatcher.send(1, recorder.send, text) for text in 'abc')), timeout=2
+        )
+        await dispatcher.close()
+        return recorder.calls
+
+    calls = asyncio.run(run())
+    assert [text for text, _ in calls] == ['a', 'b', 'c']
+    gaps = [later - earlier for (_, earlier), (_, later) in zip(calls, calls[1:])]
+    assert all(gap >= 0.09 for gap in gaps)
+
+
+def test_global_bucket_paces_sends_across_chats():
+    async def run():
+        # Global burst is one second's worth (5 sends); the rest wait for tokens
+        dispatcher = MessageDispatcher(global_rate=5, private_chat_rate=100, private_chat_burst=5)
+        recorder = Recorder()
+        started = time.monotonic()
+        await asyncio.wait_for(
+            asyncio.gather(*(dispatcher.send(chat_id, recorder.send, chat_id) for chat_id in range(7))),
+            timeout=3
+        )
+        await dispatcher.close()
+        return [at - started for _, at in recorder.calls]
+
+    offsets = asyncio.run(run())
+    assert all(offset < 0.1 for offset in offsets[:5])
+    assert offsets[5] >= 0.15 and offsets[6] >= 0.35
+
+
+def test_retry_after_blocks_the_chat_and_requeues():
+    async def run():
+        dispatcher = MessageDispatcher(global_rate=100, private_chat_rate=100)
+        recorder = Recorder({'limited': RetryAfter(0.3)})
+        started = time.monotonic()
+        limited = asyncio.ensure_future(dispatcher.send(1, recorder.send, 'limited'))
+        await asyncio.sleep(0.05)
+        # The blocked chat waits; other chats are not held up
+        same_chat = asyncio.ensure_future(dispatcher.send(1, recorder.send, 'same chat'))
+        other_chat = await asyncio.wait_for(dispatcher.send(2, recorder.send, 'other chat'), timeout=0.2)
+        other_chat_at = time.monotonic() - started
+        results = await asyncio.wait_for(asyncio.gather(limited, same_chat), timeout=2)
+        await dispatcher.close()
+        calls = {text: at - started for text, at in recorder.calls}
+        return dispatcher.stats, other_chat, other_chat_at, results, calls
+
+    stats, other_chat, other_chat_at, results, calls = asyncio.run(run())
+    assert other_chat == 'other chat' and other_chat_at < 0.2
+    assert results == ['limited', 'same chat']
+    assert calls['same chat'] >= 0.3
+    assert stats['retry_after'] == 1 and stats['sent'] == 3 and stats['failed'] == 0
+
+
+@pytest.mark.parametrize('error', [
+    BadRequest('Message is not modified'),
+    BadRequest('Chat not found'),
+    Forbidden('Forbidden: bot was blocked by the user'),
+])
+def test_permanent_errors_fail_without_retry(error):
+    async def run():
+        dispatcher = MessageDispatcher(global_rate=100, private_chat_rate=100, retry_delay=0.5)
+        recorder = Recorder({'edit': error})
+        with pytest.raises(type(error)):
+            await asyncio.wait_for(dispatcher.send(1, recorder.send, 'edit'), timeout=0.3)
+        await dispatcher.close()
+        return dispatcher.stats, recorder.calls
+
+    stats, calls = asyncio.run(run())
+    assert len(calls) == 1
+    assert stats['retries'] == 0 and stats['failed'] == 1
+
+
+def test_timeouts_are_retried_with_backoff():
+    async def run():
+        dispatcher = MessageDispatcher(global_rate=100, private_chat_rate=100, retry_delay=0.05)
+        recorder = Recorder({'slow': TimedOut()})
+        result = await asyncio.wait_for(dispatcher.send(1, recorder.send, 'slow'), timeout=1)
+        await dispatcher.close()
+        return result, dispatcher.stats, recorder.calls
+
+    result, stats, calls = asyncio.run(run())
+    assert result == 'slow'
+    assert stats['retries'] == 1 and len(calls) == 2
+    assert calls[1][1] - calls[0][1] >= 0.05
+
+
+def test_reply_and_edit_go_through_the_chat_bucket():
+    class Message:
+        chat_id = 42
+
+        def __init__(self, recorder):
+            self.reply_text = self.edit_text = recorder.send
+
+    async def run():
+        dispatcher = MessageDispatcher(global_rate=100, private_chat_rate=10, private_chat_burst=1)
+        recorder = Recorder()
+        message = Message(recorder)
+        await asyncio.wait_for(asyncio.gather(
+            dispatcher.reply_text(message, 'reply'),
+            dispatcher.edit_text(message, 'edit'),
+        ), timeout=1)
+        await dispatcher.close()
+        return dispatcher.get_metrics(), recorder.calls
+
+    metrics, calls = asyncio.run(run())
+    assert [text for text, _ in calls] == ['reply', 'edit']
+    assert calls[1][1] - calls[0][1] >= 0.09
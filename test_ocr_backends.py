@@ -0,0 +1,17 @@
+"""
+Tests for OCR backend resource cleanup
+"""
+import asyncio
+
+from app.services.ocr_backends import OpenAIOCRBackend
+
+
+def test_openai_aclose_closes_both_clients():
+    async def run():
+        backend = OpenAIOCRBackend(api_key='sk-test')
+        await backend.aclose()
+        return backend
+
+    backend = asyncio.run(run())
+    assert backend.client.is_closed()
+    assert backend.async_client.is_closed()
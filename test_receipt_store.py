@@ -0,0 +1,80 @@
+"""
+Tests for receipt storage and retention
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from app.services.receipt_store import ReceiptStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReceiptStore(tmp_path / 'receipts')
+
+
+def test_put_is_content_addressed(store):
+    content_hash, file_path = store.put(b'receipt')
+    assert store.put(b'receipt') == (content_hash, file_path)
+    assert Path(file_path).read_bytes() == b'receipt'
+    assert Path(file_path).relative_to(store.root).parts[:2] == (content_hash[:2], content_hash[2:4])
+
+
+def test_put_raises_when_write_fails(store, monkeypatch):
+    monkeypatch.setattr('app.services.receipt_store.write_file', lambda path, data: False)
+    with pytest.raises(OSError):
+        store.put(b'receipt')
+
+
+def test_held_and_referenced_receipts_are_kept(db, async_db, store):
+    stored = {}
+    for name in ('orphan', 'held', 'hold_expired', 'hold_released', 'in_transaction'):
+        content_hash, file_path = store.put(name.encode())
+        db.register_receipt_blob(content_hash, file_path, len(name))
+        stored[name] = file_path
+
+    db.create_transaction(
+        user_id=1, username='user', exchange_direction='THB_TO_MMK',
+        from_currency='THB', to_currency='MMK',
+        sent_amount=1000.0, received_amount=121500.0, exchange_rate=121.5,
+        user_bank_name='KBZ', user_account_number='999', user_account_name='AUNG AUNG',
+        from_bank='SCB', admin_receiving_bank='KBank', receipt_path=stored['in_transaction']
+    )
+    now = datetime.now()
+    db.hold_receipt_blob(2, stored['held'], now + timedelta(hours=1))
+    db.hold_receipt_blob(3, stored['hold_expired'], now - timedelta(seconds=1))
+    db.hold_receipt_blob(4, stored['hold_released'], now + timedelta(hours=1))
+    db.release_receipt_blob(4)
+
+    async def run():
+        return await store.apply_retention(async_db, recompress_after_days=0, orphan_after_hours=-1)
+
+    stats = asyncio.run(run())
+
+    assert stats['removed'] == 3
+    for name in ('orphan', 'hold_expired', 'hold_released'):
+        assert not os.path.exists(stored[name]), name
+    assert os.path.exists(stored['held'])
+    assert os.path.exists(stored['in_transaction'])
+
+
+def test_new_hold_replaces_the_users_previous_one(db, async_db, store):
+    stored = []
+    for name in ('first', 'second'):
+        content_hash, file_path = store.put(name.encode())
+        db.register_receipt_blob(content_hash, file_path, len(name))
+        stored.append(file_path)
+
+    held_until = datetime.now() + timedelta(hours=1)
+    db.hold_receipt_blob(1, stored[0], held_until)
+    db.hold_receipt_blob(1, stored[1], held_until)
+
+    async def run():
+        return await store.apply_retention(async_db, recompress_after_days=0, orphan_after_hours=-1)
+
+    assert asyncio.run(run())['removed'] == 1
+    assert not os.path.exists(stored[0])
+    assert os.path.exists(stored[1])
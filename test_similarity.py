@@ -0,0 +1,146 @@
+"""
+Tests for receiver-name matching: banded Levenshtein and the trigram index
+"""
+import random
+import threading
+
+import pytest
+
+from app.utils.similarity import NameIndex, levenshtein_distance, name_similarity, normalize_name
+
+THRESHOLDS = (0.0, 0.5, 0.7, 0.8, 0.9, 1.0)
+
+NAMES = [
+    'MIN MYAT NWE', 'MIN MYAT NWAY', 'THIN ZAR HTET', 'AUNG AUNG', 'AUNG AUNG OO',
+    'Mr. Aung Aung', 'KYAW KYAW', 'SU SU', 'NI', 'A', 'SOMCHAI JAIDEE', 'SOMCHAI JAIDE',
+    'Dr. Somsak Srisuk', 'NAW EH PAW', 'ZAW ZAW HTUN', 'ZAW HTUN ZAW',
+]
+
+
+def matrix_similarity(name1: str, name2: str) -> float:
+    """Full-matrix Levenshtein similarity, as the original matcher computed it"""
+    s1, s2 = normalize_name(name1), normalize_name(name2)
+    if s1 == s2:
+        return 1.0
+    if not s1 or not s2:
+        return 0.0
+
+    len1, len2 = len(s1), len(s2)
+    matrix = [[0] * (len2 + 1) for _ in range(len1 + 1)]
+    for i in range(len1 + 1):
+        matrix[i][0] = i
+    for j in range(len2 + 1):
+        matrix[0][j] = j
+    for i in range(1, len1 + 1):
+        for j in range(1, len2 + 1):
+            cost = 0 if s1[i - 1] == s2[j - 1] else 1
+            matrix[i][j] = min(matrix[i - 1][j] + 1, matrix[i][j - 1] + 1, matrix[i - 1][j - 1] + cost)
+
+    return 1 - matrix[len1][len2] / max(len1, len2)
+
+
+def random_names(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    names = list(NAMES)
+    for _ in range(count):
+        base = list(normalize_name(rng.choice(NAMES)))
+        for _ in range(rng.randint(0, 3)):
+            pos = rng.randint(0, len(base))
+            action = rng.choice(('insert', 'delete', 'replace'))
+            if action == 'insert':
+                base.insert(pos, rng.choice('aeiouhnwyz'))
+            elif base and pos < len(base):
+                if action == 'delete':
+                    del base[pos]
+                else:
+                    base[pos] = rng.choice('aeiouhnwyz')
+        names.append(''.join(base))
+    return names
+
+
+@pytest.mark.parametrize('s1, s2, expected', [
+    ('', '', 0), ('abc', '', 3), ('kitten', 'sitting', 3), ('flaw', 'lawn', 2), ('same', 'same', 0),
+])
+def test_levenshtein_distance(s1, s2, expected):
+    assert levenshtein_distance(s1, s2) == expected
+    assert levenshtein_distance(s2, s1) == expected
+
+
+def test_banded_distance_reports_over_budget():
+    assert levenshtein_distance('kitten', 'sitting', 3) == 3
+    assert levenshtein_distance('kitten', 'sitting', 2) == 3
+    assert levenshtein_distance('a', 'abcdef', 1) == 2
+
+
+@pytest.mark.parametrize('threshold', THRESHOLDS)
+def test_threshold_parity_with_matrix_matcher(threshold):
+    names = random_names(60)
+    for name1 in names:
+        for name2 in names:
+            expected = matrix_similarity(name1, name2)
+            actual = name_similarity(normalize_name(name1), normalize_name(name2), threshold)
+            if expected >= threshold:
+                assert actual == pytest.approx(expected), (name1, name2)
+            else:
+                assert actual < threshold, (name1, name2)
+
+
+@pytest.mark.parametrize('threshold', THRESHOLDS)
+def test_candidates_are_a_superset_of_matches(threshold):
+    names = [normalize_name(name) for name in random_names(200)]
+    index = NameIndex()
+    for key, name in enumerate(names):
+        index.add(key, name)
+
+    for query in names[:60] + ['', 'x', 'minmyat']:
+        candidates = set(index.candidates(query, threshold))
+        for key, name in enumerate(names):
+            if query and matrix_similarity(query, name) >= threshold:
+                assert key in candidates, (query, name)
+
+
+def test_add_replaces_and_remove_forgets():
+    index = NameIndex()
+    index.add(1, 'aungaung')
+    index.add(1, 'kyawkyaw')
+    assert len(index) == 1
+    assert index.candidates('aungaung', 0.8) == []
+    assert index.candidates('kyawkyaw', 0.8) == [1]
+
+    index.remove(1)
+    index.remove(1)
+    assert 1 not in index
+    assert index.candidates('kyawkyaw', 0.8) == []
+
+
+def test_candidates_while_index_changes():
+    """Lookups from reader threads must not see posting sets mid-update"""
+    names = [normalize_name(name) for name in random_names(300)]
+    index = NameIndex()
+    for key, name in enumerate(names):
+        index.add(key, name)
+
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                for query in names[:20]:
+                    index.candidates(query, 0.8)
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for _ in range(20):
+        for key, name in enumerate(names):
+            index.remove(key)
+            index.add(key, name)
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert len(index) == len(names)
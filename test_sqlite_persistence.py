@@ -0,0 +1,136 @@
+"""
+Tests for the SQLite bot persistence round trip
+"""
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app.services.async_database_service import AsyncDatabaseService
+from app.services.sqlite_persistence import SQLitePersistence
+
+
+def test_round_trip(db):
+    user_data = {'exchange_direction': 'THB_TO_MMK', 'amount': 1000.5, 'receipt_path': 'receipts/ab/cd/abcd.jpg'}
+
+    async def write():
+        persistence = SQLitePersistence(AsyncDatabaseService(db))
+        await persistence.update_user_data(1, user_data)
+        await persistence.update_user_data(2, {'exchange_direction': 'MMK_TO_THB'})
+        await persistence.update_chat_data(-100, {'dashboard_message_id': 7})
+        await persistence.update_bot_data({'rate_version': 3})
+        await persistence.update_conversation('exchange', (1, 1), 4)
+        await persistence.update_conversation('exchange', (2, 2), 2)
+        await persistence.flush()
+        return persistence
+
+    async def read():
+        persistence = SQLitePersistence(AsyncDatabaseService(db))
+        return (
+            await persistence.get_user_data(),
+            await persistence.get_chat_data(),
+            await persistence.get_bot_data(),
+            await persistence.get_conversations('exchange'),
+            await persistence.get_conversations('other'),
+        )
+
+    written = asyncio.run(write())
+    assert written.stats['failed'] == 0
+    assert written.stats['written'] == 6
+
+    users, chats, bot_data, conversations, other = asyncio.run(read())
+    assert users == {1: user_data, 2: {'exchange_direction': 'MMK_TO_THB'}}
+    assert chats == {-100: {'dashboard_message_id': 7}}
+    assert bot_data == {'rate_version': 3}
+    assert conversations == {(1, 1): 4, (2, 2): 2}
+    assert other == {}
+
+
+def test_only_changed_rows_are_written_and_empty_rows_are_deleted(async_db):
+    async def run():
+        persistence = SQLitePersistence(async_db)
+        await persistence.update_user_data(1, {'step': 1, 'amount': 500})
+        await persistence.update_conversation('exchange', (1, 1), 4)
+        await persistence.flush()
+
+        # Same content is skipped, even with a different key order
+        await persistence.update_user_data(1, {'amount': 500, 'step': 1})
+        await persistence.update_conversation('exchange', (1, 1), 4)
+        await persistence.flush()
+        unchanged = persistence.stats['unchanged']
+
+        # Conversation ended and user data cleared
+        await persistence.update_conversation('exchange', (1, 1), None)
+        await persistence.update_user_data(1, {})
+        await persistence.flush()
+
+        return (
+            persistence.stats, unchanged,
+            await async_db.get_persistence_entries('user'),
+            await async_db.get_persistence_entries('conversation:exchange'),
+        )
+
+    stats, unchanged, users, conversations = asyncio.run(run())
+    assert unchanged == 2
+    assert stats['written'] == 4
+    assert users == {} and conversations == {}
+
+
+def test_failed_write_stays_staged(async_db):
+    class FlakyDB:
+        def __init__(self, async_db):
+            self.async_db = async_db
+            self.fail = True
+
+        async def write_persistence_entries(self, entries):
+            if self.fail:
+                return False
+            return await self.async_db.write_persistence_entries(entries)
+
+    async def run():
+        flaky = FlakyDB(async_db)
+        persistence = SQLitePersistence(flaky)
+        await persistence.update_user_data(1, {'step': 1})
+        await persistence.flush()
+        failed_rows = await async_db.get_persistence_entries('user')
+
+        flaky.fail = False
+        await persistence.flush()
+        return persistence.stats, failed_rows, await async_db.get_persistence_entries('user')
+
+    stats, failed_rows, rows = asyncio.run(run())
+    assert failed_rows == {}
+    assert stats['failed'] >= 1
+    assert rows == {'1': '{"step":1}'}
+
+
+def test_values_json_cannot_hold_are_pickled(async_db):
+    user_data = {'step': 1, 'started_at': datetime(2026, 1, 2, 9, 30), 'amount': Decimal('1000.50')}
+
+    async def run():
+        persistence = SQLitePersistence(async_db)
+        await persistence.update_user_data(1, user_data)
+        await persistence.update_conversation('exchange', (1, 1), 4)
+        await persistence.flush()
+        # Same content again is still recognised as unchanged
+        await persistence.update_user_data(1, dict(user_data))
+        stats = dict(persistence.stats)
+        return stats, await SQLitePersistence(async_db).get_user_data()
+
+    stats, users = asyncio.run(run())
+    # Both fields are pickled on each encode
+    assert stats['pickled'] == 4 and stats['unchanged'] == 1 and stats['written'] == 2
+    assert users == {1: user_data}
+
+
+def test_unpersistable_value_raises_and_stages_nothing(async_db):
+    async def run():
+        persistence = SQLitePersistence(async_db)
+        with pytest.raises(TypeError):
+            await persistence.update_user_data(1, {'step': 1, 'callback': lambda: None})
+        await persistence.flush()
+        return persistence.stats, await async_db.get_persistence_entries('user')
+
+    stats, rows = asyncio.run(run())
+    assert stats['staged'] == 0 and rows == {}
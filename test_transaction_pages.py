@@ -0,0 +1,99 @@
+"""
+Tests for keyset pagination of the transaction history
+"""
+
+import pytest
+
+DAY_START = '2026-01-02 00:00:00'
+DAY_END = '2026-01-03 00:00:00'
+
+# Several rows share a timestamp so pages must break ties on id
+CREATED_AT = [
+    '2026-01-01 23:59:59',  # previous day
+    '2026-01-02 00:00:00',  # range start is inclusive
+    '2026-01-02 09:00:00',
+    '2026-01-02 09:00:00',
+    '2026-01-02 09:00:00',
+    '2026-01-02 12:30:00',
+    '2026-01-02 12:30:00',
+    '2026-01-02 23:59:59',
+    '2026-01-03 00:00:00',  # range end is exclusive
+]
+
+
+@pytest.fixture
+def db(db):
+    conn = db.get_connection()
+    for created_at in CREATED_AT:
+        transaction_id = db.create_transaction(
+            user_id=1, username='user', exchange_direction='THB_TO_MMK',
+            from_currency='THB', to_currency='MMK',
+            sent_amount=1000.0, received_amount=121500.0, exchange_rate=121.5,
+            user_bank_name='KBZ', user_account_number='999', user_account_name='AUNG AUNG',
+            from_bank='SCB', admin_receiving_bank='KBank'
+        )
+        conn.execute("UPDATE transactions SET created_at = ? WHERE id = ?", (created_at, transaction_id))
+    conn.commit()
+    return db
+
+
+def in_range_newest_first(db):
+    rows = db.get_connection().execute(
+        "SELECT id FROM transactions WHERE created_at >= ? AND created_at < ? ORDER BY created_at DESC, id DESC",
+        (DAY_START, DAY_END)
+    ).fetchall()
+    return [row['id'] for row in rows]
+
+
+def ids(transactions):
+    return [transaction.id for transaction in transactions]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 10])
+def test_next_pages_cover_the_range_once(db, limit):
+    expected = in_range_newest_first(db)
+    assert len(expected) == 7
+
+    seen = []
+    page, has_more = db.get_transactions_page(DAY_START, DAY_END, limit=limit)
+    while True:
+        assert 0 < len(page) <= limit
+        seen.extend(ids(page))
+        if not has_more:
+            break
+        page, has_more = db.get_transactions_page(DAY_START, DAY_END, limit=limit, before_id=page[-1].id)
+
+    assert seen == expected
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3])
+def test_previous_pages_walk_back_to_the_newest(db, limit):
+    expected = in_range_newest_first(db)
+
+    # Start from the oldest page and page back towards the newest
+    oldest = expected[-limit:]
+    seen = list(oldest)
+    page_ids = oldest
+    while True:
+        page, has_more = db.get_transactions_page(DAY_START, DAY_END, limit=limit, after_id=page_ids[0])
+        page_ids = ids(page)
+        assert 0 < len(page_ids) <= limit
+        seen = page_ids + seen
+        if not has_more:
+            break
+
+    assert seen == expected
+
+
+def test_page_that_exactly_fills_the_range_has_no_more(db):
+    page, has_more = db.get_transactions_page(DAY_START, DAY_END, limit=7)
+    assert len(page) == 7 and not has_more
+
+    page, has_more = db.get_transactions_page(DAY_START, DAY_END, limit=3, before_id=in_range_newest_first(db)[3])
+    assert len(page) == 3 and not has_more
+
+
+def test_paging_past_either_end_is_empty(db):
+    expected = in_range_newest_first(db)
+    assert db.get_transactions_page(DAY_START, DAY_END, limit=3, before_id=expected[-1]) == ([], False)
+    assert db.get_transactions_page(DAY_START, DAY_END, limit=3, after_id=expected[0]) == ([], False)
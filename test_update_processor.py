@@ -0,0 +1,118 @@
+"""
+Tests for per-chat ordering in the keyed update processor
+"""
+import asyncio
+import random
+
+from telegram import Update
+
+from app.services.update_processor import KeyedUpdateProcessor
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': 'hi',
+        },
+    }, None)
+
+
+class Recorder:
+    """Handler stand-in recording start/finish order per chat and peak concurrency"""
+
+    def __init__(self):
+        self.started = {}
+        self.finished = {}
+        self.running = 0
+        self.peak = 0
+        self.running_per_key = {}
+        self.peak_per_key = 0
+
+    async def handle(self, update_id: int, key, delay: float):
+        self.started.setdefault(key, []).append(update_id)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        self.running_per_key[key] = self.running_per_key.get(key, 0) + 1
+        self.peak_per_key = max(self.peak_per_key, self.running_per_key[key])
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.running -= 1
+            self.running_per_key[key] -= 1
+            self.finished.setdefault(key, []).append(update_id)
+
+
+async def feed(processor, updates, recorder, delays):
+    """Admit updates in order, as Application does, and wait for all of them"""
+    tasks = []
+    for update in updates:
+        key = processor.ordering_key(update)
+        coroutine = recorder.handle(update.update_id, key, delays[update.update_id])
+        tasks.append(asyncio.create_task(processor.process_update(update, coroutine)))
+        # Give each update its turn to queue behind the ones admitted before it
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+
+def test_updates_for_one_chat_run_in_arrival_order():
+    rng = random.Random(3)
+    updates = [make_update(update_id, 100 + rng.randrange(4)) for update_id in range(1, 41)]
+    # Later updates are faster, so they would overtake without ordering
+    delays = {update.update_id: 0.02 - update.update_id * 0.0004 for update in updates}
+
+    async def run():
+        processor = KeyedUpdateProcessor(workers=4)
+        recorder = Recorder()
+        await feed(processor, updates, recorder, delays)
+        return processor, recorder
+
+    processor, recorder = asyncio.run(run())
+    assert recorder.peak_per_key == 1
+    for chat_id, finished in recorder.finished.items():
+        arrived = [update.update_id for update in updates if update.effective_chat.id == chat_id]
+        assert finished == arrived
+    # Different chats still ran side by side, within the worker limit
+    assert 1 < recorder.peak <= 4
+    assert processor.stats['processed'] == 40
+    assert processor.get_metrics()['active_keys'] == 0
+
+
+def test_waiting_updates_do_not_hold_workers():
+    """A backlog in one chat must not delay another chat"""
+    updates = [make_update(update_id, 1) for update_id in range(1, 6)] + [make_update(6, 2)]
+    delays = {update_id: 0.05 for update_id in range(1, 6)}
+    delays[6] = 0
+
+    async def run():
+        processor = KeyedUpdateProcessor(workers=2)
+        recorder = Recorder()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        task = asyncio.create_task(feed(processor, updates, recorder, delays))
+        while 2 not in recorder.started:
+            await asyncio.sleep(0.001)
+        other_chat_wait = loop.time() - started
+        await task
+        return recorder, other_chat_wait
+
+    recorder, other_chat_wait = asyncio.run(run())
+    assert recorder.finished[1] == [1, 2, 3, 4, 5]
+    assert other_chat_wait < 0.05
+
+
+def test_updates_without_a_chat_are_not_ordered():
+    async def run():
+        processor = KeyedUpdateProcessor(workers=4)
+        recorder = Recorder()
+        await asyncio.gather(*(
+            processor.process_update(object(), recorder.handle(index, None, 0.01)) for index in range(4)
+        ))
+        return processor, recorder
+
+    processor, recorder = asyncio.run(run())
+    assert recorder.peak == 4 and recorder.peak_per_key == 4
+    assert processor.stats['ordered_waits'] == 0
@@ -0,0 +1,132 @@
+"""
+Tests for the embedded webhook listener
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.webhook_server import WebhookServer
+
+SECRET = 'secret-token'
+
+
+def update_body(update_id: int) -> bytes:
+    return json.dumps({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': 1, 'type': 'private'},
+            'text': 'hi',
+        },
+    }).encode()
+
+
+def request(body: bytes = b'', method: str = 'POST', path: str = '/telegram', secret: str = SECRET,
+            length=None, close: bool = False) -> bytes:
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+    if secret is not None:
+        head += f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n"
+    head += f"Content-Length: {len(body) if length is None else length}\r\n"
+    if close:
+        head += "Connection: close\r\n"
+    return head.encode('latin-1') + b'\r\n' + body
+
+
+async def read_status(reader: asyncio.StreamReader) -> int:
+    """Read one response and return its status code"""
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def exchange(*payloads: bytes, read_timeout: float = 10.0):
+    """Send requests on one connection; returns statuses, queued updates and server stats"""
+    application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+    server = WebhookServer(application, listen='127.0.0.1', port=0, secret_token=SECRET, read_timeout=read_timeout)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        statuses = []
+        for payload in payloads:
+            writer.write(payload)
+            await writer.drain()
+            statuses.append(await asyncio.wait_for(read_status(reader), timeout=2))
+        try:
+            closed = await asyncio.wait_for(reader.read(), timeout=0.3) == b''
+        except asyncio.TimeoutError:
+            closed = False
+        writer.close()
+    finally:
+        await server.stop()
+
+    updates = []
+    while not application.update_queue.empty():
+        updates.append(application.update_queue.get_nowait())
+    return statuses, updates, server.stats, closed
+
+
+def test_updates_are_decoded_and_queued_on_one_connection():
+    statuses, updates, stats, _ = asyncio.run(exchange(request(update_body(1)), request(update_body(2))))
+    assert statuses == [200, 200]
+    assert [update.update_id for update in updates] == [1, 2]
+    assert updates[0].message.text == 'hi' and updates[0].effective_chat.id == 1
+    assert stats['received'] == 2
+
+
+@pytest.mark.parametrize('secret', ['wrong-token', '', None])
+def test_bad_secret_token_is_forbidden(secret):
+    statuses, updates, stats, _ = asyncio.run(exchange(request(update_body(1), secret=secret)))
+    assert statuses == [403]
+    assert updates == [] and stats['rejected'] == 1
+
+
+@pytest.mark.parametrize('payload, status', [
+    (request(update_body(1), path='/other'), 404),
+    (request(update_body(1), path='/telegram/extra'), 404),
+    (request(method='GET'), 405),
+])
+def test_path_and_method_are_checked(payload, status):
+    statuses, updates, _, _ = asyncio.run(exchange(payload))
+    assert statuses == [status] and updates == []
+
+
+@pytest.mark.parametrize('body', [b'not json', b'', b'[]', b'{}', b'null', b'{"message": {}}'])
+def test_undecodable_body_is_a_bad_request(body):
+    statuses, updates, stats, _ = asyncio.run(exchange(request(body)))
+    assert statuses == [400]
+    assert updates == [] and stats['invalid'] == 1
+
+
+def test_query_string_is_ignored_for_routing():
+    statuses, updates, _, _ = asyncio.run(exchange(request(update_body(1), path='/telegram?x=1')))
+    assert statuses == [200] and len(updates) == 1
+
+
+@pytest.mark.parametrize('length, status', [('-1', 400), ('abc', 400), (str(2 * 1024 * 1024), 413)])
+def test_bad_content_length_closes_the_connection(length, status):
+    statuses, updates, _, closed = asyncio.run(exchange(request(length=length)))
+    assert statuses == [status] and updates == [] and closed
+
+
+def test_stalled_body_times_out():
+    body = update_body(1)
+    # Announce the full body but send only half of it
+    payload = request(body, length=len(body))[:-len(body) // 2]
+    statuses, updates, _, closed = asyncio.run(exchange(payload, read_timeout=0.1))
+    assert statuses == [408] and updates == [] and closed
+
+
+def test_stalled_headers_time_out():
+    statuses, _, _, closed = asyncio.run(exchange(b"POST /telegram HTTP/1.1\r\nHost: local", read_timeout=0.1))
+    assert statuses == [408] and closed
@@ -0,0 +1,85 @@
+"""
+Tests for the cached /start welcome screen
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.handlers.user_handlers import UserHandlers
+from app.services.message_dispatcher import MessageDispatcher
+from app.services.receipt_store import ReceiptStore
+
+
+class CountingDB:
+    """Async database stand-in that records every method called on it"""
+
+    def __init__(self, async_db):
+        self.async_db = async_db
+        self.calls = []
+
+    @property
+    def display_version(self):
+        return self.async_db.display_version
+
+    def __getattr__(self, name):
+        method = getattr(self.async_db, name)
+
+        async def call(*args, **kwargs):
+            self.calls.append(name)
+            return await method(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def db(db):
+    db.initialize_exchange_rate(121.5)
+    db.add_bank_account('THB', 'KBank', '111', 'MIN MYAT NWE')
+    return db
+
+
+def make_update(replies):
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    message = SimpleNamespace(chat_id=1, reply_text=reply_text)
+    return SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=1, type='private'))
+
+
+def test_start_reuses_the_render_until_displayed_data_changes(db, async_db, tmp_path):
+    async def run():
+        counting_db = CountingDB(async_db)
+        dispatcher = MessageDispatcher(private_chat_rate=100, private_chat_burst=10)
+        handlers = UserHandlers(counting_db, None, ReceiptStore(tmp_path / 'receipts'), dispatcher)
+        replies = []
+
+        async def start():
+            reads = len(counting_db.calls)
+            await handlers.start(make_update(replies), None)
+            return len(counting_db.calls) - reads
+
+        steps = {'first': await start(), 'repeat': await start()}
+
+        await async_db.update_rate(125.0)
+        steps['rate'] = await start()
+
+        mmk_account = await async_db.add_bank_account('MMK', 'KBZ', '222', 'AUNG AUNG')
+        steps['account'] = await start()
+
+        await async_db.update_bank_display_name(mmk_account, 'KBZ Pay')
+        steps['display_name'] = await start()
+        steps['repeat_after_changes'] = await start()
+
+        await handlers.dispatcher.close()
+        return steps, replies
+
+    steps, replies = asyncio.run(run())
+
+    # Rate plus THB and MMK accounts on each render; nothing when cached
+    assert steps == {
+        'first': 3, 'repeat': 0, 'rate': 3, 'account': 3, 'display_name': 3, 'repeat_after_changes': 0
+    }
+    assert replies[1] == replies[0]
+    assert '1 THB = 121.5 MMK' in replies[0] and '1 THB = 125.0 MMK' in replies[2]
+    assert '• KBZ\n' not in replies[2] and '• KBZ\n' in replies[3]
+    assert '• KBZ Pay\n' in replies[4] and replies[5] == replies[4]